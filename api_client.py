@@ -0,0 +1,303 @@
+import base64
+import http.client
+import json
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote, urlsplit
+
+from database import ESTACAO, TODOS_OS_ANOS
+
+# ====================================================================
+# CLIENTE DA API (mesma interface usada pelas telas do DatabaseManager)
+# ====================================================================
+
+# Segredo compartilhado entre o serviço e as estações (ver api_server.py): vai em todo pedido
+CABECALHO_TOKEN = "X-Cemac-Token"
+TOKEN_API = os.environ.get("CEMAC_API_TOKEN")
+
+
+class ErroAPI(RuntimeError):
+    """O serviço respondeu com erro (status HTTP >= 400); 'status' permite tratar o 404 à parte."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(f"API respondeu {status}: {mensagem}")
+        self.status = status
+
+
+class RemoteDatabaseManager:
+    """
+    Substitui o DatabaseManager quando a estação aponta para o serviço de api_server.py.
+    Cada thread mantém sua própria conexão HTTP keep-alive. As linhas chegam como listas
+    JSON e são devolvidas como tuplas, no mesmo layout das consultas locais (COLUNAS_ALUNOS).
+    """
+
+    remoto = True
+
+    def __init__(self, url, timeout=15.0, estacao=ESTACAO, token=TOKEN_API):
+        partes = urlsplit(url)
+        self.db_name = url
+        self.token = token
+        # Enviada nas gravações: o histórico de status registra a mesa, não o servidor
+        self.estacao = estacao
+        self.host = partes.hostname or "127.0.0.1"
+        self.porta = partes.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ano_letivo = None
+
+    # --- Transporte ---
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.porta, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _enviar(self, metodo, caminho, dados, cabecalhos):
+        """Uma ida e volta na conexão da thread: (resposta, corpo em bytes)."""
+        conn = self._conexao()
+        try:
+            conn.request(metodo, caminho, body=dados, headers=cabecalhos)
+            resposta = conn.getresponse()
+            return resposta, resposta.read()
+        except Exception:
+            # Conexão em estado desconhecido (fechada pelo servidor, timeout...): a próxima abre outra
+            self.liberar_conexoes_da_thread()
+            raise
+
+    def _requisitar(self, metodo, caminho, corpo=None):
+        """
+        Envia a requisição e devolve o corpo (JSON decodificado, ou bytes de PDF/foto).
+        Status >= 400 vira ErroAPI; falhas de rede na segunda tentativa sobem como estão.
+        """
+        dados = json.dumps(corpo).encode("utf-8") if corpo is not None else None
+        cabecalhos = {"Content-Type": "application/json"} if dados is not None else {}
+        if self.token:
+            # Em UTF-8, como o servidor compara (http.client codificaria um str em latin-1)
+            cabecalhos[CABECALHO_TOKEN] = self.token.encode("utf-8")
+        try:
+            resposta, conteudo = self._enviar(metodo, caminho, dados, cabecalhos)
+        except ConnectionError:
+            # O servidor fechou a conexão keep-alive ociosa (RemoteDisconnected, BrokenPipe...):
+            # tenta uma única vez mais, em uma conexão nova
+            resposta, conteudo = self._enviar(metodo, caminho, dados, cabecalhos)
+
+        if not resposta.getheader("Content-Type", "").startswith("application/json"):
+            resultado = conteudo
+        else:
+            resultado = json.loads(conteudo) if conteudo else None
+        if resposta.status >= 400:
+            raise ErroAPI(resposta.status, resultado.get("erro") if isinstance(resultado, dict) else resposta.reason)
+        return resultado
+
+    @staticmethod
+    def _linhas(resultado):
+        return tuple(tuple(linha) for linha in resultado)
+
+    @staticmethod
+    def _ano(ano, separador="&"):
+        if ano is None:
+            return ""
+        return f"{separador}ano={'todos' if ano == TODOS_OS_ANOS else int(ano)}"
+
+    # --- Operações (espelham o DatabaseManager) ---
+
+    def versao_dados(self):
+        return tuple(self._requisitar("GET", "/versao")["versao"])
+
+    @property
+    def ano_letivo(self):
+        if self._ano_letivo is None:
+            self._ano_letivo = self._requisitar("GET", "/anos")["atual"]
+        return self._ano_letivo
+
+    def anos_letivos(self):
+        return self._requisitar("GET", "/anos")["anos"]
+
+    def get_alunos(self, ano=None):
+        return self._linhas(self._requisitar("GET", f"/alunos{self._ano(ano, '?')}"))
+
+    def iter_alunos(self, ano=None, lote=500):
+        # A resposta inteira é lida e decodificada antes da primeira linha (não há streaming pela API);
+        # só as tuplas são geradas uma a uma, para quem converte as linhas não guardar uma segunda cópia
+        for linha in self._requisitar("GET", f"/alunos{self._ano(ano, '?')}"):
+            yield tuple(linha)
+
+    def get_alunos_pagina(self, offset=0, limite=50, ano=None):
+        return self._linhas(self._requisitar(
+            "GET", f"/alunos?offset={int(offset)}&limite={int(limite)}{self._ano(ano)}"))
+
+    def search_alunos(self, termo=None, turma=None, ano=None):
+        return self._linhas(self._requisitar(
+            "GET", f"/alunos/busca?q={quote(termo or '')}&turma={quote(turma or '')}{self._ano(ano)}"))
+
+    def find_by_contact(self, digitos):
+        return self._linhas(self._requisitar("GET", f"/alunos/contato?digitos={quote(digitos or '')}"))
+
+    def get_aluno_by_id(self, aluno_id):
+        try:
+            return tuple(self._requisitar("GET", f"/alunos/{int(aluno_id)}"))
+        except ErroAPI as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def get_alunos_by_ids(self, ids, relatorio=False):
+        # Ids no corpo, não na URL: listas longas estourariam o limite da linha de requisição
+        ids = [int(i) for i in ids]
+        return list(self._linhas(self._requisitar("POST", "/alunos/lote", {"ids": ids}))) if ids else []
+
+    @contextmanager
+    def snapshot_relatorio(self):
+        # Cada requisição já lê um snapshot no servidor; não há transação para manter aberta daqui
+        yield None
+
+    def get_ficha_pdf(self, aluno_id):
+        return self._requisitar("GET", f"/alunos/{int(aluno_id)}/ficha.pdf")
+
+    def sugerir_responsaveis(self, prefixo, limite=8):
+        return self._linhas(self._requisitar(
+            "GET", f"/sugestoes/responsaveis?q={quote(prefixo or '')}&limite={int(limite)}"))
+
+    def sugerir_enderecos(self, prefixo, limite=8):
+        return self._requisitar("GET", f"/sugestoes/enderecos?q={quote(prefixo or '')}&limite={int(limite)}")
+
+    def get_familia_responsavel(self, responsavel_id):
+        try:
+            return tuple(self._requisitar("GET", f"/responsaveis/{int(responsavel_id)}/familia"))
+        except ErroAPI as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def get_responsaveis(self, aluno_id):
+        try:
+            return {papel: tuple(responsavel)
+                    for papel, responsavel in self._requisitar("GET", f"/alunos/{int(aluno_id)}/responsaveis").items()}
+        except ErroAPI as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def update_responsavel(self, responsavel_id, nome, telefone):
+        try:
+            return self._requisitar("POST", f"/responsaveis/{int(responsavel_id)}",
+                                    {"nome": nome or "", "telefone": telefone or ""})["id"]
+        except Exception as e:
+            print(f"Erro ao atualizar responsável: {e}")
+            return False
+
+    def update_endereco(self, aluno_id, endereco):
+        try:
+            self._requisitar("POST", f"/alunos/{int(aluno_id)}/endereco", {"endereco": endereco or ""})
+            return True
+        except Exception as e:
+            print(f"Erro ao atualizar endereço: {e}")
+            return False
+
+    def salvar_foto(self, aluno_id, dados, largura=None, altura=None):
+        corpo = {"dados": base64.b64encode(dados).decode("ascii"), "largura": largura, "altura": altura}
+        try:
+            return self._requisitar("POST", f"/alunos/{int(aluno_id)}/foto", corpo)["hash"]
+        except Exception as e:
+            print(f"Erro ao salvar foto: {e}")
+            return False
+
+    def remover_foto(self, aluno_id):
+        try:
+            self._requisitar("POST", f"/alunos/{int(aluno_id)}/foto", {"dados": None})
+            return True
+        except Exception as e:
+            print(f"Erro ao remover foto: {e}")
+            return False
+
+    def get_fotos_hashes(self, ids):
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        return {int(aluno_id): hash_foto
+                for aluno_id, hash_foto in self._requisitar("POST", "/alunos/fotos", {"ids": ids}).items()}
+
+    def get_foto_hash(self, aluno_id):
+        return self.get_fotos_hashes([aluno_id]).get(int(aluno_id))
+
+    def get_foto(self, hash_foto):
+        try:
+            return self._requisitar("GET", f"/fotos/{hash_foto}")
+        except ErroAPI as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def insert_aluno(self, dados, estacao=None):
+        try:
+            return self._requisitar("POST", "/alunos", {"dados": list(dados), "estacao": estacao or self.estacao})["id"]
+        except Exception as e:
+            print(f"Erro ao inserir: {e}")
+            return False
+
+    def update_status_matricula(self, aluno_id, pagamento_ok, assinatura_ok, status_matricula, metodo_pagto):
+        return self.update_status_many([aluno_id], pagamento_ok, assinatura_ok, status_matricula, metodo_pagto)
+
+    def update_status_many(self, ids, pagamento_ok, assinatura_ok, status_matricula, metodo_pagto=None, estacao=None):
+        corpo = {"ids": [int(i) for i in ids], "pagamento": pagamento_ok, "assinatura": assinatura_ok,
+                 "status": status_matricula, "metodo": metodo_pagto, "estacao": estacao or self.estacao}
+        try:
+            self._requisitar("POST", "/alunos/status", corpo)
+            return True
+        except Exception as e:
+            print(f"Erro ao atualizar matrícula: {e}")
+            return False
+
+    def confirmar_pagamentos(self, ids, metodo_pagto=None, estacao=None):
+        corpo = {"ids": [int(i) for i in ids], "metodo": metodo_pagto, "estacao": estacao or self.estacao}
+        try:
+            self._requisitar("POST", "/alunos/pagamentos", corpo)
+            return True
+        except Exception as e:
+            print(f"Erro ao confirmar pagamentos: {e}")
+            return False
+
+    def get_historico(self, aluno_id):
+        return self._linhas(self._requisitar("GET", f"/alunos/{int(aluno_id)}/historico"))
+
+    def get_eventos_dia(self, dia):
+        return self._linhas(self._requisitar("GET", f"/eventos?dia={dia.isoformat()}"))
+
+    def iter_pendentes_pagamento(self, lote=500):
+        yield from self._linhas(self._requisitar("GET", "/alunos/pendentes_pagamento"))
+
+    def get_resumo(self, ano=None):
+        return tuple((r["turma"], r["total"], r["efetivadas"], r["pagamentos_pendentes"])
+                     for r in self._requisitar("GET", f"/resumo{self._ano(ano, '?')}"))
+
+    def get_turmas(self, ano=None):
+        return self._requisitar("GET", f"/turmas{self._ano(ano, '?')}")
+
+    def iter_alunos_relatorio(self, turma=None, lote=500, ano=None):
+        yield from self._linhas(self._requisitar("GET", f"/relatorio?turma={quote(turma or '')}{self._ano(ano)}"))
+
+    def get_ultima_alteracao(self):
+        return self._requisitar("GET", "/alteracoes")["ultima_seq"]
+
+    def get_alteracoes_desde(self, seq):
+        resultado = self._requisitar("GET", f"/alteracoes?desde={int(seq)}")
+        if resultado.get("recarregar"):
+            return None
+        return resultado["ultima_seq"], resultado["alterados"], resultado["removidos"]
+
+    def lote(self, requisicoes):
+        """Envia várias requisições em uma só ida ao servidor: [(metodo, caminho, corpo)] -> [(status, corpo)]."""
+        corpo = {"requisicoes": [{"metodo": m, "caminho": c, "corpo": b} for m, c, b in requisicoes]}
+        return [(r["status"], r["corpo"]) for r in self._requisitar("POST", "/lote", corpo)["respostas"]]
+
+    def liberar_conexoes_da_thread(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def close(self):
+        self.liberar_conexoes_da_thread()
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+from api_client import CABECALHO_TOKEN, TOKEN_API
+
+# ====================================================================
+# TESTE DE CARGA DA API (cliente asyncio com conexões keep-alive)
+# ====================================================================
+#
+# Abre N conexões persistentes contra o api_server.py e dispara uma mistura
+# realista de leituras (listagem paginada, busca, aluno por id, resumo) e,
+# opcionalmente, de atualizações de status. Com --lote K, cada requisição HTTP
+# leva K operações via POST /lote. Resultado em JSON no stdout.
+
+MISTURA_LEITURA = [
+    (0.45, "pagina"),
+    (0.25, "por_id"),
+    (0.20, "busca"),
+    (0.10, "resumo"),
+]
+
+# Termos de pesquisa típicos da secretaria (parte do nome)
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Almeida", "Cavalcanti"]
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _operacao(proporcao_escrita, max_id):
+    """Sorteia uma operação e devolve (nome, metodo, caminho, corpo)."""
+    if random.random() < proporcao_escrita:
+        aluno_id = random.randint(1, max_id)
+        corpo = {"ids": [aluno_id], "pagamento": 1, "assinatura": 1, "status": "Matrícula Efetivada", "metodo": None}
+        return "status", "POST", "/alunos/status", corpo
+    sorteio, acumulado = random.random(), 0.0
+    for peso, nome in MISTURA_LEITURA:
+        acumulado += peso
+        if sorteio <= acumulado:
+            break
+    if nome == "pagina":
+        return nome, "GET", f"/alunos?offset={random.randint(0, 10) * 15}&limite=15", None
+    if nome == "por_id":
+        return nome, "GET", f"/alunos/{random.randint(1, max_id)}", None
+    if nome == "busca":
+        return nome, "GET", f"/alunos/busca?q={random.choice(SOBRENOMES)}", None
+    return nome, "GET", "/resumo", None
+
+
+async def _enviar(reader, writer, host, metodo, caminho, corpo, token=None):
+    dados = json.dumps(corpo).encode("utf-8") if corpo is not None else b""
+    # O token vai em UTF-8 (é como o servidor compara); o resto do cabeçalho é ASCII
+    autenticacao = f"{CABECALHO_TOKEN}: ".encode("latin-1") + token.encode("utf-8") + b"\r\n" if token else b""
+    writer.write(
+        f"{metodo} {caminho} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(dados)}\r\n".encode("latin-1")
+        + autenticacao + b"Content-Type: application/json\r\n\r\n" + dados
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await reader.readline()
+        if linha in (b"\r\n", b"\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        if nome.strip().lower() == "content-length":
+            tamanho = int(valor)
+    await reader.readexactly(tamanho)
+    return status
+
+
+async def _cliente(host, porta, fim, args, latencias, contagem, erros):
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            if args.lote > 1:
+                ops = [_operacao(args.escrita, args.max_id) for _ in range(args.lote)]
+                nome, metodo, caminho = "lote", "POST", "/lote"
+                corpo = {"requisicoes": [{"metodo": m, "caminho": c, "corpo": b} for _, m, c, b in ops]}
+            else:
+                nome, metodo, caminho, corpo = _operacao(args.escrita, args.max_id)
+            inicio = time.perf_counter()
+            try:
+                status = await _enviar(reader, writer, host, metodo, caminho, corpo, args.token)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                erros[nome] = erros.get(nome, 0) + 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, porta)
+                continue
+            latencias.setdefault(nome, []).append(time.perf_counter() - inicio)
+            contagem[nome] = contagem.get(nome, 0) + max(args.lote, 1)
+            if status >= 400 and status != 404:
+                erros[nome] = erros.get(nome, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _executar(args):
+    partes = urlsplit(args.url)
+    host, porta = partes.hostname or "127.0.0.1", partes.port or 80
+    latencias, contagem, erros = {}, {}, {}
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(*(_cliente(host, porta, fim, args, latencias, contagem, erros)
+                           for _ in range(args.conexoes)))
+    decorrido = time.perf_counter() - inicio
+
+    todas = [l for valores in latencias.values() for l in valores]
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "url": args.url,
+        "conexoes": args.conexoes,
+        "lote": args.lote,
+        "duracao_s": round(decorrido, 3),
+        "requisicoes_http": len(todas),
+        "operacoes": sum(contagem.values()),
+        "requisicoes_por_s": round(len(todas) / decorrido, 1),
+        "operacoes_por_s": round(sum(contagem.values()) / decorrido, 1),
+        "latencia_ms": {"p50": ms(_percentil(todas, 50)), "p95": ms(_percentil(todas, 95)),
+                        "p99": ms(_percentil(todas, 99)), "max": ms(max(todas, default=0))},
+        "por_operacao": {
+            nome: {"n": len(valores), "p50_ms": ms(_percentil(valores, 50)), "p99_ms": ms(_percentil(valores, 99))}
+            for nome, valores in sorted(latencias.items())
+        },
+        "erros": erros,
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço HTTP/JSON de matrículas.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--conexoes", type=int, default=16, help="Conexões keep-alive simultâneas")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Duração do teste em segundos")
+    parser.add_argument("--lote", type=int, default=1, help="Operações por requisição (usa POST /lote se > 1)")
+    parser.add_argument("--escrita", type=float, default=0.05, help="Proporção de atualizações de status (0 a 1)")
+    parser.add_argument("--max-id", type=int, default=500, help="Maior id de aluno usado nas operações")
+    parser.add_argument("--token", default=TOKEN_API, help="Token do serviço; padrão: variável CEMAC_API_TOKEN")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(asyncio.run(_executar(args)), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
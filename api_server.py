@@ -0,0 +1,500 @@
+import asyncio
+import base64
+import hmac
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from api_client import CABECALHO_TOKEN, TOKEN_API
+from database import TODOS_OS_ANOS, DatabaseManager, PoolEsgotadoError, aluno_para_dict
+from fichas import gerar_ficha_pdf
+from fotos import foto_impressao
+
+# ====================================================================
+# SERVIÇO HTTP/JSON LOCAL SOBRE O DatabaseManager
+# ====================================================================
+#
+# Um único processo abre o matriculas.db e atende as estações (secretaria,
+# financeiro, tablet da portaria) pela rede local, em vez de cada uma abrir o
+# arquivo SQLite via compartilhamento SMB.
+#
+# - HTTP/1.1 sobre asyncio (stdlib), com keep-alive: uma conexão TCP atende
+#   várias requisições seguidas.
+# - Todo acesso ao banco (e a geração de JSON/PDF) roda em um ThreadPoolExecutor
+#   limitado; um semáforo limita quantas requisições podem aguardar na fila.
+# - POST /lote executa várias requisições em uma única ida ao executor.
+# - Por padrão só ouve em 127.0.0.1. Para atender a rede local é preciso um
+#   --host explícito e um token (--token ou CEMAC_API_TOKEN): todo pedido deve
+#   trazer o cabeçalho X-Cemac-Token com ele (em UTF-8), senão recebe 401.
+#
+# Rotas:
+#   GET  /alunos[?offset=&limite=]        lista completa ou paginada
+#   GET  /alunos/busca?q=&turma=          pesquisa por nome/turma
+#   GET  /alunos/lote?ids=1,2,3           vários alunos por id
+#   POST /alunos/lote                     {"ids": [...]}: o mesmo, para listas longas (sem limite de URL)
+#   GET  /alunos/contato?digitos=         alunos da família (CPF ou telefone, só dígitos)
+#   GET  /alunos/{id}                     um aluno: lista na ordem de COLUNAS_ALUNOS (21 campos)
+#   GET  /alunos/{id}/ficha.pdf           ficha de matrícula em PDF
+#   GET  /alunos/{id}/historico           linha do tempo do status: [[momento, código, valor, estação]]
+#   GET  /eventos?dia=AAAA-MM-DD          eventos de status de um dia (todas as estações)
+#   GET  /alunos/fotos?ids=1,2,3          {id: hash da foto} dos alunos que têm foto
+#   POST /alunos/fotos                    {"ids": [...]}: o mesmo, para listas longas
+#   POST /alunos/{id}/foto                {"dados": JPEG em base64, "largura", "altura"} ou {"dados": null}
+#   GET  /fotos/{hash}                    foto guardada (JPEG)
+#   GET  /sugestoes/responsaveis?q=       autocompletar: [[id, nome, telefone]]
+#   GET  /sugestoes/enderecos?q=          autocompletar: [endereço]
+#   GET  /responsaveis/{id}/familia       aluno mais recente com este responsável (para preencher a família)
+#   GET  /alunos/{id}/responsaveis        {"mae"|"pai"|"responsavel": [id, nome, telefone]}
+#   POST /responsaveis/{id}               {"nome", "telefone"}: corrige para todos os irmãos -> {"id": ...}
+#   POST /alunos/{id}/endereco            {"endereco"}: muda o endereço de todos os irmãos
+#   POST /alunos                          {"dados": [16 campos], "estacao"} -> {"id": ...}
+#   POST /alunos/status                   {"ids", "pagamento", "assinatura", "status", "metodo", "estacao"}
+#   GET  /alunos/pendentes_pagamento      alunos com pagamento pendente (conciliação do extrato)
+#   POST /alunos/pagamentos               {"ids", "metodo", "estacao"}: confirma os pagamentos conciliados
+#
+# "estacao" (opcional) é o nome da mesa que fez a alteração, registrado no histórico de status.
+#   GET  /resumo                          totais por turma
+#   GET  /turmas, /relatorio?turma=       dados dos relatórios de turma
+#   GET  /anos                            anos letivos disponíveis (atual e arquivados)
+#   GET  /versao, /alteracoes[?desde=]    versão do banco e feed de alterações
+#
+# /alunos, /alunos/busca, /resumo, /turmas e /relatorio aceitam ?ano=AAAA ou
+# ?ano=todos; sem o parâmetro, valem para o ano letivo atual.
+#   POST /lote                            {"requisicoes": [{"metodo", "caminho", "corpo"}]}
+
+PORTA_PADRAO = 8765
+MAX_CORPO = 4 * 1024 * 1024  # fotos chegam em base64 (ver fotos.LADO_MAXIMO)
+
+STATUS_TEXTO = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class ErroHTTP(Exception):
+    """Erro a ser devolvido ao cliente com o status HTTP indicado."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def _inteiro(valor, nome):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErroHTTP(400, f"Parâmetro '{nome}' deve ser inteiro.")
+
+
+def _ids(consulta, corpo):
+    """Lista de ids: {"ids": [...]} no corpo (POST) ou ?ids=1,2,3 (GET)."""
+    if corpo is not None:
+        ids = corpo.get("ids") if isinstance(corpo, dict) else None
+        if not isinstance(ids, list):
+            raise ErroHTTP(400, "Envie {'ids': [...]}.")
+        return [_inteiro(i, "ids") for i in ids]
+    return [_inteiro(i, "ids") for i in consulta.get("ids", "").split(",") if i]
+
+
+def _ano(consulta):
+    """Parâmetro ?ano=: ausente é o ano letivo atual (None), 'todos' abrange os anos arquivados."""
+    valor = consulta.get("ano")
+    if not valor:
+        return None
+    if valor == "todos":
+        return TODOS_OS_ANOS
+    return _inteiro(valor, "ano")
+
+
+class ServicoMatriculas:
+    """Traduz requisições HTTP em chamadas ao DatabaseManager. Roda nas threads do executor."""
+
+    def __init__(self, db):
+        self.db = db
+        self._rotas = [
+            ("GET", re.compile(r"/alunos"), self.listar),
+            ("GET", re.compile(r"/alunos/busca"), self.buscar),
+            ("GET", re.compile(r"/alunos/lote"), self.por_ids),
+            ("POST", re.compile(r"/alunos/lote"), self.por_ids),
+            ("GET", re.compile(r"/alunos/contato"), self.por_contato),
+            ("GET", re.compile(r"/alunos/(\d+)"), self.por_id),
+            ("GET", re.compile(r"/alunos/(\d+)/ficha\.pdf"), self.ficha_pdf),
+            ("GET", re.compile(r"/alunos/(\d+)/historico"), self.historico),
+            ("GET", re.compile(r"/eventos"), self.eventos_dia),
+            ("GET", re.compile(r"/alunos/fotos"), self.fotos_hashes),
+            ("POST", re.compile(r"/alunos/fotos"), self.fotos_hashes),
+            ("POST", re.compile(r"/alunos/(\d+)/foto"), self.salvar_foto),
+            ("GET", re.compile(r"/fotos/([0-9a-f]{64})"), self.foto),
+            ("POST", re.compile(r"/alunos"), self.inserir),
+            ("POST", re.compile(r"/alunos/status"), self.atualizar_status),
+            ("GET", re.compile(r"/alunos/pendentes_pagamento"), self.pendentes_pagamento),
+            ("POST", re.compile(r"/alunos/pagamentos"), self.confirmar_pagamentos),
+            ("GET", re.compile(r"/sugestoes/responsaveis"), self.sugerir_responsaveis),
+            ("GET", re.compile(r"/sugestoes/enderecos"), self.sugerir_enderecos),
+            ("GET", re.compile(r"/responsaveis/(\d+)/familia"), self.familia_responsavel),
+            ("GET", re.compile(r"/alunos/(\d+)/responsaveis"), self.responsaveis),
+            ("POST", re.compile(r"/responsaveis/(\d+)"), self.atualizar_responsavel),
+            ("POST", re.compile(r"/alunos/(\d+)/endereco"), self.atualizar_endereco),
+            ("GET", re.compile(r"/resumo"), self.resumo),
+            ("GET", re.compile(r"/turmas"), self.turmas),
+            ("GET", re.compile(r"/relatorio"), self.relatorio),
+            ("GET", re.compile(r"/anos"), self.anos),
+            ("GET", re.compile(r"/versao"), self.versao),
+            ("GET", re.compile(r"/alteracoes"), self.alteracoes),
+            ("POST", re.compile(r"/lote"), self.lote),
+        ]
+
+    # --- Despacho ---
+
+    def processar(self, metodo, alvo, corpo):
+        """Processa uma requisição completa. Retorna (status, content-type, bytes)."""
+        try:
+            status, resultado = self._despachar(metodo, alvo, corpo)
+        except ErroHTTP as e:
+            status, resultado = e.status, {"erro": e.mensagem}
+        except PoolEsgotadoError as e:
+            # Todas as conexões ocupadas: a estação pode tentar de novo em seguida
+            status, resultado = 503, {"erro": str(e)}
+        except Exception as e:
+            print(f"Erro na API ({metodo} {alvo}): {e}")
+            status, resultado = 500, {"erro": str(e)}
+
+        if isinstance(resultado, bytes):
+            return status, "application/pdf" if resultado.startswith(b"%PDF") else "image/jpeg", resultado
+        return status, "application/json; charset=utf-8", json.dumps(resultado, ensure_ascii=False).encode("utf-8")
+
+    def _despachar(self, metodo, alvo, corpo):
+        partes = urlsplit(alvo)
+        consulta = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+        if isinstance(corpo, (bytes, bytearray)):
+            try:
+                corpo = json.loads(corpo) if corpo else None
+            except ValueError:
+                raise ErroHTTP(400, "Corpo da requisição não é um JSON válido.")
+
+        caminho_existe = False
+        for metodo_rota, padrao, handler in self._rotas:
+            encontrado = padrao.fullmatch(partes.path)
+            if not encontrado:
+                continue
+            caminho_existe = True
+            if metodo_rota == metodo:
+                return handler(consulta, corpo, *encontrado.groups())
+        if caminho_existe:
+            raise ErroHTTP(405, f"Método {metodo} não permitido em {partes.path}.")
+        raise ErroHTTP(404, f"Rota não encontrada: {partes.path}")
+
+    # --- Handlers (retornam (status, resultado JSON-serializável ou bytes)) ---
+
+    def listar(self, consulta, corpo):
+        if "limite" in consulta or "offset" in consulta:
+            offset = _inteiro(consulta.get("offset", 0), "offset")
+            limite = _inteiro(consulta.get("limite", 50), "limite")
+            return 200, self.db.get_alunos_pagina(offset, limite, _ano(consulta))
+        return 200, self.db.get_alunos(_ano(consulta))
+
+    def buscar(self, consulta, corpo):
+        return 200, self.db.search_alunos(consulta.get("q") or None, consulta.get("turma") or None, _ano(consulta))
+
+    def por_ids(self, consulta, corpo):
+        return 200, self.db.get_alunos_by_ids(_ids(consulta, corpo))
+
+    def por_contato(self, consulta, corpo):
+        return 200, self.db.find_by_contact(consulta.get("digitos", ""))
+
+    def por_id(self, consulta, corpo, aluno_id):
+        aluno = self.db.get_aluno_by_id(int(aluno_id))
+        if not aluno:
+            raise ErroHTTP(404, f"Aluno {aluno_id} não encontrado.")
+        return 200, aluno
+
+    def ficha_pdf(self, consulta, corpo, aluno_id):
+        aluno = self.db.get_aluno_by_id(int(aluno_id))
+        if not aluno:
+            raise ErroHTTP(404, f"Aluno {aluno_id} não encontrado.")
+        foto = foto_impressao(self.db.get_foto_hash(int(aluno_id)), self.db.get_foto)
+        return 200, gerar_ficha_pdf(aluno_para_dict(aluno), foto)
+
+    def historico(self, consulta, corpo, aluno_id):
+        return 200, self.db.get_historico(int(aluno_id))
+
+    def eventos_dia(self, consulta, corpo):
+        try:
+            dia = datetime.strptime(consulta.get("dia", ""), "%Y-%m-%d").date()
+        except ValueError:
+            raise ErroHTTP(400, "Informe o dia como ?dia=AAAA-MM-DD.")
+        return 200, self.db.get_eventos_dia(dia)
+
+    def fotos_hashes(self, consulta, corpo):
+        ids = _ids(consulta, corpo)
+        return 200, {str(aluno_id): hash_foto for aluno_id, hash_foto in self.db.get_fotos_hashes(ids).items()}
+
+    def salvar_foto(self, consulta, corpo, aluno_id):
+        corpo = corpo or {}
+        if corpo.get("dados") is None:
+            if not self.db.remover_foto(int(aluno_id)):
+                raise ErroHTTP(500, "Falha ao remover a foto.")
+            return 200, {"hash": None}
+        try:
+            dados = base64.b64decode(corpo["dados"], validate=True)
+        except (TypeError, ValueError):
+            raise ErroHTTP(400, "Envie a foto em base64 no campo 'dados'.")
+        hash_foto = self.db.salvar_foto(int(aluno_id), dados, corpo.get("largura"), corpo.get("altura"))
+        if not hash_foto:
+            raise ErroHTTP(500, "Falha ao salvar a foto.")
+        return 200, {"hash": hash_foto}
+
+    def foto(self, consulta, corpo, hash_foto):
+        dados = self.db.get_foto(hash_foto)
+        if dados is None:
+            raise ErroHTTP(404, "Foto não encontrada.")
+        return 200, dados
+
+    def inserir(self, consulta, corpo):
+        dados = (corpo or {}).get("dados")
+        if not isinstance(dados, list) or len(dados) != 16:
+            raise ErroHTTP(400, "Envie {'dados': [...]} com os 16 campos da matrícula.")
+        aluno_id = self.db.insert_aluno(tuple(dados), corpo.get("estacao"))
+        if not aluno_id:
+            raise ErroHTTP(500, "Falha ao salvar a matrícula.")
+        return 201, {"id": aluno_id}
+
+    def atualizar_status(self, consulta, corpo):
+        corpo = corpo or {}
+        try:
+            ids = [int(i) for i in corpo["ids"]]
+            args = (int(corpo["pagamento"]), int(corpo["assinatura"]), corpo["status"])
+        except (KeyError, TypeError, ValueError):
+            raise ErroHTTP(400, "Envie 'ids', 'pagamento', 'assinatura' e 'status'.")
+        if not self.db.update_status_many(ids, *args, corpo.get("metodo"), corpo.get("estacao")):
+            raise ErroHTTP(500, "Falha ao atualizar o status das matrículas.")
+        return 200, {"atualizados": len(ids)}
+
+    def pendentes_pagamento(self, consulta, corpo):
+        return 200, list(self.db.iter_pendentes_pagamento())
+
+    def confirmar_pagamentos(self, consulta, corpo):
+        corpo = corpo or {}
+        try:
+            ids = [int(i) for i in corpo["ids"]]
+        except (KeyError, TypeError, ValueError):
+            raise ErroHTTP(400, "Envie 'ids' (e opcionalmente 'metodo').")
+        if not self.db.confirmar_pagamentos(ids, corpo.get("metodo"), corpo.get("estacao")):
+            raise ErroHTTP(500, "Falha ao confirmar os pagamentos.")
+        return 200, {"atualizados": len(ids)}
+
+    def sugerir_responsaveis(self, consulta, corpo):
+        return 200, self.db.sugerir_responsaveis(consulta.get("q", ""), _inteiro(consulta.get("limite", 8), "limite"))
+
+    def sugerir_enderecos(self, consulta, corpo):
+        return 200, self.db.sugerir_enderecos(consulta.get("q", ""), _inteiro(consulta.get("limite", 8), "limite"))
+
+    def familia_responsavel(self, consulta, corpo, responsavel_id):
+        aluno = self.db.get_familia_responsavel(int(responsavel_id))
+        if not aluno:
+            raise ErroHTTP(404, f"Nenhum aluno com o responsável {responsavel_id}.")
+        return 200, aluno
+
+    def responsaveis(self, consulta, corpo, aluno_id):
+        responsaveis = self.db.get_responsaveis(int(aluno_id))
+        if responsaveis is None:
+            raise ErroHTTP(404, f"Aluno {aluno_id} não está no ano letivo atual.")
+        return 200, responsaveis
+
+    def atualizar_responsavel(self, consulta, corpo, responsavel_id):
+        corpo = corpo or {}
+        if not isinstance(corpo.get("nome"), str):
+            raise ErroHTTP(400, "Envie 'nome' (e opcionalmente 'telefone').")
+        novo_id = self.db.update_responsavel(int(responsavel_id), corpo["nome"], corpo.get("telefone"))
+        if novo_id is False:
+            raise ErroHTTP(500, "Falha ao atualizar o responsável.")
+        return 200, {"id": novo_id}
+
+    def atualizar_endereco(self, consulta, corpo, aluno_id):
+        if not self.db.update_endereco(int(aluno_id), (corpo or {}).get("endereco")):
+            raise ErroHTTP(500, f"Falha ao atualizar o endereço do aluno {aluno_id}.")
+        return 200, {"atualizado": True}
+
+    def resumo(self, consulta, corpo):
+        return 200, [
+            {"turma": turma, "total": total, "efetivadas": efetivadas, "pagamentos_pendentes": pendentes}
+            for turma, total, efetivadas, pendentes in self.db.get_resumo(_ano(consulta))
+        ]
+
+    def turmas(self, consulta, corpo):
+        return 200, self.db.get_turmas(_ano(consulta))
+
+    def relatorio(self, consulta, corpo):
+        return 200, list(self.db.iter_alunos_relatorio(consulta.get("turma") or None, ano=_ano(consulta)))
+
+    def anos(self, consulta, corpo):
+        return 200, {"atual": self.db.ano_letivo, "anos": self.db.anos_letivos()}
+
+    def versao(self, consulta, corpo):
+        return 200, {"versao": self.db.versao_dados()}
+
+    def alteracoes(self, consulta, corpo):
+        if "desde" not in consulta:
+            return 200, {"ultima_seq": self.db.get_ultima_alteracao()}
+        alteracoes = self.db.get_alteracoes_desde(_inteiro(consulta["desde"], "desde"))
+        if alteracoes is None:
+            return 200, {"recarregar": True}
+        ultima_seq, alterados, removidos = alteracoes
+        return 200, {"ultima_seq": ultima_seq, "alterados": alterados, "removidos": removidos}
+
+    def lote(self, consulta, corpo):
+        requisicoes = (corpo or {}).get("requisicoes")
+        if not isinstance(requisicoes, list):
+            raise ErroHTTP(400, "Envie {'requisicoes': [{'metodo', 'caminho', 'corpo'}, ...]}.")
+        respostas = []
+        for req in requisicoes:
+            try:
+                if req.get("caminho", "").startswith("/lote"):
+                    raise ErroHTTP(400, "Lotes aninhados não são permitidos.")
+                status, resultado = self._despachar(req.get("metodo", "GET"), req.get("caminho", ""), req.get("corpo"))
+                if isinstance(resultado, bytes):
+                    raise ErroHTTP(400, "Conteúdo binário (PDF, foto) não pode ser pedido em lote.")
+            except ErroHTTP as e:
+                status, resultado = e.status, {"erro": e.mensagem}
+            respostas.append({"status": status, "corpo": resultado})
+        return 200, {"respostas": respostas}
+
+
+class ServidorAPI:
+    """Servidor HTTP/1.1 asyncio com keep-alive; o trabalho de banco roda em um executor limitado."""
+
+    def __init__(self, servico, host="127.0.0.1", porta=PORTA_PADRAO, max_workers=4,
+                 max_pendentes=64, timeout_ocioso=30.0, token=None):
+        self.servico = servico
+        self.host = host
+        self.porta = porta
+        self.token = token.encode("utf-8") if token else None
+        self.max_pendentes = max_pendentes
+        self.timeout_ocioso = timeout_ocioso
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cemac-api")
+        self._vagas = None
+        self._servidor = None
+
+    async def iniciar(self):
+        self._vagas = asyncio.Semaphore(self.max_pendentes)
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        return self._servidor
+
+    async def servir(self):
+        servidor = await self.iniciar()
+        enderecos = ", ".join(str(s.getsockname()) for s in servidor.sockets)
+        print(f"API CEMAC ouvindo em {enderecos}")
+        async with servidor:
+            await servidor.serve_forever()
+
+    def fechar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+        self.executor.shutdown(wait=True)
+
+    async def _atender(self, reader, writer):
+        """Atende uma conexão TCP: várias requisições em sequência enquanto houver keep-alive."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    linha = await asyncio.wait_for(reader.readline(), self.timeout_ocioso)
+                except asyncio.TimeoutError:
+                    break
+                if not linha.strip():
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(writer, 400, "application/json", b'{"erro": "Requisicao invalida."}', False)
+                    break
+
+                cabecalhos = {}
+                while True:
+                    cabecalho = await reader.readline()
+                    if cabecalho in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = cabecalho.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                conexao = cabecalhos.get("connection", "").lower()
+                manter = conexao == "keep-alive" if versao == "HTTP/1.0" else conexao != "close"
+
+                if self.token is not None and not hmac.compare_digest(
+                        cabecalhos.get(CABECALHO_TOKEN.lower(), "").encode("latin-1"), self.token):
+                    await self._responder(writer, 401, "application/json", b'{"erro": "Token ausente ou invalido."}', False)
+                    break
+
+                try:
+                    tamanho = int(cabecalhos.get("content-length", 0) or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self._responder(writer, 400, "application/json", b'{"erro": "Content-Length invalido."}', False)
+                    break
+                if tamanho > MAX_CORPO:
+                    await self._responder(writer, 413, "application/json", b'{"erro": "Corpo muito grande."}', False)
+                    break
+                corpo = await reader.readexactly(tamanho) if tamanho else b""
+
+                async with self._vagas:
+                    status, tipo, dados = await loop.run_in_executor(
+                        self.executor, self.servico.processar, metodo, alvo, corpo)
+                await self._responder(writer, status, tipo, dados, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _responder(self, writer, status, tipo, dados, manter):
+        cabecalho = (
+            f"HTTP/1.1 {status} {STATUS_TEXTO.get(status, '')}\r\n"
+            f"Content-Type: {tipo}\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+        )
+        writer.write(cabecalho.encode("latin-1") + dados)
+        await writer.drain()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON do banco de matrículas CEMAC.")
+    parser.add_argument("--db", default="matriculas.db", help="Arquivo do banco (padrão: matriculas.db)")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Endereço de escuta (padrão: só esta máquina; use 0.0.0.0 para a rede local)")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--workers", type=int, default=4, help="Threads de acesso ao banco")
+    parser.add_argument("--token", default=TOKEN_API,
+                        help=f"Segredo exigido no cabeçalho {CABECALHO_TOKEN}; padrão: variável CEMAC_API_TOKEN")
+    args = parser.parse_args(argv)
+    if not args.token and args.host not in ("127.0.0.1", "localhost", "::1"):
+        parser.error("para ouvir na rede local informe --token (ou a variável CEMAC_API_TOKEN)")
+
+    # Cada thread do executor usa uma conexão de cada pool; sobra folga para a thread principal
+    conexoes = args.workers + 2
+    db = DatabaseManager(args.db, max_conexoes=conexoes, max_leitores=conexoes, max_relatorios=conexoes)
+    servidor = ServidorAPI(ServicoMatriculas(db), args.host, args.porta, max_workers=args.workers, token=args.token)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.fechar()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
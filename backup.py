@@ -0,0 +1,351 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from database import listar_arquivos_anuais
+
+# ====================================================================
+# BACKUP ONLINE DO BANCO DE MATRÍCULAS
+# ====================================================================
+#
+# Usa a API de backup do sqlite3 (Connection.backup) copiando poucas
+# páginas por vez, de modo que a aplicação continua lendo e gravando no
+# banco enquanto a cópia acontece. Cada snapshot é verificado com
+# PRAGMA integrity_check, comprimido com gzip e sujeito a regras de
+# retenção (últimos N, um por dia, um por mês).
+#
+# Os arquivos de anos encerrados (matriculas_2025.db, ver
+# DatabaseManager.arquivar_ano) são copiados para backups/arquivos/ junto com
+# o snapshot, mas só quando mudam: um arquivo novo, ou reaberto para receber
+# matrículas atrasadas, é copiado de novo; os demais ficam como estão. Cada
+# arquivo tem uma única cópia (a mais recente, que contém todas as anteriores);
+# para restaurar um ano, basta descomprimi-la ao lado do banco.
+#
+# Restaurar troca o arquivo do banco inteiro: só é feito com o programa e o
+# api_server fechados em todas as estações, que depois precisam ser reabertos.
+
+PREFIXO_SNAPSHOT = "matriculas_"
+EXTENSAO_SNAPSHOT = ".db.gz"
+PASTA_ARQUIVOS = "arquivos"
+FORMATO_DATA = "%Y%m%d_%H%M%S"
+
+
+class BackupError(Exception):
+    """Falha ao criar, verificar ou restaurar um snapshot."""
+
+
+def verificar_banco(db_path):
+    """Executa PRAGMA integrity_check em um arquivo .db não comprimido. Retorna True se 'ok'."""
+    # as_uri() escapa '?', '#' e '%' no caminho (ex.: pastas do OneDrive), que quebrariam a URI
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        resultado = conn.execute("PRAGMA integrity_check").fetchone()
+        return resultado is not None and resultado[0] == "ok"
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+class BackupManager:
+    """Cria, verifica, rotaciona e restaura snapshots comprimidos do banco."""
+
+    def __init__(self, db_name="matriculas.db", backup_dir=None,
+                 manter_ultimos=5, manter_diarios=14, manter_mensais=12,
+                 paginas_por_passo=64, pausa_entre_passos=0.005):
+        self.db_name = db_name
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(os.path.abspath(db_name)), "backups")
+        self.manter_ultimos = manter_ultimos
+        self.manter_diarios = manter_diarios
+        self.manter_mensais = manter_mensais
+        self.paginas_por_passo = paginas_por_passo
+        self.pausa_entre_passos = pausa_entre_passos
+
+        # Estado do backup em segundo plano (lido pela UI via after())
+        self._lock = threading.Lock()
+        self._thread = None
+        self.progresso = (0, 0)  # (páginas copiadas, total de páginas)
+        self.ultimo_resultado = None  # caminho do snapshot criado
+        self.ultimo_erro = None
+
+    # --- Criação ---
+
+    def criar_snapshot(self, progresso=None):
+        """
+        Copia o banco página a página, verifica a integridade, comprime e aplica a retenção.
+        Retorna o caminho do snapshot .db.gz criado.
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        nome = f"{PREFIXO_SNAPSHOT}{datetime.now().strftime(FORMATO_DATA)}"
+        # Dois snapshots no mesmo segundo (ex.: segurança antes de restaurar) não podem colidir
+        sufixo = 1
+        while os.path.exists(os.path.join(self.backup_dir, nome + EXTENSAO_SNAPSHOT)):
+            nome = f"{nome.split('-')[0]}-{sufixo}"
+            sufixo += 1
+        destino = os.path.join(self.backup_dir, nome + EXTENSAO_SNAPSHOT)
+
+        def _progresso(status, restantes, total):
+            self.progresso = (total - restantes, total)
+            if progresso:
+                progresso(total - restantes, total)
+
+        self._copiar_comprimido(self.db_name, destino, _progresso)
+        self.copiar_arquivos_anuais()
+        self.aplicar_retencao()
+        return destino
+
+    def _copiar_comprimido(self, origem_path, destino, progresso=None):
+        """Copia um banco pela API de backup, verifica a cópia e grava 'destino' (.gz) de forma atômica."""
+        parcial = destino[:-len(".gz")] + ".parcial"
+        try:
+            # Conexões próprias desta thread: sqlite3 não permite compartilhar a da UI
+            origem = sqlite3.connect(origem_path)
+            copia = sqlite3.connect(parcial)
+            try:
+                origem.backup(copia, pages=self.paginas_por_passo,
+                              progress=progresso, sleep=self.pausa_entre_passos)
+            finally:
+                copia.close()
+                origem.close()
+
+            if not verificar_banco(parcial):
+                raise BackupError(f"Snapshot corrompido (integrity_check falhou): {parcial}")
+
+            with open(parcial, "rb") as f_in, gzip.open(destino + ".tmp", "wb", compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.replace(destino + ".tmp", destino)
+        finally:
+            for resto in (parcial, destino + ".tmp"):
+                if os.path.exists(resto):
+                    os.remove(resto)
+
+    def copiar_arquivos_anuais(self):
+        """
+        Copia para backups/arquivos/ os arquivos de anos encerrados que ainda não têm cópia, ou que
+        mudaram depois dela (rearquivamento). Retorna os caminhos das cópias criadas.
+        """
+        pasta = os.path.join(self.backup_dir, PASTA_ARQUIVOS)
+        copiados = []
+        for ano, caminho in sorted(listar_arquivos_anuais(self.db_name).items()):
+            destino = os.path.join(pasta, os.path.basename(caminho) + ".gz")
+            if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(caminho):
+                continue
+            os.makedirs(pasta, exist_ok=True)
+            self._copiar_comprimido(caminho, destino)
+            copiados.append(destino)
+        return copiados
+
+    def listar_arquivos_anuais(self):
+        """Retorna [(caminho da cópia, ano)] dos arquivos de anos encerrados já copiados."""
+        pasta = os.path.join(self.backup_dir, PASTA_ARQUIVOS)
+        if not os.path.isdir(pasta):
+            return []
+        copias = []
+        for nome in sorted(os.listdir(pasta)):
+            ano = nome[:-len(EXTENSAO_SNAPSHOT)].rsplit("_", 1)[-1]
+            if nome.endswith(EXTENSAO_SNAPSHOT) and ano.isdigit():
+                copias.append((os.path.join(pasta, nome), int(ano)))
+        return copias
+
+    def iniciar_backup_async(self):
+        """
+        Dispara criar_snapshot() em uma thread daemon. Retorna False se já houver um backup em andamento.
+        A UI deve consultar em_andamento()/progresso/ultimo_erro periodicamente com after().
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.progresso = (0, 0)
+            self.ultimo_resultado = None
+            self.ultimo_erro = None
+            self._thread = threading.Thread(target=self._executar_backup, name="cemac-backup", daemon=True)
+            self._thread.start()
+            return True
+
+    def _executar_backup(self):
+        try:
+            self.ultimo_resultado = self.criar_snapshot()
+        except Exception as e:
+            self.ultimo_erro = e
+
+    def em_andamento(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def backup_necessario(self, intervalo_horas=24):
+        """Indica se o snapshot mais recente é mais antigo que o intervalo informado."""
+        snapshots = self.listar_snapshots()
+        if not snapshots:
+            return True
+        return (datetime.now() - snapshots[0][1]).total_seconds() > intervalo_horas * 3600
+
+    # --- Listagem e Retenção ---
+
+    def listar_snapshots(self):
+        """Retorna [(caminho, datetime)] do mais recente para o mais antigo."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        snapshots = []
+        for nome in os.listdir(self.backup_dir):
+            if not (nome.startswith(PREFIXO_SNAPSHOT) and nome.endswith(EXTENSAO_SNAPSHOT)):
+                continue
+            carimbo = nome[len(PREFIXO_SNAPSHOT):-len(EXTENSAO_SNAPSHOT)].split("-")[0]
+            try:
+                quando = datetime.strptime(carimbo, FORMATO_DATA)
+            except ValueError:
+                continue
+            snapshots.append((os.path.join(self.backup_dir, nome), quando))
+        snapshots.sort(key=lambda s: s[1], reverse=True)
+        return snapshots
+
+    def aplicar_retencao(self):
+        """
+        Mantém os últimos N snapshots, o mais recente de cada um dos últimos dias
+        e o mais recente de cada um dos últimos meses. Remove o restante.
+        """
+        snapshots = self.listar_snapshots()
+        manter = set(caminho for caminho, _ in snapshots[:self.manter_ultimos])
+
+        dias, meses = set(), set()
+        for caminho, quando in snapshots:
+            dia = quando.date()
+            if dia not in dias and len(dias) < self.manter_diarios:
+                dias.add(dia)
+                manter.add(caminho)
+            mes = (quando.year, quando.month)
+            if mes not in meses and len(meses) < self.manter_mensais:
+                meses.add(mes)
+                manter.add(caminho)
+
+        removidos = []
+        for caminho, _ in snapshots:
+            if caminho not in manter:
+                os.remove(caminho)
+                removidos.append(caminho)
+        return removidos
+
+    # --- Verificação e Restauração ---
+
+    def _descomprimir(self, snapshot_path):
+        destino = snapshot_path[:-len(".gz")] + ".verificando"
+        with gzip.open(snapshot_path, "rb") as f_in, open(destino, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        return destino
+
+    def verificar_snapshot(self, snapshot_path):
+        """Descomprime o snapshot para um arquivo temporário e executa integrity_check."""
+        try:
+            temporario = self._descomprimir(snapshot_path)
+        except (OSError, EOFError):
+            return False
+        try:
+            return verificar_banco(temporario)
+        finally:
+            os.remove(temporario)
+
+    def _garantir_banco_fechado(self):
+        """Levanta BackupError se alguma conexão (uma estação, o api_server) estiver com o banco aberto."""
+        if not os.path.exists(self.db_name):
+            return
+        conn = sqlite3.connect(self.db_name, timeout=0)
+        try:
+            # Sair do modo WAL exige acesso exclusivo: falha se outra conexão tem o banco aberto.
+            # Também não sobra um -wal/-shm que o SQLite aplicaria por cima do arquivo restaurado.
+            conn.execute("PRAGMA journal_mode = DELETE")
+        except sqlite3.OperationalError:
+            raise BackupError("O banco está em uso. Feche o programa em todas as estações e o api_server "
+                              "antes de restaurar.")
+        finally:
+            conn.close()
+
+    def restaurar(self, snapshot_path):
+        """
+        Restaura o snapshot no lugar do banco atual. Só roda com o banco fechado em todas as estações
+        e no api_server (senão BackupError): quem estivesse aberto continuaria com conexões e caches
+        do banco antigo. Antes, um snapshot de segurança do estado atual é criado. O banco restaurado
+        é montado em um arquivo ao lado e trocado de uma vez (os.replace): uma falha no meio deixa o
+        banco atual intacto. Depois, reabra o programa nas estações (e o api_server).
+        """
+        if not os.path.exists(snapshot_path):
+            raise BackupError(f"Snapshot não encontrado: {snapshot_path}")
+
+        temporario = self._descomprimir(snapshot_path)
+        novo = self.db_name + ".restaurando"
+        try:
+            if not verificar_banco(temporario):
+                raise BackupError(f"Snapshot corrompido, restauração cancelada: {snapshot_path}")
+
+            self._garantir_banco_fechado()
+            seguranca = self.criar_snapshot() if os.path.exists(self.db_name) else None
+
+            shutil.copyfile(temporario, novo)
+            with open(novo, "rb+") as f:
+                os.fsync(f.fileno())
+            # De novo logo antes da troca: alguém pode ter aberto o programa durante o snapshot de segurança
+            self._garantir_banco_fechado()
+            try:
+                os.replace(novo, self.db_name)
+            except OSError as e:
+                # No Windows, outro processo com o arquivo aberto impede a troca
+                raise BackupError(f"Não foi possível substituir o banco: {e}")
+            return seguranca
+        finally:
+            for resto in (temporario, novo):
+                if os.path.exists(resto):
+                    os.remove(resto)
+
+
+# ====================================================================
+# LINHA DE COMANDO: python backup.py [criar|listar|verificar|restaurar]
+# ====================================================================
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backup do banco de matrículas CEMAC.")
+    parser.add_argument("--db", default="matriculas.db", help="Arquivo do banco (padrão: matriculas.db)")
+    parser.add_argument("--dir", default=None, help="Pasta dos snapshots (padrão: backups/ ao lado do banco)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("criar", help="Cria um novo snapshot comprimido")
+    sub.add_parser("listar", help="Lista os snapshots existentes")
+    p_verificar = sub.add_parser("verificar", help="Verifica a integridade de um snapshot")
+    p_verificar.add_argument("snapshot")
+    p_restaurar = sub.add_parser("restaurar", help="Restaura um snapshot no lugar do banco atual "
+                                                   "(feche o programa nas estações e o api_server antes)")
+    p_restaurar.add_argument("snapshot")
+    args = parser.parse_args(argv)
+
+    manager = BackupManager(args.db, backup_dir=args.dir)
+
+    if args.comando == "criar":
+        inicio = time.perf_counter()
+        caminho = manager.criar_snapshot()
+        print(f"Snapshot criado: {caminho} ({time.perf_counter() - inicio:.2f}s)")
+    elif args.comando == "listar":
+        for caminho, quando in manager.listar_snapshots():
+            print(f"{quando:%d/%m/%Y %H:%M:%S}  {os.path.getsize(caminho):>10} bytes  {caminho}")
+        for caminho, ano in manager.listar_arquivos_anuais():
+            print(f"ano {ano} (arquivo)      {os.path.getsize(caminho):>10} bytes  {caminho}")
+    elif args.comando == "verificar":
+        ok = manager.verificar_snapshot(args.snapshot)
+        print("OK" if ok else "CORROMPIDO")
+        return 0 if ok else 1
+    elif args.comando == "restaurar":
+        try:
+            seguranca = manager.restaurar(args.snapshot)
+        except BackupError as e:
+            print(f"ERRO: {e}")
+            return 1
+        print(f"Banco restaurado a partir de {args.snapshot}. Reabra o programa nas estações (e o api_server).")
+        if seguranca:
+            print(f"Estado anterior salvo em: {seguranca}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimar_bytes(linhas):
+    """Estimativa barata do tamanho em memória de um resultado (lista de tuplas)."""
+    total = sys.getsizeof(linhas)
+    for linha in linhas:
+        total += sys.getsizeof(linha)
+        for valor in linha:
+            total += sys.getsizeof(valor)
+    return total
+
+
+class ResultCache:
+    """
+    Cache LRU de resultados de consultas, limitado por número de entradas e por bytes.
+
+    Chave: (sql, parâmetros). Todas as entradas pertencem a uma "versão" do banco
+    (ver DatabaseManager._versao_dados); quando a versão muda o cache inteiro é
+    descartado, pois qualquer gravação pode afetar qualquer consulta.
+    Os resultados são tuplas de tuplas: quem recebe não consegue alterá-los por engano.
+
+    Caches endereçados pelo conteúdo (ex.: fichas.cache_fichas, chave = hash do que é
+    desenhado) não precisam de versão: usam sempre versao=None e 'tamanho' próprio (len).
+    """
+
+    def __init__(self, max_entradas=64, max_bytes=32 * 1024 * 1024, tamanho=estimar_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._tamanho = tamanho
+        self._entradas = OrderedDict()  # chave -> (resultado, bytes)
+        self._bytes = 0
+        self._versao = None
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def get(self, chave, versao):
+        with self._lock:
+            if versao != self._versao:
+                self._limpar()
+                self._versao = versao
+                self.falhas += 1
+                return None
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[0]
+
+    def put(self, chave, versao, resultado):
+        tamanho = self._tamanho(resultado)
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            if versao != self._versao:
+                # O banco mudou enquanto a consulta rodava: não guarda um resultado possivelmente velho
+                return
+            antigo = self._entradas.pop(chave, None)
+            if antigo is not None:
+                self._bytes -= antigo[1]
+            self._entradas[chave] = (resultado, tamanho)
+            self._bytes += tamanho
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, removidos) = self._entradas.popitem(last=False)
+                self._bytes -= removidos
+
+    def invalidate(self):
+        with self._lock:
+            self._limpar()
+            self._versao = None
+
+    def _limpar(self):
+        self._entradas.clear()
+        self._bytes = 0
@@ -0,0 +1,274 @@
+import sys
+from array import array
+from bisect import bisect_right
+
+# ====================================================================
+# CACHE COLUNAR DA LISTA DE ALUNOS
+# ====================================================================
+#
+# Em vez de guardar cada aluno como uma tupla de 21 campos, a lista guarda só
+# as colunas exibidas, cada uma em sua própria estrutura compacta:
+#
+# - ids em array('q');
+# - turma, status da matrícula, método de pagamento e data da matrícula
+#   codificados por dicionário: cada valor distinto é guardado uma vez e as
+#   linhas guardam apenas um código pequeno (bytearray/array('H'));
+#   turma, status e método começam em bytearray (um byte por linha) e passam
+#   para array('H') se algum deles chegar a mais de 256 valores distintos
+#   (o método de pagamento é texto livre);
+# - nomes em uma lista, mais uma string única em minúsculas ("\n"-separada)
+#   usada na pesquisa por substring.
+#
+# Os filtros devolvem um bitmap (um byte 0/1 por linha), sem copiar linhas.
+# O filtro por turma/status é um bytes.translate (gerado em C), filtros são
+# combinados com AND de inteiros grandes, o total é bitmap.count(1) e só os
+# índices da página exibida são extraídos. A pesquisa por nome usa str.find
+# sobre a string única.
+
+# Posições das colunas nas linhas de 'alunos' (database.COLUNAS_ALUNOS)
+_ID, _NOME, _TURMA, _METODO, _PAGTO, _STATUS, _DATA = 0, 1, 3, 15, 16, 18, 19
+
+
+class Dicionario:
+    """Codificação por dicionário: valor <-> código inteiro pequeno."""
+
+    def __init__(self):
+        self.valores = []
+        self.codigos = {}
+
+    def codificar(self, valor):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = len(self.valores)
+            if isinstance(valor, str):
+                valor = sys.intern(valor)
+            self.valores.append(valor)
+            self.codigos[valor] = codigo
+        return codigo
+
+
+class AlunosColunar:
+    """Lista de alunos em colunas, na ordem da listagem (id decrescente)."""
+
+    def __init__(self):
+        self._limpar()
+
+    def _limpar(self):
+        self.ids = array("q")
+        self.nomes = []
+        self.pagto = bytearray()
+        # Domínios pequenos: até 256 valores distintos cabem em um byte por linha (ver _codigo)
+        self.turmas, self.turma = Dicionario(), bytearray()
+        self.status_dic, self.status = Dicionario(), bytearray()
+        self.metodos, self.metodo = Dicionario(), bytearray()
+        self.datas, self.data = Dicionario(), array("H")
+        self._posicao = {}
+        self._busca = None  # (texto em minúsculas, offsets de início de cada nome)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Carga e Atualização ---
+
+    def carregar(self, linhas):
+        """Substitui todo o conteúdo pelas linhas (todos os campos) informadas, já ordenadas por id DESC."""
+        self._limpar()
+        for linha in linhas:
+            self._anexar(linha)
+        self._reindexar()
+
+    def _codigo(self, coluna, dicionario, valor):
+        """Código de 'valor'; a coluna passa de bytearray para array('H') quando o código não cabe em um byte."""
+        codigo = dicionario.codificar(valor)
+        if codigo > 255 and isinstance(getattr(self, coluna), bytearray):
+            setattr(self, coluna, array("H", list(getattr(self, coluna))))
+        return codigo
+
+    def _anexar(self, linha):
+        # Códigos antes do append: _codigo pode trocar o objeto da coluna
+        turma = self._codigo("turma", self.turmas, linha[_TURMA])
+        status = self._codigo("status", self.status_dic, linha[_STATUS])
+        metodo = self._codigo("metodo", self.metodos, linha[_METODO])
+        self.ids.append(linha[_ID])
+        self.nomes.append(linha[_NOME])
+        self.pagto.append(1 if linha[_PAGTO] == 1 else 0)
+        self.turma.append(turma)
+        self.status.append(status)
+        self.metodo.append(metodo)
+        self.data.append(self.datas.codificar(linha[_DATA]))
+
+    def _atribuir(self, i, linha):
+        turma = self._codigo("turma", self.turmas, linha[_TURMA])
+        status = self._codigo("status", self.status_dic, linha[_STATUS])
+        metodo = self._codigo("metodo", self.metodos, linha[_METODO])
+        self.nomes[i] = linha[_NOME]
+        self.pagto[i] = 1 if linha[_PAGTO] == 1 else 0
+        self.turma[i] = turma
+        self.status[i] = status
+        self.metodo[i] = metodo
+        self.data[i] = self.datas.codificar(linha[_DATA])
+
+    def _remover(self, i):
+        for coluna in (self.ids, self.nomes, self.pagto, self.turma, self.status, self.metodo, self.data):
+            del coluna[i]
+
+    def _reindexar(self):
+        self._posicao = {aluno_id: i for i, aluno_id in enumerate(self.ids)}
+        self._busca = None
+
+    def _posicao_decrescente(self, aluno_id):
+        """Onde inserir 'aluno_id' mantendo a ordem por id decrescente: quantos ids são maiores (busca binária)."""
+        baixo, alto = 0, len(self.ids)
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self.ids[meio] > aluno_id:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def aplicar(self, linhas, removidos):
+        """
+        Aplica linhas alteradas/inseridas (todos os campos) e ids removidos.
+        Retorna True se a composição de um filtro pode ter mudado (inserção, remoção,
+        ou mudança de nome/turma) e a lista filtrada precisa ser refeita.
+        """
+        refiltrar = False
+        novos = []
+        for linha in linhas:
+            i = self._posicao.get(linha[_ID])
+            if i is None:
+                novos.append(linha)
+                continue
+            if self.nomes[i] != linha[_NOME] or self.turmas.valores[self.turma[i]] != linha[_TURMA]:
+                refiltrar = True
+                self._busca = None
+            self._atribuir(i, linha)
+
+        removidos = [self._posicao[aluno_id] for aluno_id in removidos if aluno_id in self._posicao]
+        for i in sorted(removidos, reverse=True):
+            self._remover(i)
+        for linha in sorted(novos, key=lambda l: l[_ID]):
+            i = self._posicao_decrescente(linha[_ID])
+            for coluna in (self.ids, self.nomes, self.pagto, self.turma, self.status, self.metodo, self.data):
+                coluna.insert(i, 0)
+            self.ids[i] = linha[_ID]
+            self._atribuir(i, linha)
+
+        if novos or removidos:
+            self._reindexar()
+            refiltrar = True
+        return refiltrar
+
+    # --- Consulta ---
+
+    def posicao(self, aluno_id):
+        return self._posicao.get(aluno_id)
+
+    def status_de(self, aluno_id):
+        i = self._posicao.get(aluno_id)
+        return None if i is None else self.status_dic.valores[self.status[i]]
+
+    def exibicao(self, i):
+        """(ID, Nome, Turma, MatriculaEm, Status, Pagto) da linha i, no formato da Treeview."""
+        return (self.ids[i], self.nomes[i], self.turmas.valores[self.turma[i]], self.datas.valores[self.data[i]],
+                self.status_dic.valores[self.status[i]], "Pago" if self.pagto[i] else "PENDENTE")
+
+    def _mascara_categoria(self, coluna, dicionario, valor):
+        """Máscara bytes 0/1 das linhas cuja coluna categórica é 'valor' (translate roda em C)."""
+        codigo = dicionario.codigos.get(valor)
+        if codigo is None:
+            return bytes(len(coluna))
+        if isinstance(coluna, bytearray):
+            tabela = bytearray(256)
+            tabela[codigo] = 1
+            return coluna.translate(tabela)
+        # array('H'): compara o byte baixo e o alto de cada código separadamente (fatias e translate em C)
+        dados = coluna.tobytes()
+        baixos, altos = (dados[0::2], dados[1::2]) if sys.byteorder == "little" else (dados[1::2], dados[0::2])
+        tabela_baixo, tabela_alto = bytearray(256), bytearray(256)
+        tabela_baixo[codigo & 0xFF] = 1
+        tabela_alto[codigo >> 8] = 1
+        mascara = int.from_bytes(baixos.translate(tabela_baixo), "little") & int.from_bytes(
+            altos.translate(tabela_alto), "little")
+        return mascara.to_bytes(len(coluna), "little")
+
+    def _mascara_nome(self, termo):
+        """Máscara bytes 0/1 das linhas cujo nome contém 'termo' (sem diferenciar maiúsculas)."""
+        if self._busca is None:
+            # Offsets medidos nos nomes JÁ em minúsculas: lower() pode mudar o tamanho ("İ" vira 2 caracteres)
+            minusculos = [nome.lower() for nome in self.nomes]
+            offsets, posicao = array("l"), 0
+            for nome in minusculos:
+                offsets.append(posicao)
+                posicao += len(nome) + 1
+            self._busca = ("\n".join(minusculos), offsets)
+        texto, offsets = self._busca
+
+        mascara = bytearray(len(self.ids))
+        inicio = texto.find(termo)
+        while inicio != -1:
+            i = bisect_right(offsets, inicio) - 1
+            mascara[i] = 1
+            # Pula para o próximo nome: cada linha só precisa ser marcada uma vez
+            proximo = offsets[i + 1] if i + 1 < len(offsets) else len(texto)
+            inicio = texto.find(termo, proximo)
+        return mascara
+
+    def _mascara_ids(self, ids):
+        """Máscara bytes 0/1 das linhas cujos ids estão em 'ids' (ex.: resultado de uma busca no banco)."""
+        mascara = bytearray(len(self.ids))
+        for aluno_id in ids:
+            i = self._posicao.get(aluno_id)
+            if i is not None:
+                mascara[i] = 1
+        return mascara
+
+    def filtrar(self, turma=None, termo=None, status=None, ids=None):
+        """Retorna o bitmap (bytes 0/1 por linha) das linhas que passam em todos os filtros informados."""
+        n = len(self.ids)
+        mascaras = []
+        if ids is not None:
+            mascaras.append(self._mascara_ids(ids))
+        if turma:
+            mascaras.append(self._mascara_categoria(self.turma, self.turmas, turma))
+        if status:
+            mascaras.append(self._mascara_categoria(self.status, self.status_dic, status))
+        if termo:
+            mascaras.append(self._mascara_nome(termo.lower()))
+
+        if not mascaras:
+            return b"\x01" * n
+        mascara = mascaras[0]
+        if len(mascaras) > 1:
+            # AND de todas as máscaras de uma vez, como inteiros grandes (operação em C)
+            combinada = int.from_bytes(mascara, "little")
+            for outra in mascaras[1:]:
+                combinada &= int.from_bytes(outra, "little")
+            mascara = combinada.to_bytes(n, "little")
+        return bytes(mascara)
+
+    @staticmethod
+    def contar(mascara):
+        return mascara.count(1)
+
+    @staticmethod
+    def indices(mascara, inicio, quantidade):
+        """Índices das linhas selecionadas de posição 'inicio' a 'inicio + quantidade' (uma página)."""
+        # Busca binária pela linha do 'inicio'-ésimo 1; cada count() percorre o bitmap em C
+        baixo, alto = 0, len(mascara)
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if mascara.count(1, 0, meio + 1) > inicio:
+                alto = meio
+            else:
+                baixo = meio + 1
+
+        resultado, posicao = [], baixo
+        while len(resultado) < quantidade:
+            posicao = mascara.find(1, posicao)
+            if posicao == -1:
+                break
+            resultado.append(posicao)
+            posicao += 1
+        return resultado
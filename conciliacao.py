@@ -0,0 +1,346 @@
+import csv
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from utils import chave_busca, so_digitos
+
+# ====================================================================
+# CONCILIAÇÃO DE PAGAMENTOS COM O EXTRATO DO BANCO (CSV / OFX)
+# ====================================================================
+#
+# O extrato é lido em streaming (uma linha do CSV, ou uma transação do OFX,
+# por vez) e cada crédito é casado com os alunos de pagamento pendente por
+# junção hash: os pendentes são lidos uma vez e indexados em dicionários
+# (CPF do aluno -> alunos, nome do responsável -> alunos), e cada
+# lançamento custa uma consulta a esses dicionários, nunca uma volta pela
+# lista de alunos. Com o valor da matrícula informado, o valor recebido
+# precisa ser um múltiplo dele (um Pix pode pagar vários irmãos).
+#
+# O cadastro só guarda o CPF do ALUNO (o dos responsáveis não é pedido): o
+# documento do pagador só casa quando a conta está no nome da criança. Por
+# isso o CPF não basta para aceitar uma proposta; o valor precisa conferir.
+#
+# O resultado são propostas para conferência; as aceitas são gravadas de uma
+# vez (DatabaseManager.confirmar_pagamentos: uma transação, um commit).
+
+Lancamento = namedtuple("Lancamento", "linha data valor nome documento descricao")  # valor em centavos
+Proposta = namedtuple("Proposta", "lancamento aluno_ids alunos criterio valor_confere aceitar observacao")
+Resultado = namedtuple("Resultado", "propostas sem_par lidos debitos")
+
+CRITERIO_CPF = "CPF do aluno"
+CRITERIO_NOME = "Nome"
+CRITERIO_NOME_ABREVIADO = "Nome abreviado"
+
+# Cabeçalhos reconhecidos no CSV (já passados por chave_busca), por campo do Lancamento
+CABECALHOS = {
+    "data": ("data", "data lancamento", "data do lancamento", "data movimento", "dt lancamento"),
+    "credito": ("credito", "entrada", "valor credito", "creditos"),
+    "valor": ("valor", "valor (r$)", "valor r$", "montante", "quantia"),
+    "nome": ("nome", "pagador", "nome do pagador", "remetente", "origem", "favorecido", "contraparte",
+             "nome pagador", "depositante"),
+    "documento": ("cpf", "cpf/cnpj", "cpf cnpj", "documento", "documento pagador", "cpf do pagador"),
+    "descricao": ("descricao", "historico", "lancamento", "memo", "detalhe", "detalhes", "complemento"),
+}
+LINHAS_PROCURA_CABECALHO = 30
+
+# Palavras de extrato que não fazem parte do nome do pagador (quando o nome vem na descrição)
+PALAVRAS_BANCARIAS = {
+    "pix", "recebido", "recebida", "receb", "rec", "transferencia", "transf", "ted", "doc", "credito",
+    "cred", "deposito", "dep", "de", "em", "conta", "qr", "code", "codigo", "ag", "cc", "cpf", "cnpj",
+}
+
+# Linhas de saldo/totais que alguns bancos intercalam na tabela (não são lançamentos)
+REGEX_SALDO = re.compile(r"\b(saldo|total|totais)\b")
+FORMATOS_DATA = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y")
+
+REGEX_CPF = re.compile(r"(?<!\d)(\d{3}\.?\d{3}\.?\d{3}-?\d{2})(?!\d)")
+REGEX_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9_.]+)>([^<]*)")
+TAMANHO_BLOCO = 64 * 1024
+
+
+# --- Valores ---
+
+def valor_em_centavos(texto):
+    """
+    '1.234,56', '1234.56', 'R$ -50,00', '(50,00)' -> centavos (int). Levanta ValueError se não for um valor.
+    Com vírgula e ponto, o último separador é o decimal; só com pontos, é decimal se vierem 1 ou 2 dígitos depois.
+    """
+    texto = (texto or "").strip().replace("R$", "").replace(" ", "").replace("\xa0", "")
+    negativo = texto.startswith("-") or (texto.startswith("(") and texto.endswith(")")) or texto.endswith("-")
+    texto = texto.strip("()+-")
+    if not texto or not re.fullmatch(r"[\d.,]+", texto):
+        raise ValueError(f"Valor inválido: '{texto}'")
+    if "," in texto and "." in texto:
+        decimal = "," if texto.rfind(",") > texto.rfind(".") else "."
+    elif "," in texto:
+        decimal = ","
+    elif texto.count(".") == 1 and len(texto.rsplit(".", 1)[1]) <= 2:
+        decimal = "."
+    else:
+        decimal = None
+    if decimal:
+        inteiro, _, centavos = texto.rpartition(decimal)
+    else:
+        inteiro, centavos = texto, ""
+    if len(centavos) > 2:
+        raise ValueError(f"Valor inválido: '{texto}'")
+    valor = int(so_digitos(inteiro) or "0") * 100 + int(centavos.ljust(2, "0") or "0")
+    return -valor if negativo else valor
+
+
+def formatar_valor(centavos):
+    """Centavos -> 'R$ 1.234,56'."""
+    sinal = "-" if centavos < 0 else ""
+    reais, resto = divmod(abs(centavos), 100)
+    return f"{sinal}R$ {reais:,}".replace(",", ".") + f",{resto:02d}"
+
+
+# --- Leitura do extrato (streaming) ---
+
+def _codificacao(caminho):
+    """UTF-8 se o começo do arquivo for UTF-8 válido; senão cp1252 (padrão dos bancos brasileiros)."""
+    with open(caminho, "rb") as f:
+        inicio = f.read(TAMANHO_BLOCO)
+    try:
+        inicio.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Um caractere multibyte cortado no fim do bloco não conta como erro
+        if e.start < len(inicio) - 3:
+            return "cp1252"
+    return "utf-8-sig"
+
+
+def _nome_da_descricao(descricao):
+    """'PIX RECEBIDO - MARIA S SILVA 123.456.789-00' -> 'MARIA S SILVA'."""
+    sem_numeros = REGEX_CPF.sub(" ", descricao or "")
+    palavras = re.sub(r"[^\w\s]|\d|_", " ", sem_numeros).split()
+    # Só nas pontas: 'de' no meio é parte do nome ('Maria de Souza')
+    while palavras and chave_busca(palavras[0]) in PALAVRAS_BANCARIAS:
+        palavras.pop(0)
+    while palavras and chave_busca(palavras[-1]) in PALAVRAS_BANCARIAS:
+        palavras.pop()
+    return " ".join(palavras)
+
+
+def _documento(*textos):
+    """CPF (só dígitos) encontrado em algum dos textos, ou ''."""
+    for texto in textos:
+        encontrado = REGEX_CPF.search(texto or "")
+        if encontrado:
+            return so_digitos(encontrado.group(1))
+    return ""
+
+
+def _data_valida(texto):
+    """True se 'texto' é uma data em um dos FORMATOS_DATA (a hora, se vier, é ignorada)."""
+    texto = (texto or "").strip().split(" ")[0]
+    for formato in FORMATOS_DATA:
+        try:
+            datetime.strptime(texto, formato)
+            return True
+        except ValueError:
+            pass
+    return False
+
+
+def _colunas(cabecalho):
+    """Posição de cada campo reconhecido no cabeçalho; None se a linha não parece um cabeçalho."""
+    normalizado = [chave_busca(c) for c in cabecalho]
+    colunas = {}
+    for campo, nomes in CABECALHOS.items():
+        for i, nome in enumerate(normalizado):
+            if nome in nomes:
+                colunas[campo] = i
+                break
+    if "credito" not in colunas and "valor" not in colunas:
+        return None
+    return colunas
+
+
+def ler_csv(caminho):
+    """
+    Gera os Lancamentos de um extrato CSV, uma linha por vez. O separador (; , tab |) é detectado,
+    e o cabeçalho é procurado nas primeiras linhas (muitos bancos põem um título antes da tabela).
+    Levanta ValueError se nenhum cabeçalho com a coluna de valor for encontrado.
+    """
+    with open(caminho, newline="", encoding=_codificacao(caminho), errors="replace") as f:
+        amostra = f.read(TAMANHO_BLOCO)
+        f.seek(0)
+        try:
+            separador = csv.Sniffer().sniff(amostra, delimiters=";,\t|").delimiter
+        except csv.Error:
+            separador = ";" if amostra.count(";") > amostra.count(",") else ","
+
+        leitor = csv.reader(f, delimiter=separador)
+        colunas = None
+        for numero, linha in enumerate(leitor, 1):
+            if colunas is None:
+                colunas = _colunas(linha)
+                if colunas is None and numero >= LINHAS_PROCURA_CABECALHO:
+                    raise ValueError("Cabeçalho do extrato não encontrado (coluna 'Valor' ou 'Crédito').")
+                continue
+            campo = lambda nome: linha[colunas[nome]].strip() if nome in colunas and colunas[nome] < len(linha) else ""
+            # Saldos e totais têm valor, mas não são créditos: sem data válida, ou descritos como tal
+            if "data" in colunas and not _data_valida(campo("data")):
+                continue
+            if REGEX_SALDO.search(chave_busca(campo("descricao") or linha[0])):
+                continue
+            bruto = campo("credito") or campo("valor")
+            try:
+                valor = valor_em_centavos(bruto)
+            except ValueError:
+                continue  # separadores e linhas sem valor
+            descricao = campo("descricao")
+            nome = campo("nome") or _nome_da_descricao(descricao)
+            documento = so_digitos(campo("documento")) or _documento(descricao, campo("nome"))
+            yield Lancamento(numero, campo("data"), valor, nome, documento, descricao)
+        if colunas is None:
+            raise ValueError("Cabeçalho do extrato não encontrado (coluna 'Valor' ou 'Crédito').")
+
+
+def _tags_ofx(caminho):
+    """Gera (fechamento, tag, texto) do OFX lendo em blocos (o OFX antigo, SGML, nem fecha as tags)."""
+    with open(caminho, encoding=_codificacao(caminho), errors="replace") as f:
+        resto = ""
+        while True:
+            bloco = f.read(TAMANHO_BLOCO)
+            texto = resto + bloco
+            # A última tag pode estar cortada: fica para o próximo bloco
+            corte = texto.rfind("<") if bloco else len(texto)
+            for encontrado in REGEX_TAG_OFX.finditer(texto, 0, corte):
+                yield encontrado.group(1) == "/", encontrado.group(2).upper(), encontrado.group(3).strip()
+            resto = texto[corte:]
+            if not bloco:
+                return
+
+
+def ler_ofx(caminho):
+    """Gera os Lancamentos (<STMTTRN>) de um extrato OFX, uma transação por vez."""
+    atual, numero = None, 0
+    for fechamento, tag, texto in _tags_ofx(caminho):
+        if tag == "STMTTRN":
+            if fechamento and atual is not None:
+                numero += 1
+                try:
+                    valor = valor_em_centavos(atual.get("TRNAMT", ""))
+                except ValueError:
+                    valor = None
+                if valor is not None:
+                    data = atual.get("DTPOSTED", "")[:8]
+                    data = f"{data[6:8]}/{data[4:6]}/{data[:4]}" if len(data) == 8 else data
+                    descricao = atual.get("MEMO", "")
+                    nome = atual.get("NAME", "") or _nome_da_descricao(descricao)
+                    yield Lancamento(numero, data, valor, _nome_da_descricao(nome) or nome,
+                                     _documento(nome, descricao), descricao)
+            atual = None if fechamento else {}
+        elif atual is not None and not fechamento and texto:
+            atual[tag] = texto
+
+
+def ler_extrato(caminho):
+    """Lancamentos do extrato (OFX pela extensão ou pelo conteúdo; qualquer outro arquivo é lido como CSV)."""
+    with open(caminho, "rb") as f:
+        inicio = f.read(1024).upper()
+    if caminho.lower().endswith(".ofx") or b"OFXHEADER" in inicio or b"<OFX>" in inicio:
+        return ler_ofx(caminho)
+    return ler_csv(caminho)
+
+
+# --- Casamento (junção hash) ---
+
+def _abreviado(chave):
+    """Primeiro e último nome: bancos costumam abreviar ou cortar os nomes do meio."""
+    partes = chave.split()
+    return f"{partes[0]} {partes[-1]}" if len(partes) >= 2 else ""
+
+
+def indexar_pendentes(pendentes):
+    """
+    Lado de construção da junção: (por_cpf, por_nome, por_abreviado), cada um chave -> [(id, nome)]
+    na ordem recebida (alunos mais antigos primeiro). 'pendentes': linhas de iter_pendentes_pagamento.
+    """
+    por_cpf, por_nome, por_abreviado = {}, {}, {}
+    for aluno_id, nome, cpf_digitos, *chaves_responsaveis in pendentes:
+        aluno = (aluno_id, nome)
+        if cpf_digitos:
+            por_cpf.setdefault(cpf_digitos, []).append(aluno)
+        for chave in set(filter(None, chaves_responsaveis)):
+            por_nome.setdefault(chave, []).append(aluno)
+            abreviado = _abreviado(chave)
+            if abreviado:
+                por_abreviado.setdefault(abreviado, []).append(aluno)
+    return por_cpf, por_nome, por_abreviado
+
+
+def conciliar(lancamentos, pendentes, valor_matricula=None):
+    """
+    Casa os créditos do extrato com os alunos pendentes. Cada aluno entra em no máximo uma proposta
+    (a do primeiro lançamento que o encontrar). Ordem de preferência: CPF do aluno, nome completo
+    do responsável, primeiro e último nome.
+
+    Com 'valor_matricula' (centavos), um lançamento de N vezes o valor paga N alunos da família
+    (os mais antigos) e a proposta vem aceita se pagar a família inteira; valores que não batem
+    viram propostas não aceitas, para conferência. Sem ele, nenhuma proposta vem aceita.
+    """
+    por_cpf, por_nome, por_abreviado = indexar_pendentes(pendentes)
+    usados = set()
+    propostas, sem_par = [], []
+    lidos = debitos = 0
+
+    for lancamento in lancamentos:
+        lidos += 1
+        if lancamento.valor <= 0:
+            debitos += 1
+            continue
+
+        candidatos, criterio = [], None
+        chave = chave_busca(lancamento.nome)
+        for indice, valor_chave, nome_criterio in (
+                (por_cpf, lancamento.documento, CRITERIO_CPF),
+                (por_nome, chave, CRITERIO_NOME),
+                (por_abreviado, _abreviado(chave), CRITERIO_NOME_ABREVIADO)):
+            if not valor_chave:
+                continue
+            candidatos = [aluno for aluno in indice.get(valor_chave, ()) if aluno[0] not in usados]
+            if candidatos:
+                criterio = nome_criterio
+                break
+        if not candidatos:
+            sem_par.append(lancamento)
+            continue
+
+        valor_confere, observacao = None, ""
+        if valor_matricula:
+            quantidade, sobra = divmod(lancamento.valor, valor_matricula)
+            if sobra == 0 and 1 <= quantidade <= len(candidatos):
+                valor_confere = True
+                if quantidade < len(candidatos):
+                    observacao = f"Paga {quantidade} de {len(candidatos)} alunos da família"
+                candidatos = candidatos[:quantidade]
+            else:
+                valor_confere = False
+                esperado = formatar_valor(valor_matricula * len(candidatos))
+                observacao = f"Valor diferente do esperado ({esperado})"
+        aceitar = bool(valor_confere) and not observacao and criterio != CRITERIO_NOME_ABREVIADO
+        if criterio == CRITERIO_NOME_ABREVIADO and not observacao:
+            observacao = "Conferir o nome"
+
+        usados.update(aluno_id for aluno_id, _ in candidatos)
+        propostas.append(Proposta(lancamento, [aluno_id for aluno_id, _ in candidatos],
+                                  [nome for _, nome in candidatos], criterio, valor_confere, aceitar, observacao))
+
+    return Resultado(propostas, sem_par, lidos, debitos)
+
+
+def conciliar_extrato(db, caminho, valor_matricula=None):
+    """Lê o extrato e concilia com os pendentes do banco ('db': DatabaseManager ou ApiClient)."""
+    return conciliar(ler_extrato(caminho), db.iter_pendentes_pagamento(), valor_matricula)
+
+
+def aplicar_propostas(db, propostas, metodo_pagto="Pix"):
+    """Confirma o pagamento dos alunos das propostas em uma única gravação. Retorna os ids ou None em caso de erro."""
+    ids = sorted({aluno_id for proposta in propostas for aluno_id in proposta.aluno_ids})
+    if not ids:
+        return []
+    return ids if db.confirmar_pagamentos(ids, metodo_pagto) else None
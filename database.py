@@ -1,99 +1,1396 @@
+import glob
+import hashlib
+import json
+import os
+import socket
 import sqlite3
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from cache import ResultCache
+from utils import ano_letivo_atual, chave_busca, so_digitos
+
+# Valor de 'ano' que faz as consultas abrangerem o banco atual e todos os anos arquivados
+TODOS_OS_ANOS = 0
+
+# Nome desta estação (mesa da secretaria) no histórico de status; CEMAC_ESTACAO substitui o nome da máquina
+ESTACAO = os.environ.get("CEMAC_ESTACAO") or socket.gethostname()
+
+# Códigos dos eventos do histórico ('alunos_eventos.codigo') e sua descrição na linha do tempo
+EVENTO_MATRICULA = 1
+EVENTO_PAGAMENTO_CONFIRMADO = 2
+EVENTO_PAGAMENTO_PENDENTE = 3
+EVENTO_ASSINATURA_CONFIRMADA = 4
+EVENTO_ASSINATURA_PENDENTE = 5
+EVENTO_STATUS = 6     # valor: novo status da matrícula
+EVENTO_METODO = 7     # valor: novo método de pagamento
+DESCRICAO_EVENTOS = {
+    EVENTO_MATRICULA: "Matrícula",
+    EVENTO_PAGAMENTO_CONFIRMADO: "Pagamento confirmado",
+    EVENTO_PAGAMENTO_PENDENTE: "Pagamento pendente",
+    EVENTO_ASSINATURA_CONFIRMADA: "Assinatura confirmada",
+    EVENTO_ASSINATURA_PENDENTE: "Assinatura pendente",
+    EVENTO_STATUS: "Status da matrícula",
+    EVENTO_METODO: "Método de pagamento",
+}
+
+# Estrutura desnormalizada de 'alunos' (uma linha com todos os dados da família). É a estrutura dos
+# arquivos de anos encerrados, que não dependem das tabelas do banco atual, e a dos bancos antigos.
+SQL_TABELA_ARQUIVO = """
+    CREATE TABLE IF NOT EXISTS {esquema}alunos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        data_nascimento TEXT NOT NULL,
+        turma TEXT NOT NULL,
+        idade INTEGER,
+        endereco TEXT,
+        nome_mae TEXT,
+        nome_pai TEXT,
+        tel_mae TEXT,
+        tel_pai TEXT,
+        cpf_responsavel TEXT,
+        responsavel_legal TEXT,
+        tel_responsavel_emergencia TEXT,
+        alergia TEXT,
+        problema_medicamento TEXT,
+        metodo_pagamento TEXT,
+        status_pagamento INTEGER,
+        status_assinatura INTEGER,
+        status_matricula TEXT,
+        data_matricula TEXT,    -- NOVO CAMPO ADICIONADO
+        ano_letivo INTEGER      -- ano letivo da matrícula (particionamento/arquivamento)
+    );
+"""
+
+# Fotos e histórico de status dos alunos arquivados, no próprio arquivo do ano (ver arquivar_ano).
+# No arquivo, o nome da estação vai em cada evento: ele não depende da tabela 'estacoes' do banco atual.
+SQL_FOTOS_EVENTOS_ARQUIVO = (
+    """
+    CREATE TABLE IF NOT EXISTS {esquema}fotos (
+        hash TEXT PRIMARY KEY,
+        largura INTEGER,
+        altura INTEGER,
+        dados BLOB NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {esquema}alunos_fotos (
+        aluno_id INTEGER PRIMARY KEY,
+        foto_hash TEXT NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {esquema}alunos_eventos (
+        id INTEGER PRIMARY KEY,
+        aluno_id INTEGER NOT NULL,
+        momento INTEGER NOT NULL,
+        codigo INTEGER NOT NULL,
+        valor TEXT,
+        estacao TEXT
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS {esquema}idx_alunos_eventos_aluno ON alunos_eventos (aluno_id, momento);",
+)
+
+# Banco atual, normalizado: cada responsável (mãe, pai, responsável legal) e cada endereço é gravado
+# uma vez e os irmãos apontam para a mesma linha. 'alunos' fica estreita (só dados do aluno e chaves),
+# então a listagem lê bem menos páginas, e corrigir um telefone vale para todos os filhos.
+SQL_ESQUEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS enderecos (
+        id INTEGER PRIMARY KEY,
+        endereco TEXT NOT NULL UNIQUE,
+        endereco_chave TEXT           -- utils.chave_busca(endereco), para o autocompletar
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS responsaveis (
+        id INTEGER PRIMARY KEY,
+        nome TEXT NOT NULL COLLATE NOCASE,
+        telefone TEXT NOT NULL DEFAULT '',
+        telefone_digitos TEXT NOT NULL DEFAULT '',   -- só dígitos, para busca por telefone
+        nome_chave TEXT                              -- utils.chave_busca(nome), para o autocompletar
+    );
+    """,
+    # Mesma pessoa = mesmo nome e mesmo telefone. Sem telefone não há como saber: cada aluno tem a sua linha
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_responsaveis_pessoa
+    ON responsaveis (nome, telefone_digitos) WHERE telefone_digitos != '';
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_responsaveis_telefone_digitos ON responsaveis (telefone_digitos);",
+    # Fotos fora de 'alunos', endereçadas pelo conteúdo: listagens nunca leem as páginas dos BLOBs
+    """
+    CREATE TABLE IF NOT EXISTS fotos (
+        hash TEXT PRIMARY KEY,    -- SHA-256 dos bytes
+        largura INTEGER,
+        altura INTEGER,
+        dados BLOB NOT NULL       -- JPEG (ver fotos.preparar_foto)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alunos_fotos (
+        aluno_id INTEGER PRIMARY KEY,
+        foto_hash TEXT NOT NULL REFERENCES fotos (hash)
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_alunos_fotos_hash ON alunos_fotos (foto_hash);",
+    # Histórico de status: só recebe inclusões. Linhas pequenas (inteiros; texto só no 'valor' de
+    # status/método) e o nome da estação guardado uma vez em 'estacoes'
+    """
+    CREATE TABLE IF NOT EXISTS estacoes (
+        id INTEGER PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alunos_eventos (
+        id INTEGER PRIMARY KEY,
+        aluno_id INTEGER NOT NULL,
+        momento INTEGER NOT NULL,    -- segundos desde 1970 (time.time())
+        codigo INTEGER NOT NULL,     -- EVENTO_*
+        valor TEXT,                  -- novo status/método (EVENTO_STATUS, EVENTO_METODO, EVENTO_MATRICULA)
+        estacao_id INTEGER REFERENCES estacoes (id)
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_alunos_eventos_aluno ON alunos_eventos (aluno_id, momento);",
+    "CREATE INDEX IF NOT EXISTS idx_alunos_eventos_momento ON alunos_eventos (momento);",
+    """
+    CREATE TRIGGER IF NOT EXISTS alunos_eventos_bu BEFORE UPDATE ON alunos_eventos
+    BEGIN
+        SELECT RAISE(ABORT, 'alunos_eventos aceita apenas inclusões');
+    END;
+    """,
+    # Substituído por SQL_TRIGGER_EVENTOS_BD (bloqueava também o arquivamento)
+    "DROP TRIGGER IF EXISTS alunos_eventos_bd;",
+)
+
+# Apagar do histórico só é permitido para alunos que já saíram do banco atual: arquivar_ano move o
+# histórico deles para o arquivo do ano. Criado depois da tabela 'alunos' nova (ver _create_tables),
+# pois a migração do formato antigo troca a tabela e o trigger a referencia.
+SQL_TRIGGER_EVENTOS_BD = """
+    CREATE TRIGGER IF NOT EXISTS alunos_eventos_bd_ativos BEFORE DELETE ON alunos_eventos
+    WHEN OLD.aluno_id IN (SELECT id FROM alunos)
+    BEGIN
+        SELECT RAISE(ABORT, 'alunos_eventos aceita apenas inclusões');
+    END;
+"""
+
+SQL_INSERIR_EVENTO = "INSERT INTO alunos_eventos (aluno_id, momento, codigo, valor, estacao_id) VALUES (?, ?, ?, ?, ?)"
+
+# Tabela estreita de alunos ({tabela}: 'alunos', ou a tabela temporária da migração)
+SQL_TABELA_ALUNOS = """
+    CREATE TABLE IF NOT EXISTS {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        data_nascimento TEXT NOT NULL,
+        turma TEXT NOT NULL,
+        idade INTEGER,
+        cpf_responsavel TEXT,
+        alergia TEXT,
+        problema_medicamento TEXT,
+        metodo_pagamento TEXT,
+        status_pagamento INTEGER,
+        status_assinatura INTEGER,
+        status_matricula TEXT,
+        data_matricula TEXT,
+        ano_letivo INTEGER,
+        cpf_digitos TEXT,    -- só dígitos, para busca por CPF
+        endereco_id INTEGER REFERENCES enderecos (id),
+        mae_id INTEGER REFERENCES responsaveis (id),
+        pai_id INTEGER REFERENCES responsaveis (id),
+        responsavel_id INTEGER REFERENCES responsaveis (id)
+    );
+"""
+
+# Chaves de busca por prefixo (autocompletar do formulário): (tabela, coluna da chave, coluna de origem, índice)
+COLUNAS_CHAVE_BUSCA = (
+    ("responsaveis", "nome_chave", "nome", "nome_chave, telefone_digitos"),
+    ("enderecos", "endereco_chave", "endereco", "endereco_chave"),
+)
+
+# Índices das chaves estrangeiras e da busca por CPF em 'alunos'
+COLUNAS_INDEXADAS = ("cpf_digitos", "endereco_id", "mae_id", "pai_id", "responsavel_id")
+
+# As 21 colunas de um aluno, na ordem de aluno_para_dict (a mesma dos arquivos de anos encerrados)
+COLUNAS_ALUNOS = (
+    "id, nome, data_nascimento, turma, idade, endereco, nome_mae, nome_pai, tel_mae, tel_pai, "
+    "cpf_responsavel, responsavel_legal, tel_responsavel_emergencia, alergia, problema_medicamento, "
+    "metodo_pagamento, status_pagamento, status_assinatura, status_matricula, data_matricula, ano_letivo"
+)
+
+# Aluno com os dados da família, nas 21 colunas de COLUNAS_ALUNOS (leitura de uma ficha, listagens e relatórios)
+SQL_VIEW_ALUNOS_COMPLETOS = """
+    CREATE VIEW IF NOT EXISTS alunos_completos AS
+    SELECT a.id, a.nome, a.data_nascimento, a.turma, a.idade,
+           COALESCE(e.endereco, '') AS endereco,
+           COALESCE(m.nome, '') AS nome_mae, COALESCE(p.nome, '') AS nome_pai,
+           COALESCE(m.telefone, '') AS tel_mae, COALESCE(p.telefone, '') AS tel_pai,
+           a.cpf_responsavel,
+           COALESCE(r.nome, '') AS responsavel_legal, COALESCE(r.telefone, '') AS tel_responsavel_emergencia,
+           a.alergia, a.problema_medicamento, a.metodo_pagamento, a.status_pagamento, a.status_assinatura,
+           a.status_matricula, a.data_matricula, a.ano_letivo
+    FROM alunos a
+    LEFT JOIN enderecos e ON e.id = a.endereco_id
+    LEFT JOIN responsaveis m ON m.id = a.mae_id
+    LEFT JOIN responsaveis p ON p.id = a.pai_id
+    LEFT JOIN responsaveis r ON r.id = a.responsavel_id
+"""
+
+
+# Conexões de relatório: leituras longas e sequenciais (relatórios, pacotes de fichas, conciliação).
+# Páginas lidas direto do arquivo mapeado em memória (sem cópia para o cache do SQLite) e cache grande
+# para o que vem do WAL; são 'mode=ro', então nunca gravam nem seguram locks de escrita.
+MMAP_RELATORIOS = 256 * 1024 * 1024
+CACHE_RELATORIOS_KIB = 64 * 1024
+
+
+def listar_arquivos_anuais(db_name):
+    """{ano: caminho} dos arquivos de anos encerrados ao lado do banco (matriculas.db -> matriculas_2025.db)."""
+    base, extensao = os.path.splitext(db_name)
+    padrao = f"{glob.escape(base)}_[0-9][0-9][0-9][0-9]{extensao or '.db'}"
+    return {int(caminho[len(base) + 1:len(base) + 5]): caminho for caminho in glob.glob(padrao)}
+
+
+class PoolEsgotadoError(sqlite3.OperationalError):
+    """Nenhuma conexão livre no pool dentro do tempo de espera."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexões SQLite com UMA conexão por thread e número máximo de conexões abertas.
+
+    Cada thread recebe sempre a mesma conexão, que só é usada por ela. Por isso as conexões
+    são abertas com check_same_thread=False apenas para que close_all() (chamado pela thread
+    principal ao sair) consiga fechá-las; o pool nunca entrega a conexão de uma thread a outra.
+    Conexões de threads que já terminaram são recolhidas quando o pool fica cheio.
+    """
+
+    def __init__(self, db_name, max_conexoes=8, cached_statements=256, timeout=30.0, somente_leitura=False,
+                 journal_mode="WAL", relatorio=False):
+        self.db_name = db_name
+        self.journal_mode = journal_mode
+        self.relatorio = relatorio
+        self.max_conexoes = max_conexoes
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.somente_leitura = somente_leitura
+        self._local = threading.local()
+        self._vagas = threading.BoundedSemaphore(max_conexoes)
+        self._lock = threading.Lock()
+        self._abertas = {}  # thread -> conexão
+
+    def _abrir(self):
+        conn = sqlite3.connect(
+            # Relatórios abrem o arquivo só-leitura (URI mode=ro): o SQLite recusa qualquer gravação
+            Path(self.db_name).absolute().as_uri() + "?mode=ro" if self.relatorio else self.db_name,
+            uri=True,  # permite anexar os arquivos de anos encerrados como 'file:...?mode=ro'
+            timeout=self.timeout,
+            isolation_level=None,  # transações explícitas via DatabaseManager.transaction()
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        if self.relatorio:
+            conn.execute(f"PRAGMA mmap_size = {MMAP_RELATORIOS}")
+            conn.execute(f"PRAGMA cache_size = -{CACHE_RELATORIOS_KIB}")
+        elif self.somente_leitura:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            # WAL: leitores em outras conexões não bloqueiam (nem são bloqueados por) quem grava.
+            # Outros modos (DELETE, TRUNCATE...) só para comparação no db_loadtest.py
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def get(self):
+        """Retorna a conexão da thread atual, abrindo uma nova se necessário."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        if not self._vagas.acquire(blocking=False):
+            self._recolher_orfas()
+            if not self._vagas.acquire(timeout=self.timeout):
+                raise PoolEsgotadoError(f"Pool esgotado ({self.max_conexoes} conexões em uso).")
+        try:
+            conn = self._abrir()
+        except Exception:
+            self._vagas.release()
+            raise
+
+        with self._lock:
+            self._abertas[threading.current_thread()] = conn
+        self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Fecha a conexão da thread atual e libera sua vaga no pool."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._abertas.pop(threading.current_thread(), None)
+        conn.close()
+        self._vagas.release()
+
+    def _recolher_orfas(self):
+        """Fecha conexões cujas threads já terminaram sem chamar release()."""
+        with self._lock:
+            mortas = [t for t in self._abertas if not t.is_alive()]
+            conexoes = [self._abertas.pop(t) for t in mortas]
+        for conn in conexoes:
+            conn.close()
+            self._vagas.release()
+
+    def close_all(self):
+        with self._lock:
+            conexoes = list(self._abertas.values())
+            self._abertas.clear()
+        for conn in conexoes:
+            conn.close()
+            self._vagas.release()
+        self._local = threading.local()
+
+
+def aluno_para_dict(data):
+    """Mapeia uma linha de 'alunos' (COLUNAS_ALUNOS, 21 campos: índice 0 a 20) para um dicionário legível."""
+    return {
+        "ID": data[0], "Nome": data[1], "DataNasc": data[2], "Turma": data[3],
+        "Idade": data[4], "Endereco": data[5],
+        "NomeMae": data[6], "NomePai": data[7], "TelMae": data[8], "TelPai": data[9],
+        "CPFAluno": data[10],
+        "RespLegal": data[11],
+        "TelEmerg": data[12],
+        "Alergia": data[13], "ProbMed": data[14],
+        "PagtoMetodo": data[15],
+        "PagtoStatus": data[16],
+        "AssinaturaStatus": data[17],
+        "MatriculaStatus": data[18],
+        "DataMatricula": data[19],
+        "AnoLetivo": data[20]
+    }
+
 
 class DatabaseManager:
     """Gerencia a conexão e operações com o banco de dados SQLite."""
-    
-    def __init__(self, db_name="matriculas.db"):
+
+    # Quantas alterações o feed mantém; quem ficou mais atrás que isso recarrega tudo
+    MAX_ALTERACOES = 10000
+    # De quantos em quantos commits o feed é podado (além da poda ao abrir o banco)
+    PODA_ALTERACOES_A_CADA = 500
+
+    def __init__(self, db_name="matriculas.db", max_conexoes=8, max_leitores=4, ano_letivo=None,
+                 journal_mode="WAL", estacao=ESTACAO, max_relatorios=4):
         self.db_name = db_name
-        self.conn = None
-        self.cursor = None
-        self._connect()
+        self.ano_letivo = ano_letivo or ano_letivo_atual()
+        # Estação registrada no histórico quando o método de escrita não informa outra (ver api_server)
+        self.estacao = estacao
+        # Conexões de escrita/uso geral (uma por thread) e conexões só-leitura para workers
+        self.pool = ConnectionPool(db_name, max_conexoes=max_conexoes, journal_mode=journal_mode)
+        self.pool_leitura = ConnectionPool(db_name, max_conexoes=max_leitores, somente_leitura=True)
+        # Conexões de relatório (mode=ro, mmap, cache grande), abertas só quando um relatório roda
+        self.pool_relatorios = ConnectionPool(db_name, max_conexoes=max_relatorios, relatorio=True)
+
+        # Cache das consultas de listagem/pesquisa. A versão dos dados combina o contador de
+        # gravações feitas por este DatabaseManager com o PRAGMA data_version de uma conexão
+        # sentinela que nunca grava (muda quando QUALQUER outra conexão/processo faz commit).
+        self._cache = ResultCache()
+        self._escritas = 0
+        self._lock_versao = threading.Lock()
+        # Tempo total (s) esperando o lock de escrita em BEGIN IMMEDIATE (outra conexão/processo gravando)
+        self.espera_escrita_s = 0.0
+        self._sentinela = sqlite3.connect(db_name, check_same_thread=False)
         # O método _create_tables DEVE ser rodado após excluir matriculas.db
-        self._create_tables() 
+        self._create_tables()
+        self._anos_arquivados = self._listar_arquivos()
+
+    @property
+    def conn(self):
+        """Conexão da thread atual (cada thread tem a sua)."""
+        return self.pool.get()
+
+    @property
+    def cursor(self):
+        """Novo cursor sobre a conexão da thread atual."""
+        return self.pool.get().cursor()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Executa o bloco em uma transação (BEGIN IMMEDIATE ... COMMIT), com ROLLBACK em caso de erro.
+        Se já houver uma transação aberta nesta thread, o bloco participa dela.
+        """
+        conn = self.pool.get()
+        if conn.in_transaction:
+            yield conn
+            return
+        inicio = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_versao:
+                self.espera_escrita_s += espera
+        try:
+            yield conn
+            if (self._escritas + 1) % self.PODA_ALTERACOES_A_CADA == 0:
+                # Um servidor que fica dias aberto também precisa manter o feed curto
+                self._podar_alteracoes(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        with self._lock_versao:
+            self._escritas += 1
+
+    def _versao_dados(self):
+        """Token que muda a cada commit, deste ou de outro processo. Custa um PRAGMA, sem ler tabelas."""
+        with self._lock_versao:
+            data_version = self._sentinela.execute("PRAGMA data_version").fetchone()[0]
+            return (data_version, self._escritas)
+
+    def versao_dados(self):
+        """Token de versão do banco, para polling barato (muda a cada commit de qualquer conexão)."""
+        return self._versao_dados()
+
+    def _consulta_cacheada(self, sql, params=(), historico=False):
+        """
+        Executa a consulta pelo cache: se o banco não mudou, devolve o mesmo resultado (tupla de tuplas).
+        Os arquivos de anos encerrados são só-leitura; eles só mudam via arquivar_ano(), que grava no
+        banco atual e portanto também muda a versão.
+        """
+        versao = self._versao_dados()
+        chave = (sql, tuple(params))
+        resultado = self._cache.get(chave, versao)
+        if resultado is None:
+            conn = self._conexao_historico() if historico else self.conn
+            resultado = tuple(conn.execute(sql, params).fetchall())
+            self._cache.put(chave, versao, resultado)
+        return resultado
+
+    @contextmanager
+    def read_connection(self, historico=False, relatorio=False):
+        """
+        Conexão só-leitura da thread atual, separada da conexão da UI. Sob WAL, consultas
+        longas feitas por workers rodam em paralelo às gravações. O bloco enxerga um
+        snapshot consistente do banco (transação de leitura).
+        Com historico=True, a conexão enxerga também a view 'alunos_historico' (todos os anos).
+        Com relatorio=True, usa uma conexão de relatório (pool_relatorios: mode=ro, mmap, cache grande).
+        """
+        pool = self.pool_relatorios if relatorio else self.pool_leitura
+        conn = self._conexao_historico(pool) if historico else pool.get()
+        if conn.in_transaction:
+            yield conn
+            return
+        # BEGIN DEFERRED: o snapshot (marca de leitura no WAL) é fixado na primeira leitura e vale até o
+        # COMMIT. Quem grava continua anexando ao WAL sem esperar; só o checkpoint não passa dessa marca.
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
 
-    def _connect(self):
-        """Estabelece a conexão com o banco de dados."""
-        self.conn = sqlite3.connect(self.db_name)
-        self.cursor = self.conn.cursor()
+    def snapshot_relatorio(self):
+        """
+        Um snapshot para um relatório inteiro: as leituras de relatório da thread atual feitas dentro
+        do bloco (iter_alunos_relatorio, get_turmas, get_alunos_by_ids(relatorio=True)...) participam
+        da mesma transação de leitura e enxergam o banco de um único instante.
+        """
+        # Os arquivos de anos encerrados são anexados antes do BEGIN (ATTACH não roda dentro de transação)
+        return self.read_connection(historico=bool(self._anos_arquivados), relatorio=True)
 
     def _create_tables(self):
         """
-        Cria a tabela 'alunos' com 20 colunas. 
-        O campo 'data_matricula' foi adicionado.
-        """
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS alunos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                data_nascimento TEXT NOT NULL,
-                turma TEXT NOT NULL,
-                idade INTEGER, 
-                endereco TEXT, 
-                nome_mae TEXT,
-                nome_pai TEXT,
-                tel_mae TEXT,
-                tel_pai TEXT,
-                cpf_responsavel TEXT, 
-                responsavel_legal TEXT, 
-                tel_responsavel_emergencia TEXT,
-                alergia TEXT,
-                problema_medicamento TEXT,
-                metodo_pagamento TEXT,
-                status_pagamento INTEGER,  
-                status_assinatura INTEGER, 
-                status_matricula TEXT,
-                data_matricula TEXT    -- NOVO CAMPO ADICIONADO
+        Cria as tabelas 'alunos', 'responsaveis' e 'enderecos' e a view 'alunos_completos' (21 colunas).
+        Bancos no formato antigo (uma tabela 'alunos' com os dados da família) são convertidos no lugar.
+        """
+        with self.transaction() as conn:
+            antigo = {linha[1] for linha in conn.execute("PRAGMA table_info(alunos)")}
+            for sql in SQL_ESQUEMA:
+                conn.execute(sql)
+            self._migrar_chaves_busca(conn)
+            if "nome_mae" in antigo:
+                self._migrar_ano_letivo(conn)
+                self._normalizar_familias(conn)
+            conn.execute(SQL_TABELA_ALUNOS.format(tabela="alunos"))
+            self._migrar_ano_letivo(conn)
+            for coluna in COLUNAS_INDEXADAS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_alunos_{coluna} ON alunos ({coluna})")
+            conn.execute(SQL_VIEW_ALUNOS_COMPLETOS)
+            conn.execute(SQL_TRIGGER_EVENTOS_BD)
+            self._create_change_feed(conn)
+
+    def _migrar_ano_letivo(self, conn):
+        """
+        Bancos anteriores ao particionamento não têm 'ano_letivo': a coluna é criada e preenchida
+        com o ano de 'data_matricula' (dd/mm/aaaa), ou com o ano letivo atual quando ela falta.
+        """
+        colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(alunos)")}
+        if "ano_letivo" not in colunas:
+            conn.execute("ALTER TABLE alunos ADD COLUMN ano_letivo INTEGER")
+            conn.execute("""
+                UPDATE alunos
+                SET ano_letivo = COALESCE(NULLIF(CAST(substr(data_matricula, 7, 4) AS INTEGER), 0), ?)
+            """, (self.ano_letivo,))
+        # Todas as consultas da tela filtram pelo ano: o índice evita varrer os anos anteriores
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alunos_ano_letivo ON alunos (ano_letivo)")
+
+    def _migrar_chaves_busca(self, conn):
+        """Cria (bancos anteriores ao autocompletar), preenche e indexa as colunas de COLUNAS_CHAVE_BUSCA."""
+        conn.create_function("chave_busca", 1, chave_busca, deterministic=True)
+        for tabela, coluna, origem, indice in COLUNAS_CHAVE_BUSCA:
+            if coluna not in {linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")}:
+                conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} TEXT")
+            conn.execute(f"UPDATE {tabela} SET {coluna} = chave_busca({origem}) WHERE {coluna} IS NULL")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_{coluna} ON {tabela} ({indice})")
+
+    def _normalizar_familias(self, conn):
+        """
+        Migração no lugar do formato antigo: copia cada aluno para a tabela estreita, trocando os
+        dados da família por chaves de 'responsaveis'/'enderecos' (deduplicados), e substitui a
+        tabela antiga. Ids e o contador AUTOINCREMENT são preservados; roda na transação de _create_tables.
+        """
+        conn.execute(SQL_TABELA_ALUNOS.format(tabela="alunos_normalizada"))
+        novas = []
+        for linha in conn.execute(f"SELECT {COLUNAS_ALUNOS} FROM alunos ORDER BY id").fetchall():
+            (aluno_id, nome, data_nasc, turma, idade, endereco, nome_mae, nome_pai, tel_mae, tel_pai,
+             cpf, resp_legal, tel_emerg, alergia, prob_med, metodo, pagto, assinatura, status,
+             data_matricula, ano_letivo) = linha
+            novas.append((
+                aluno_id, nome, data_nasc, turma, idade, cpf, alergia, prob_med, metodo, pagto, assinatura,
+                status, data_matricula, ano_letivo, so_digitos(cpf),
+                self._id_endereco(conn, endereco),
+                self._id_responsavel(conn, nome_mae, tel_mae),
+                self._id_responsavel(conn, nome_pai, tel_pai),
+                self._id_responsavel(conn, resp_legal, tel_emerg),
+            ))
+        conn.executemany("""
+            INSERT INTO alunos_normalizada (
+                id, nome, data_nascimento, turma, idade, cpf_responsavel, alergia, problema_medicamento,
+                metodo_pagamento, status_pagamento, status_assinatura, status_matricula, data_matricula,
+                ano_letivo, cpf_digitos, endereco_id, mae_id, pai_id, responsavel_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, novas)
+
+        sequencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'alunos'").fetchone()
+        conn.execute("DROP TABLE alunos")  # leva junto os índices e os triggers do feed (recriados depois)
+        conn.execute("ALTER TABLE alunos_normalizada RENAME TO alunos")
+        if sequencia is not None:
+            # Ids de alunos excluídos nunca são reutilizados
+            if not conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'alunos'",
+                                (sequencia[0],)).rowcount:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('alunos', ?)", (sequencia[0],))
+
+    @staticmethod
+    def _id_endereco(conn, endereco):
+        """Id do endereço (criado se ainda não existe); None se vazio."""
+        if not endereco:
+            return None
+        conn.execute("INSERT OR IGNORE INTO enderecos (endereco, endereco_chave) VALUES (?, ?)",
+                     (endereco, chave_busca(endereco)))
+        return conn.execute("SELECT id FROM enderecos WHERE endereco = ?", (endereco,)).fetchone()[0]
+
+    @staticmethod
+    def _id_responsavel(conn, nome, telefone):
+        """
+        Id do responsável com esse nome e telefone (criado se ainda não existe); None se ambos vazios.
+        Sem telefone não dá para saber se é a mesma pessoa: sempre cria uma linha nova.
+        """
+        nome, telefone = nome or "", telefone or ""
+        digitos = so_digitos(telefone)
+        if not digitos:
+            if not nome:
+                return None
+            return conn.execute("INSERT INTO responsaveis (nome, telefone, nome_chave) VALUES (?, ?, ?)",
+                                (nome, telefone, chave_busca(nome))).lastrowid
+        conn.execute("INSERT OR IGNORE INTO responsaveis (nome, telefone, telefone_digitos, nome_chave) VALUES (?, ?, ?, ?)",
+                     (nome, telefone, digitos, chave_busca(nome)))
+        return conn.execute("SELECT id FROM responsaveis WHERE nome = ? AND telefone_digitos = ? AND telefone_digitos != ''",
+                            (nome, digitos)).fetchone()[0]
+
+    @staticmethod
+    def _remover_orfaos(conn):
+        """Apaga responsáveis, endereços e fotos que nenhum aluno referencia mais (ex.: após arquivar um ano)."""
+        conn.execute("""
+            DELETE FROM responsaveis WHERE id NOT IN (
+                SELECT mae_id FROM alunos WHERE mae_id IS NOT NULL
+                UNION SELECT pai_id FROM alunos WHERE pai_id IS NOT NULL
+                UNION SELECT responsavel_id FROM alunos WHERE responsavel_id IS NOT NULL
+            )
+        """)
+        conn.execute("DELETE FROM enderecos WHERE id NOT IN (SELECT endereco_id FROM alunos WHERE endereco_id IS NOT NULL)")
+        conn.execute("DELETE FROM fotos WHERE hash NOT IN (SELECT foto_hash FROM alunos_fotos)")
+
+    def _create_change_feed(self, conn):
+        """
+        Cria o feed de alterações: a tabela 'alteracoes' recebe, via triggers, uma linha com
+        sequência crescente para cada INSERT/UPDATE/DELETE em 'alunos', venha de qual estação vier.
+        Cada tela guarda a última sequência que viu e busca apenas o que mudou depois dela.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS alteracoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                aluno_id INTEGER NOT NULL,
+                operacao TEXT NOT NULL    -- 'I' (inserção), 'U' (atualização), 'D' (exclusão)
             );
         """)
-        self.conn.commit()
+        for nome, evento, operacao, ref in (("alunos_ai", "INSERT", "I", "NEW"),
+                                            ("alunos_au", "UPDATE", "U", "NEW"),
+                                            ("alunos_ad", "DELETE", "D", "OLD")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {nome} AFTER {evento} ON alunos
+                BEGIN
+                    INSERT INTO alteracoes (aluno_id, operacao) VALUES ({ref}.id, '{operacao}');
+                END;
+            """)
+        # Corrigir um responsável ou endereço altera a ficha de todos os alunos que apontam para ele
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS responsaveis_au AFTER UPDATE ON responsaveis
+            BEGIN
+                INSERT INTO alteracoes (aluno_id, operacao)
+                SELECT id, 'U' FROM alunos WHERE mae_id = NEW.id OR pai_id = NEW.id OR responsavel_id = NEW.id;
+            END;
+        """)
+        # Foto nova/removida: as telas refazem a miniatura e a ficha muda
+        for nome, evento, ref in (("alunos_fotos_ai", "INSERT", "NEW"),
+                                  ("alunos_fotos_au", "UPDATE", "NEW"),
+                                  ("alunos_fotos_ad", "DELETE", "OLD")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {nome} AFTER {evento} ON alunos_fotos
+                BEGIN
+                    INSERT INTO alteracoes (aluno_id, operacao) VALUES ({ref}.aluno_id, 'U');
+                END;
+            """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS enderecos_au AFTER UPDATE ON enderecos
+            BEGIN
+                INSERT INTO alteracoes (aluno_id, operacao) SELECT id, 'U' FROM alunos WHERE endereco_id = NEW.id;
+            END;
+        """)
+        self._podar_alteracoes(conn)
+
+    def _podar_alteracoes(self, conn):
+        """O feed só precisa cobrir o intervalo entre duas consultas: apaga o que passou de MAX_ALTERACOES."""
+        conn.execute("DELETE FROM alteracoes WHERE seq <= (SELECT MAX(seq) FROM alteracoes) - ?",
+                     (self.MAX_ALTERACOES,))
+
+    def caminho_arquivo(self, ano):
+        """Arquivo de um ano encerrado, ao lado do banco atual: matriculas.db -> matriculas_2025.db."""
+        base, extensao = os.path.splitext(self.db_name)
+        return f"{base}_{int(ano)}{extensao or '.db'}"
+
+    def _listar_arquivos(self):
+        """{ano: caminho} dos arquivos de anos encerrados existentes na pasta do banco."""
+        return listar_arquivos_anuais(self.db_name)
+
+    def anos_arquivados(self):
+        """Anos encerrados já movidos para arquivos próprios, do mais recente ao mais antigo (relê a pasta)."""
+        self._anos_arquivados = self._listar_arquivos()
+        return sorted(self._anos_arquivados, reverse=True)
+
+    def anos_letivos(self):
+        """Todos os anos com matrículas (banco atual e arquivos), do mais recente ao mais antigo."""
+        with self.read_connection() as conn:
+            anos = {linha[0] for linha in conn.execute("SELECT DISTINCT ano_letivo FROM alunos") if linha[0]}
+        return sorted(anos | set(self.anos_arquivados()) | {self.ano_letivo}, reverse=True)
+
+    def _origem(self, ano, tabela="alunos_completos"):
+        """
+        (tabela, condições, parâmetros, historico) para consultar um ano: None é o ano letivo atual e
+        TODOS_OS_ANOS abrange todos. Anos arquivados são lidos pela view 'alunos_historico'.
+        Consultas que não usam os dados da família podem pedir tabela="alunos" (sem os JOINs).
+        """
+        if ano is None:
+            ano = self.ano_letivo
+        if ano == TODOS_OS_ANOS:
+            return "alunos_historico", [], [], True
+        if ano in self._anos_arquivados:
+            return "alunos_historico", ["ano_letivo = ?"], [ano], True
+        return tabela, ["ano_letivo = ?"], [ano], False
+
+    def _conexao_historico(self, pool=None):
+        """
+        Conexão só-leitura da thread atual com os arquivos de anos encerrados anexados (ATTACH com
+        mode=ro) e a view temporária 'alunos_historico': alunos do banco atual UNION ALL alunos de
+        cada arquivo. Só anexa o que ainda falta; a view é refeita quando o conjunto muda.
+        O SQLite anexa no máximo 10 bancos por conexão (SQLITE_MAX_ATTACHED).
+        'pool': de onde vem a conexão (padrão: pool_leitura; relatórios usam pool_relatorios).
+        """
+        conn = (pool or self.pool_leitura).get()
+        anexados = {linha[1] for linha in conn.execute("PRAGMA database_list")}
+        esperados = {f"ano_{ano}": caminho for ano, caminho in self._anos_arquivados.items()}
+        faltando = [nome for nome in esperados if nome not in anexados]
+        if not faltando and "alunos_historico" in {linha[0] for linha in conn.execute(
+                "SELECT name FROM temp.sqlite_master WHERE type = 'view'")}:
+            return conn
+
+        for nome in faltando:
+            conn.execute(f"ATTACH DATABASE ? AS {nome}", (Path(esperados[nome]).absolute().as_uri() + "?mode=ro",))
+        # Os arquivos guardam as 21 colunas; o banco atual as monta pela view normalizada
+        partes = [f"SELECT {COLUNAS_ALUNOS} FROM main.alunos_completos"]
+        partes += [f"SELECT {COLUNAS_ALUNOS} FROM {nome}.alunos" for nome in sorted(esperados)]
+        # A view TEMP é gravada no esquema temporário da própria conexão, não nos arquivos
+        conn.execute("PRAGMA query_only = OFF")
+        try:
+            conn.execute("DROP VIEW IF EXISTS temp.alunos_historico")
+            conn.execute(f"CREATE TEMP VIEW alunos_historico AS {' UNION ALL '.join(partes)}")
+        finally:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def arquivar_ano(self, ano):
+        """
+        Move as matrículas de um ano encerrado para o arquivo do ano (ex.: matriculas_2025.db),
+        deixando o banco atual pequeno. Em duas etapas, para nunca perder linhas:
+        1) copia para o arquivo (INSERT OR IGNORE: repetir depois de uma falha é seguro);
+        2) apaga do banco atual só as linhas que já estão no arquivo e, na mesma transação, move as
+           fotos e o histórico de status desses alunos para o arquivo; por fim apaga os responsáveis,
+           endereços e fotos que ficaram sem alunos.
+        O arquivo é desnormalizado (os dados da família em cada linha), para ser lido sozinho. Ao final o arquivo fica só-leitura e o banco atual é compactado (VACUUM).
+        Retorna quantas matrículas foram movidas.
+        """
+        ano = int(ano)
+        if ano >= self.ano_letivo:
+            raise ValueError(f"Só é possível arquivar anos encerrados (anteriores a {self.ano_letivo}).")
+
+        caminho = self.caminho_arquivo(ano)
+        if os.path.exists(caminho):
+            # Matrículas do ano que chegaram depois do arquivamento: reabre o arquivo para gravação
+            os.chmod(caminho, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+
+        conn = self.pool.get()
+        conn.execute("ATTACH DATABASE ? AS arquivo", (caminho,))
+        try:
+            # Journal clássico: o arquivo não depende de -wal/-shm e pode ser aberto só para leitura
+            conn.execute("PRAGMA arquivo.journal_mode = DELETE")
+            with self.transaction():
+                conn.execute(SQL_TABELA_ARQUIVO.format(esquema="arquivo."))
+                for sql in SQL_FOTOS_EVENTOS_ARQUIVO:
+                    conn.execute(sql.format(esquema="arquivo."))
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO arquivo.alunos ({COLUNAS_ALUNOS})
+                    SELECT {COLUNAS_ALUNOS} FROM main.alunos_completos WHERE ano_letivo = ?
+                """, (ano,))
+            with self.transaction():
+                movidos = conn.execute("""
+                    DELETE FROM main.alunos
+                    WHERE ano_letivo = ? AND id IN (SELECT id FROM arquivo.alunos)
+                """, (ano,)).rowcount
+                self._mover_fotos_eventos(conn)
+                self._remover_orfaos(conn)
+        finally:
+            conn.execute("DETACH DATABASE arquivo")
+            os.chmod(caminho, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+        conn.execute("VACUUM")
+        self._anos_arquivados = self._listar_arquivos()
+        return movidos
+
+    @staticmethod
+    def _mover_fotos_eventos(conn):
+        """
+        Move para o arquivo anexado ('arquivo') as fotos e o histórico dos alunos que já estão nele e
+        saíram do banco atual. Roda na transação que apagou os alunos: nada é gravado no meio.
+        """
+        movidos = "SELECT id FROM arquivo.alunos WHERE id NOT IN (SELECT id FROM main.alunos)"
+        conn.execute(f"""
+            INSERT OR IGNORE INTO arquivo.fotos (hash, largura, altura, dados)
+            SELECT hash, largura, altura, dados FROM main.fotos
+            WHERE hash IN (SELECT foto_hash FROM main.alunos_fotos WHERE aluno_id IN ({movidos}))
+        """)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO arquivo.alunos_fotos (aluno_id, foto_hash)
+            SELECT aluno_id, foto_hash FROM main.alunos_fotos WHERE aluno_id IN ({movidos})
+        """)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO arquivo.alunos_eventos (id, aluno_id, momento, codigo, valor, estacao)
+            SELECT e.id, e.aluno_id, e.momento, e.codigo, e.valor, s.nome
+            FROM main.alunos_eventos e LEFT JOIN main.estacoes s ON s.id = e.estacao_id
+            WHERE e.aluno_id IN ({movidos})
+        """)
+        conn.execute(f"DELETE FROM main.alunos_fotos WHERE aluno_id IN ({movidos})")
+        # Permitido pelo trigger: estes alunos não estão mais em 'alunos'
+        conn.execute(f"DELETE FROM main.alunos_eventos WHERE aluno_id IN ({movidos})")
+
+    def _consultar_arquivos(self, tabela, sql, params=()):
+        """
+        Executa 'sql' ({esquema} no lugar do nome do arquivo anexado) em cada arquivo de ano encerrado
+        que tem 'tabela', do mais recente ao mais antigo, e junta as linhas. Arquivos gravados antes
+        das fotos e do histórico só têm 'alunos'.
+        """
+        if not self._anos_arquivados:
+            return []
+        linhas = []
+        with self.read_connection(historico=True) as conn:
+            for ano in sorted(self._anos_arquivados, reverse=True):
+                esquema = f"ano_{ano}"
+                if conn.execute(f"SELECT 1 FROM {esquema}.sqlite_master WHERE type = 'table' AND name = ?",
+                                (tabela,)).fetchone():
+                    linhas.extend(conn.execute(sql.format(esquema=esquema), params))
+        return linhas
 
-    def insert_aluno(self, dados):
-        """Insere um novo registro de aluno (Matrícula). Espera 16 valores na tupla 'dados'."""
-        # Colunas na ordem esperada: 16 bindings (?) no SQL
+    def insert_aluno(self, dados, estacao=None):
+        """
+        Insere um novo registro de aluno (Matrícula). Espera 16 valores na tupla 'dados'.
+        Mãe, pai, responsável legal e endereço são gravados (ou reaproveitados, se já cadastrados
+        para um irmão) em 'responsaveis'/'enderecos', e o evento de matrícula no histórico, na mesma
+        transação. Para importar muitos alunos, chame dentro de 'with db.transaction():' (um só commit).
+        Retorna o id do novo aluno (verdadeiro) ou False em caso de erro.
+        """
         sql = """
             INSERT INTO alunos (
-                nome, data_nascimento, turma, idade, endereco, nome_mae, nome_pai, 
-                tel_mae, tel_pai, cpf_responsavel, responsavel_legal,
-                tel_responsavel_emergencia, alergia, problema_medicamento, 
-                metodo_pagamento, data_matricula, status_pagamento, status_assinatura, status_matricula
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 1, 'Matrícula Efetivada')
+                nome, data_nascimento, turma, idade, cpf_responsavel, alergia, problema_medicamento,
+                metodo_pagamento, data_matricula, ano_letivo, cpf_digitos,
+                endereco_id, mae_id, pai_id, responsavel_id,
+                status_pagamento, status_assinatura, status_matricula
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 1, 'Matrícula Efetivada')
         """
         try:
             # 'dados' deve ser uma tupla de 16 elementos
-            self.cursor.execute(sql, dados)
-            self.conn.commit()
-            return True
+            (nome, data_nasc, turma, idade, endereco, nome_mae, nome_pai, tel_mae, tel_pai, cpf,
+             resp_legal, tel_emerg, alergia, prob_med, metodo, data_matricula) = dados
+            with self.transaction() as conn:
+                aluno_id = conn.execute(sql, (
+                    nome, data_nasc, turma, idade, cpf, alergia, prob_med, metodo, data_matricula,
+                    self.ano_letivo, so_digitos(cpf),
+                    self._id_endereco(conn, endereco),
+                    self._id_responsavel(conn, nome_mae, tel_mae),
+                    self._id_responsavel(conn, nome_pai, tel_pai),
+                    self._id_responsavel(conn, resp_legal, tel_emerg),
+                )).lastrowid
+                conn.execute(SQL_INSERIR_EVENTO, (aluno_id, int(time.time()), EVENTO_MATRICULA, metodo,
+                                                  self._id_estacao(conn, estacao)))
+            return aluno_id
         except Exception as e:
             print(f"Erro ao inserir: {e}")
             return False
 
     def get_aluno_by_id(self, aluno_id):
-        """Retorna TODOS os dados de um aluno específico (20 campos)."""
-        self.cursor.execute("SELECT * FROM alunos WHERE id = ?", (aluno_id,))
-        return self.cursor.fetchone()
+        """Retorna TODOS os dados de um aluno específico (21 campos), procurando também nos anos arquivados."""
+        aluno = self.conn.execute(f"SELECT {COLUNAS_ALUNOS} FROM alunos_completos WHERE id = ?", (aluno_id,)).fetchone()
+        if aluno is None and self._anos_arquivados:
+            aluno = self._conexao_historico().execute(
+                f"SELECT {COLUNAS_ALUNOS} FROM alunos_historico WHERE id = ?", (aluno_id,)).fetchone()
+        return aluno
 
-    def update_status_matricula(self, aluno_id, pagamento_ok, assinatura_ok, metodo_pagto):
-        sql = """
-            UPDATE alunos SET 
-                status_pagamento = ?, 
-                status_assinatura = ?, 
-                metodo_pagamento = ?,
-                status_matricula = 'Matrícula Efetivada' 
-            WHERE id = ?
+    def update_status_matricula(self, aluno_id, pagamento_ok, assinatura_ok, status_matricula, metodo_pagto):
+        """Atualiza pagamento, assinatura, status e método de pagamento de um aluno."""
+        return self.update_status_many([aluno_id], pagamento_ok, assinatura_ok, status_matricula, metodo_pagto)
+
+    def update_status_many(self, ids, pagamento_ok, assinatura_ok, status_matricula, metodo_pagto=None, estacao=None):
         """
+        Atualiza o status de vários alunos em UMA transação (executemany + um único commit), com o
+        histórico do que mudou gravado na mesma transação.
+        Se 'metodo_pagto' for None, o método de pagamento já registrado de cada aluno é mantido.
+        """
+        novos = {
+            "status_pagamento": ":pagamento",
+            "status_assinatura": ":assinatura",
+            "metodo_pagamento": "COALESCE(:metodo, metodo_pagamento)",
+            "status_matricula": ":status",
+        }
+        sql = f"UPDATE alunos SET {', '.join(f'{coluna} = {expr}' for coluna, expr in novos.items())} WHERE id = :id"
+        valores = {"pagamento": pagamento_ok, "assinatura": assinatura_ok, "metodo": metodo_pagto, "status": status_matricula}
         try:
-            self.cursor.execute(sql, (pagamento_ok, assinatura_ok, metodo_pagto, aluno_id))
-            self.conn.commit()
+            with self.transaction() as conn:
+                self._registrar_eventos(conn, ids, novos, valores, estacao=estacao)
+                conn.executemany(sql, [dict(valores, id=aluno_id) for aluno_id in ids])
             return True
         except Exception as e:
             print(f"Erro ao atualizar matrícula: {e}")
             return False
 
-    def get_alunos(self):
-        """Retorna TODOS os campos para a tela de listagem."""
-        self.cursor.execute("SELECT * FROM alunos ORDER BY id DESC")
-        return self.cursor.fetchall()
-        
+    def confirmar_pagamentos(self, ids, metodo_pagto=None, estacao=None):
+        """
+        Marca o pagamento de vários alunos como confirmado em UMA transação (executemany + um commit),
+        com o histórico na mesma transação. A assinatura não muda; a matrícula é efetivada se a
+        assinatura já estava confirmada (a mesma regra da confirmação manual). Alunos já pagos não são tocados.
+        """
+        novos = {
+            "status_pagamento": "1",
+            "metodo_pagamento": "COALESCE(:metodo, metodo_pagamento)",
+            "status_matricula": "CASE WHEN status_assinatura = 1 THEN 'Matrícula Efetivada' ELSE status_matricula END",
+        }
+        filtro = "status_pagamento IS NOT 1"
+        sql = f"UPDATE alunos SET {', '.join(f'{coluna} = {expr}' for coluna, expr in novos.items())} WHERE id = :id AND {filtro}"
+        try:
+            with self.transaction() as conn:
+                self._registrar_eventos(conn, ids, novos, {"metodo": metodo_pagto}, filtro, estacao)
+                conn.executemany(sql, [{"metodo": metodo_pagto, "id": aluno_id} for aluno_id in ids])
+            return True
+        except Exception as e:
+            print(f"Erro ao confirmar pagamentos: {e}")
+            return False
+
+    # --- Histórico de Status ---
+
+    def _id_estacao(self, conn, estacao=None):
+        """Id da estação em 'estacoes' (criada no primeiro uso); None = a estação deste DatabaseManager."""
+        nome = estacao or self.estacao
+        conn.execute("INSERT OR IGNORE INTO estacoes (nome) VALUES (?)", (nome,))
+        return conn.execute("SELECT id FROM estacoes WHERE nome = ?", (nome,)).fetchone()[0]
+
+    def _registrar_eventos(self, conn, ids, novos, valores, filtro="1", estacao=None):
+        """
+        Grava no histórico, com UM INSERT ... SELECT, o que o UPDATE seguinte vai mudar nos alunos 'ids'.
+        Deve rodar ANTES do UPDATE, na mesma transação: compara os valores atuais de cada linha com
+        'novos' ({coluna: expressão SQL do novo valor, a mesma do SET}) e só gera evento onde diferem.
+        'valores' são os parâmetros nomeados das expressões; 'filtro' é o WHERE extra do UPDATE.
+        """
+        eventos = {
+            "status_pagamento": (f"CASE WHEN {{novo}} = 1 THEN {EVENTO_PAGAMENTO_CONFIRMADO} ELSE {EVENTO_PAGAMENTO_PENDENTE} END", "NULL"),
+            "status_assinatura": (f"CASE WHEN {{novo}} = 1 THEN {EVENTO_ASSINATURA_CONFIRMADA} ELSE {EVENTO_ASSINATURA_PENDENTE} END", "NULL"),
+            "metodo_pagamento": (str(EVENTO_METODO), "{novo}"),
+            "status_matricula": (str(EVENTO_STATUS), "{novo}"),
+        }
+        # Na ordem de 'eventos': num mesmo aluno, o id do evento segue pagamento, assinatura, método, status
+        selects = [
+            f"SELECT id, {codigo.format(novo=novos[coluna])} AS codigo, {valor.format(novo=novos[coluna])} AS valor FROM alvo "
+            f"WHERE {coluna} IS NOT ({novos[coluna]})"
+            for coluna, (codigo, valor) in eventos.items() if coluna in novos
+        ]
+        conn.execute(f"""
+            WITH alvo AS (SELECT * FROM alunos WHERE id IN (SELECT value FROM json_each(:ids)) AND {filtro})
+            INSERT INTO alunos_eventos (aluno_id, codigo, valor, momento, estacao_id)
+            SELECT id, codigo, valor, :momento, :estacao FROM ({' UNION ALL '.join(selects)})
+        """, dict(valores, ids=json.dumps(list(ids)), momento=int(time.time()), estacao=self._id_estacao(conn, estacao)))
+
+    def get_historico(self, aluno_id):
+        """
+        Linha do tempo de um aluno, do mais antigo ao mais recente: [(momento, codigo, valor, estação)].
+        'momento' em segundos desde 1970; a descrição de cada código está em DESCRICAO_EVENTOS.
+        Uma busca no índice (aluno_id, momento), que já entrega as linhas em ordem. O histórico de um
+        aluno arquivado está no arquivo do ano.
+        """
+        eventos = self.conn.execute("""
+            SELECT e.momento, e.codigo, e.valor, COALESCE(s.nome, '')
+            FROM alunos_eventos e LEFT JOIN estacoes s ON s.id = e.estacao_id
+            WHERE e.aluno_id = ?
+            ORDER BY e.momento, e.id
+        """, (aluno_id,)).fetchall()
+        if eventos:
+            return eventos
+        return self._consultar_arquivos("alunos_eventos", """
+            SELECT momento, codigo, valor, COALESCE(estacao, '') FROM {esquema}.alunos_eventos
+            WHERE aluno_id = ? ORDER BY momento, id
+        """, (aluno_id,))
+
+    def get_eventos_dia(self, dia):
+        """
+        Eventos de um dia ('dia': datetime.date, hora local) em ordem: [(momento, aluno_id, nome, codigo, valor, estação)].
+        Usa o índice por 'momento' (faixa de um dia). Só o banco atual: o histórico de alunos arquivados
+        vai para o arquivo do ano.
+        """
+        inicio = int(time.mktime(dia.timetuple()))
+        fim = int(time.mktime((dia + timedelta(days=1)).timetuple()))
+        with self.read_connection(relatorio=True) as conn:
+            return conn.execute("""
+                SELECT e.momento, e.aluno_id, COALESCE(a.nome, ''), e.codigo, e.valor, COALESCE(s.nome, '')
+                FROM alunos_eventos e
+                LEFT JOIN alunos a ON a.id = e.aluno_id
+                LEFT JOIN estacoes s ON s.id = e.estacao_id
+                WHERE e.momento >= ? AND e.momento < ?
+                ORDER BY e.momento, e.id
+            """, (inicio, fim)).fetchall()
+
+    def iter_pendentes_pagamento(self, lote=500):
+        """
+        Gera, em lotes, os alunos do banco atual com pagamento pendente, do mais antigo ao mais recente:
+        (id, nome, cpf_digitos, nome_chave da mãe, do pai e do responsável legal; '' se não houver).
+        Roda em uma conexão de relatório (snapshot consistente), como os relatórios.
+        """
+        sql = """
+            SELECT a.id, a.nome, a.cpf_digitos,
+                   COALESCE(m.nome_chave, ''), COALESCE(p.nome_chave, ''), COALESCE(r.nome_chave, '')
+            FROM alunos a
+            LEFT JOIN responsaveis m ON m.id = a.mae_id
+            LEFT JOIN responsaveis p ON p.id = a.pai_id
+            LEFT JOIN responsaveis r ON r.id = a.responsavel_id
+            WHERE a.status_pagamento IS NOT 1
+            ORDER BY a.id
+        """
+        with self.read_connection(relatorio=True) as conn:
+            cursor = conn.execute(sql)
+            while True:
+                linhas = cursor.fetchmany(lote)
+                if not linhas:
+                    break
+                yield from linhas
+
+    def get_responsaveis(self, aluno_id):
+        """
+        Responsáveis de um aluno do banco atual: {"mae"|"pai"|"responsavel": (id, nome, telefone)},
+        só os preenchidos; None se o aluno não está no banco atual (anos arquivados não mudam).
+        Os ids servem para update_responsavel (a correção vale para os irmãos).
+        """
+        linha = self.conn.execute("SELECT mae_id, pai_id, responsavel_id FROM alunos WHERE id = ?", (aluno_id,)).fetchone()
+        if linha is None:
+            return None
+        responsaveis = {}
+        for papel, responsavel_id in zip(("mae", "pai", "responsavel"), linha):
+            if responsavel_id is not None:
+                responsaveis[papel] = self.conn.execute(
+                    "SELECT id, nome, telefone FROM responsaveis WHERE id = ?", (responsavel_id,)).fetchone()
+        return responsaveis
+
+    def update_responsavel(self, responsavel_id, nome, telefone):
+        """
+        Corrige nome/telefone de um responsável, para todos os alunos que apontam para ele.
+        Se a correção o tornar igual a outro responsável já cadastrado, os dois são unificados.
+        Retorna o id que passa a representar a pessoa, ou False em caso de erro.
+        """
+        nome, telefone = nome or "", telefone or ""
+        digitos = so_digitos(telefone)
+        try:
+            with self.transaction() as conn:
+                existente = conn.execute(
+                    "SELECT id FROM responsaveis WHERE nome = ? AND telefone_digitos = ? AND telefone_digitos != '' AND id != ?",
+                    (nome, digitos, responsavel_id)).fetchone()
+                if existente is None:
+                    conn.execute("UPDATE responsaveis SET nome = ?, telefone = ?, telefone_digitos = ?, nome_chave = ? WHERE id = ?",
+                                 (nome, telefone, digitos, chave_busca(nome), responsavel_id))
+                    return responsavel_id
+                for coluna in ("mae_id", "pai_id", "responsavel_id"):
+                    conn.execute(f"UPDATE alunos SET {coluna} = ? WHERE {coluna} = ?", (existente[0], responsavel_id))
+                conn.execute("DELETE FROM responsaveis WHERE id = ?", (responsavel_id,))
+                return existente[0]
+        except Exception as e:
+            print(f"Erro ao atualizar responsável: {e}")
+            return False
+
+    def update_endereco(self, aluno_id, endereco):
+        """
+        Muda o endereço de um aluno para todos os alunos que moram no mesmo endereço (irmãos).
+        Se o novo endereço já estiver cadastrado, os alunos passam a apontar para ele; endereço vazio
+        deixa os irmãos sem endereço. Retorna False se o aluno não está no banco atual ou em caso de erro.
+        """
+        try:
+            with self.transaction() as conn:
+                linha = conn.execute("SELECT endereco_id FROM alunos WHERE id = ?", (aluno_id,)).fetchone()
+                if linha is None:
+                    return False
+                antigo, novo = linha[0], self._id_endereco(conn, endereco)
+                if antigo is None:
+                    conn.execute("UPDATE alunos SET endereco_id = ? WHERE id = ?", (novo, aluno_id))
+                elif novo != antigo:
+                    conn.execute("UPDATE alunos SET endereco_id = ? WHERE endereco_id = ?", (novo, antigo))
+                    conn.execute("DELETE FROM enderecos WHERE id = ?", (antigo,))
+            return True
+        except Exception as e:
+            print(f"Erro ao atualizar endereço: {e}")
+            return False
+
+    # --- Autocompletar do formulário ---
+
+    @staticmethod
+    def _intervalo_prefixo(prefixo):
+        """(início, fim) do intervalo de chaves que começam com 'prefixo' (busca por faixa no índice)."""
+        chave = chave_busca(prefixo)
+        return chave, chave + "\U0010ffff"
+
+    def sugerir_responsaveis(self, prefixo, limite=8):
+        """
+        Responsáveis cujo nome começa com 'prefixo' (sem diferenciar acentos/maiúsculas): [(id, nome, telefone)].
+        Uma busca por faixa no índice (nome_chave, telefone_digitos), que já entrega as linhas em ordem.
+        A mesma pessoa aparece uma vez (a grafia do cadastro mais recente).
+        """
+        inicio, fim = self._intervalo_prefixo(prefixo)
+        if not inicio:
+            return []
+        return self.conn.execute("""
+            SELECT MAX(id), nome, telefone FROM responsaveis
+            WHERE nome_chave >= ? AND nome_chave < ?
+            GROUP BY nome_chave, telefone_digitos
+            ORDER BY nome_chave, telefone_digitos
+            LIMIT ?
+        """, (inicio, fim, limite)).fetchall()
+
+    def sugerir_enderecos(self, prefixo, limite=8):
+        """Endereços já cadastrados que começam com 'prefixo' (sem diferenciar acentos/maiúsculas)."""
+        inicio, fim = self._intervalo_prefixo(prefixo)
+        if not inicio:
+            return []
+        return [linha[0] for linha in self.conn.execute(
+            "SELECT endereco FROM enderecos WHERE endereco_chave >= ? AND endereco_chave < ? ORDER BY endereco_chave LIMIT ?",
+            (inicio, fim, limite))]
+
+    def get_familia_responsavel(self, responsavel_id):
+        """Aluno mais recente (21 campos) que tem este responsável como mãe, pai ou responsável legal; ou None."""
+        return self.conn.execute(f"""
+            SELECT {COLUNAS_ALUNOS} FROM alunos_completos WHERE id = (
+                SELECT MAX(id) FROM alunos WHERE mae_id = ? OR pai_id = ? OR responsavel_id = ?
+            )
+        """, (responsavel_id,) * 3).fetchone()
+
+    # --- Fotos ---
+
+    def salvar_foto(self, aluno_id, dados, largura=None, altura=None):
+        """
+        Grava (ou troca) a foto do aluno. 'dados' é o JPEG de fotos.preparar_foto; a foto é guardada
+        uma vez por conteúdo. Retorna o hash da foto, ou False em caso de erro.
+        """
+        hash_foto = hashlib.sha256(dados).hexdigest()
+        try:
+            with self.transaction() as conn:
+                anterior = conn.execute("SELECT foto_hash FROM alunos_fotos WHERE aluno_id = ?", (aluno_id,)).fetchone()
+                conn.execute("INSERT OR IGNORE INTO fotos (hash, largura, altura, dados) VALUES (?, ?, ?, ?)",
+                             (hash_foto, largura, altura, sqlite3.Binary(dados)))
+                conn.execute("""
+                    INSERT INTO alunos_fotos (aluno_id, foto_hash) VALUES (?, ?)
+                    ON CONFLICT (aluno_id) DO UPDATE SET foto_hash = excluded.foto_hash
+                """, (aluno_id, hash_foto))
+                if anterior is not None and anterior[0] != hash_foto:
+                    self._remover_foto_orfa(conn, anterior[0])
+            return hash_foto
+        except Exception as e:
+            print(f"Erro ao salvar foto: {e}")
+            return False
+
+    def remover_foto(self, aluno_id):
+        """Remove a foto do aluno (os bytes só são apagados se nenhum outro aluno usa a mesma foto)."""
+        try:
+            with self.transaction() as conn:
+                anterior = conn.execute("SELECT foto_hash FROM alunos_fotos WHERE aluno_id = ?", (aluno_id,)).fetchone()
+                if anterior is not None:
+                    conn.execute("DELETE FROM alunos_fotos WHERE aluno_id = ?", (aluno_id,))
+                    self._remover_foto_orfa(conn, anterior[0])
+            return True
+        except Exception as e:
+            print(f"Erro ao remover foto: {e}")
+            return False
+
+    @staticmethod
+    def _remover_foto_orfa(conn, hash_foto):
+        conn.execute("DELETE FROM fotos WHERE hash = ? AND hash NOT IN (SELECT foto_hash FROM alunos_fotos WHERE foto_hash = ?)",
+                     (hash_foto, hash_foto))
+
+    def get_foto_hash(self, aluno_id):
+        """Hash da foto do aluno, ou None."""
+        return self.get_fotos_hashes([aluno_id]).get(aluno_id)
+
+    def get_fotos_hashes(self, ids):
+        """
+        {aluno_id: hash da foto} dos alunos informados que têm foto (ex.: os da página exibida).
+        Alunos que não estão no banco atual são procurados nos arquivos dos anos encerrados.
+        """
+        ids, hashes, arquivados = list(ids), {}, []
+        for i in range(0, len(ids), 500):
+            lote = ids[i:i + 500]
+            marcadores = ", ".join("?" * len(lote))
+            hashes.update(self.conn.execute(
+                f"SELECT aluno_id, foto_hash FROM alunos_fotos WHERE aluno_id IN ({marcadores})", lote))
+            if self._anos_arquivados and len(hashes) < i + len(lote):
+                ativos = {linha[0] for linha in self.conn.execute(f"SELECT id FROM alunos WHERE id IN ({marcadores})", lote)}
+                arquivados.extend(aluno_id for aluno_id in lote if aluno_id not in ativos)
+        for i in range(0, len(arquivados), 500):
+            lote = arquivados[i:i + 500]
+            hashes.update(self._consultar_arquivos(
+                "alunos_fotos", f"SELECT aluno_id, foto_hash FROM {{esquema}}.alunos_fotos WHERE aluno_id IN ({', '.join('?' * len(lote))})",
+                lote))
+        return hashes
+
+    def get_foto(self, hash_foto):
+        """Bytes da foto guardada, ou None. Usa uma conexão só-leitura (chamado pelo worker de miniaturas)."""
+        with self.read_connection() as conn:
+            linha = conn.execute("SELECT dados FROM fotos WHERE hash = ?", (hash_foto,)).fetchone()
+        if linha is None:
+            # Foto de um aluno arquivado
+            linha = next(iter(self._consultar_arquivos("fotos", "SELECT dados FROM {esquema}.fotos WHERE hash = ?",
+                                                       (hash_foto,))), None)
+        return bytes(linha[0]) if linha else None
+
+    def get_alunos_by_ids(self, ids, relatorio=False):
+        """
+        Retorna TODOS os campos dos alunos informados (usado para atualizar só as linhas afetadas).
+        Ids que não estão no banco atual são procurados nos anos arquivados.
+        Com relatorio=True (pacote de fichas), lê por uma conexão de relatório, dentro do
+        snapshot_relatorio() em curso se houver um.
+        """
+        ids = list(ids)
+        if relatorio:
+            with self.read_connection(historico=bool(self._anos_arquivados), relatorio=True) as conn:
+                alunos = self._buscar_por_ids(conn, "alunos_completos", ids)
+                if self._anos_arquivados and len(alunos) < len(ids):
+                    encontrados = {aluno[0] for aluno in alunos}
+                    faltando = [aluno_id for aluno_id in ids if aluno_id not in encontrados]
+                    alunos.extend(self._buscar_por_ids(conn, "alunos_historico", faltando))
+            return alunos
+        alunos = self._buscar_por_ids(self.conn, "alunos_completos", ids)
+        if self._anos_arquivados and len(alunos) < len(ids):
+            encontrados = {aluno[0] for aluno in alunos}
+            faltando = [aluno_id for aluno_id in ids if aluno_id not in encontrados]
+            alunos.extend(self._buscar_por_ids(self._conexao_historico(), "alunos_historico", faltando))
+        return alunos
+
+    @staticmethod
+    def _buscar_por_ids(conn, tabela, ids):
+        alunos = []
+        # Lotes abaixo do limite de parâmetros do SQLite
+        for i in range(0, len(ids), 500):
+            lote = ids[i:i + 500]
+            placeholders = ", ".join("?" * len(lote))
+            alunos.extend(conn.execute(f"SELECT {COLUNAS_ALUNOS} FROM {tabela} WHERE id IN ({placeholders})", lote).fetchall())
+        return alunos
+
+    @staticmethod
+    def _where(condicoes):
+        return f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    def get_alunos(self, ano=None):
+        """
+        Retorna TODOS os campos para a tela de listagem, do ano letivo atual (ou do 'ano' informado).
+        Resultado em cache: enquanto o banco não mudar, devolve o MESMO objeto (tupla imutável).
+        """
+        tabela, condicoes, params, historico = self._origem(ano)
+        return self._consulta_cacheada(f"SELECT {COLUNAS_ALUNOS} FROM {tabela}{self._where(condicoes)} ORDER BY id DESC",
+                                       params, historico)
+
+    def iter_alunos(self, ano=None, lote=500):
+        """
+        Gera, em lotes (fetchmany), as mesmas linhas de get_alunos, SEM passar pelo cache: para quem
+        converte as linhas para outra estrutura (a lista colunar da tela) e não deve manter o resultado
+        completo vivo. Roda em uma conexão só-leitura (snapshot consistente).
+        """
+        tabela, condicoes, params, historico = self._origem(ano)
+        sql = f"SELECT {COLUNAS_ALUNOS} FROM {tabela}{self._where(condicoes)} ORDER BY id DESC"
+        with self.read_connection(historico) as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                linhas = cursor.fetchmany(lote)
+                if not linhas:
+                    break
+                yield from linhas
+
+    def get_alunos_pagina(self, offset=0, limite=50, ano=None):
+        """Retorna uma página da listagem (todos os campos, mais recentes primeiro). Usa o cache."""
+        tabela, condicoes, params, historico = self._origem(ano)
+        return self._consulta_cacheada(
+            f"SELECT {COLUNAS_ALUNOS} FROM {tabela}{self._where(condicoes)} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + [limite, offset], historico)
+
+    def get_resumo(self, ano=None):
+        """Totais por turma: (turma, total, efetivadas, pagamentos pendentes). Usa o cache."""
+        tabela, condicoes, params, historico = self._origem(ano, tabela="alunos")
+        return self._consulta_cacheada(f"""
+            SELECT turma,
+                   COUNT(*),
+                   SUM(status_matricula = 'Matrícula Efetivada'),
+                   SUM(COALESCE(status_pagamento, 0) != 1)
+            FROM {tabela}{self._where(condicoes)} GROUP BY turma
+        """, params, historico)
+
+    def search_alunos(self, termo=None, turma=None, ano=None):
+        """
+        Pesquisa alunos por parte do nome e/ou turma (todos os campos, mais recentes primeiro). Usa o cache.
+        Com ano=TODOS_OS_ANOS a pesquisa inclui os anos arquivados.
+        """
+        tabela, condicoes, params, historico = self._origem(ano)
+        if termo:
+            condicoes.append("nome LIKE ?")
+            params.append(f"%{termo}%")
+        if turma:
+            condicoes.append("turma = ?")
+            params.append(turma)
+        return self._consulta_cacheada(f"SELECT {COLUNAS_ALUNOS} FROM {tabela}{self._where(condicoes)} ORDER BY id DESC",
+                                       params, historico)
+
+    def find_by_contact(self, digitos):
+        """
+        Alunos (todos os campos, mais recentes primeiro) cujo CPF ou algum telefone (mãe, pai,
+        emergência) é exatamente 'digitos' (a máscara é ignorada): irmãos e demais alunos da família.
+        O telefone é procurado uma vez no índice de 'responsaveis'; as chaves e o CPF têm índice
+        próprio em 'alunos', então o OR vira uma busca por índice em cada um (sem varrer a tabela).
+        Procura no banco atual (todos os anos ainda não arquivados). Usa o cache.
+        """
+        digitos = so_digitos(digitos)
+        if not digitos:
+            return ()
+        return self._consulta_cacheada(f"""
+            SELECT {COLUNAS_ALUNOS} FROM alunos_completos WHERE id IN (
+                SELECT id FROM alunos
+                WHERE cpf_digitos = ?
+                   OR mae_id IN (SELECT id FROM responsaveis WHERE telefone_digitos = ?)
+                   OR pai_id IN (SELECT id FROM responsaveis WHERE telefone_digitos = ?)
+                   OR responsavel_id IN (SELECT id FROM responsaveis WHERE telefone_digitos = ?)
+            ) ORDER BY id DESC
+        """, [digitos] * 4)
+
+    def iter_alunos_relatorio(self, turma=None, lote=500, ano=None):
+        """
+        Gera, em lotes (fetchmany), os campos usados nos relatórios de turma, ordenados por nome.
+        Roda em uma conexão de relatório (mode=ro, mmap) com snapshot consistente; nunca carrega a turma
+        inteira na memória.
+        Cada item: (id, nome, data_nascimento, turma, nome_mae, tel_mae, nome_pai, tel_pai,
+        responsavel_legal, tel_responsavel_emergencia, alergia, problema_medicamento,
+        status_pagamento, status_matricula)
+        """
+        tabela, condicoes, params, historico = self._origem(ano)
+        if turma is not None:
+            condicoes.append("turma = ?")
+            params.append(turma)
+        sql = f"""
+            SELECT id, nome, data_nascimento, turma, nome_mae, tel_mae, nome_pai, tel_pai,
+                   responsavel_legal, tel_responsavel_emergencia, alergia, problema_medicamento,
+                   status_pagamento, status_matricula
+            FROM {tabela}{self._where(condicoes)}
+            ORDER BY nome COLLATE NOCASE
+        """
+
+        with self.read_connection(historico, relatorio=True) as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                linhas = cursor.fetchmany(lote)
+                if not linhas:
+                    break
+                yield from linhas
+
+    def get_turmas(self, ano=None):
+        """Retorna as turmas que possuem alunos cadastrados no ano letivo atual (ou no 'ano' informado)."""
+        tabela, condicoes, params, historico = self._origem(ano, tabela="alunos")
+        with self.read_connection(historico, relatorio=True) as conn:
+            return [linha[0] for linha in conn.execute(
+                f"SELECT DISTINCT turma FROM {tabela}{self._where(condicoes)}", params)]
+
+    def get_ultima_alteracao(self):
+        """Sequência da alteração mais recente registrada no feed (0 se não houver)."""
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM alteracoes").fetchone()[0]
+
+    def get_alteracoes_desde(self, seq):
+        """
+        Retorna (ultima_seq, alterados, removidos) com os ids de alunos alterados/inseridos e
+        excluídos depois de 'seq'. Retorna None se 'seq' já foi podado do feed (recarregar tudo).
+        """
+        conn = self.conn
+        menor = conn.execute("SELECT MIN(seq) FROM alteracoes").fetchone()[0]
+        if menor is not None and seq < menor - 1:
+            return None
+
+        ultima_seq, operacoes = seq, {}
+        for seq_alteracao, aluno_id, operacao in conn.execute(
+                "SELECT seq, aluno_id, operacao FROM alteracoes WHERE seq > ? ORDER BY seq", (seq,)):
+            operacoes[aluno_id] = operacao  # a última operação de cada aluno prevalece
+            ultima_seq = seq_alteracao
+
+        alterados = [aluno_id for aluno_id, op in operacoes.items() if op != 'D']
+        removidos = [aluno_id for aluno_id, op in operacoes.items() if op == 'D']
+        return ultima_seq, alterados, removidos
+
+    def liberar_conexoes_da_thread(self):
+        """Fecha as conexões abertas pela thread atual (chamar ao final de threads de trabalho)."""
+        self.pool_relatorios.release()
+        self.pool_leitura.release()
+        self.pool.release()
+
     def close(self):
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        """Fecha todas as conexões abertas pelos pools."""
+        self.pool_relatorios.close_all()
+        self.pool_leitura.close_all()
+        self.pool.close_all()
+        self._cache.invalidate()
+        with self._lock_versao:
+            self._sentinela.close()
@@ -0,0 +1,222 @@
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+from api_loadtest import SOBRENOMES, _percentil
+from database import DatabaseManager
+from utils import TURMAS_CEMAC
+
+# ====================================================================
+# TESTE DE CARGA DO BANCO (vários processos, como várias mesas da secretaria)
+# ====================================================================
+#
+# Cada processo é uma "mesa": abre o próprio DatabaseManager sobre o mesmo
+# matriculas.db e executa, no ritmo configurado, uma mistura de matrículas
+# novas (insert_aluno), confirmações (update_status_matricula) e recargas da
+# listagem (get_alunos), além de relatórios completos (iter_alunos_relatorio, pela
+# conexão de relatório), se pedidos na mistura. Todos começam no mesmo instante. Ao final, o JSON no
+# stdout traz vazão, latência p50/p99, tempo esperando o lock de escrita
+# (BEGIN IMMEDIATE) e operações que falharam, por operação e no total.
+#
+# Sem --db, usa um banco novo em uma pasta temporária. Para medir o banco real,
+# passe uma CÓPIA dele: as matrículas de teste são gravadas de verdade.
+
+# Semana de matrículas: a listagem é recarregada a cada alteração das outras mesas
+MISTURA_PADRAO = "insert=0.3,status=0.2,listar=0.5"
+
+NOMES = ["Ana", "Bruno", "Clara", "Davi", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João",
+         "Laura", "Miguel", "Nicole", "Pedro", "Sofia", "Theo", "Valentina", "Arthur", "Helena", "Lucas"]
+
+
+def _ler_mistura(texto):
+    """'insert=0.3,status=0.2,listar=0.5' -> [(peso acumulado, operação)]."""
+    pesos = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        nome = nome.strip()
+        if nome not in ("insert", "status", "listar", "relatorio"):
+            raise ValueError(f"Operação desconhecida na mistura: '{nome}'")
+        pesos[nome] = float(peso)
+    total = sum(pesos.values())
+    if total <= 0:
+        raise ValueError("A mistura precisa de pelo menos uma operação com peso positivo.")
+    acumulado, mistura = 0.0, []
+    for nome, peso in pesos.items():
+        acumulado += peso / total
+        mistura.append((acumulado, nome))
+    return mistura
+
+
+def _dados_aluno(familias):
+    """16 campos de insert_aluno; irmãos (mesma família) repetem os dados dos responsáveis."""
+    sobrenome, tel_mae, tel_pai = random.choice(familias)
+    return (
+        f"{random.choice(NOMES)} {sobrenome}", "15/03/2021", random.choice(TURMAS_CEMAC), "5",
+        f"Rua {sobrenome}, {random.randint(1, 999)}", f"Maria {sobrenome}", f"José {sobrenome}",
+        tel_mae, tel_pai, "Não Informado", f"Maria {sobrenome}", tel_mae, "", "", "Pix",
+        date.today().strftime("%d/%m/%Y"),
+    )
+
+
+def _familias(quantidade=200, semente=7):
+    aleatorio = random.Random(semente)
+    return [(aleatorio.choice(SOBRENOMES), f"(81) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}",
+             f"(81) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}") for _ in range(quantidade)]
+
+
+def _mesa(numero, db_name, journal_mode, mistura, taxa, inicio, duracao):
+    """Processo de uma mesa: roda até 'inicio + duracao' e devolve as medições brutas."""
+    random.seed(os.getpid() ^ numero)
+    db = DatabaseManager(db_name, journal_mode=journal_mode)
+    familias = _familias()
+    ids = [linha[0] for linha in db.get_alunos()] or [1]
+    latencias, esperas, contagem, falhas = {}, {}, {}, {}
+    intervalo = 1.0 / taxa if taxa > 0 else 0.0
+
+    time.sleep(max(0.0, inicio - time.time()))
+    proxima = time.perf_counter()
+    fim = proxima + duracao
+    while time.perf_counter() < fim:
+        sorteio = random.random()
+        nome = next((operacao for acumulado, operacao in mistura if sorteio <= acumulado), mistura[-1][1])
+        espera_antes = db.espera_escrita_s
+        comeco = time.perf_counter()
+        try:
+            if nome == "insert":
+                aluno_id = db.insert_aluno(_dados_aluno(familias))
+                ok = bool(aluno_id)
+                if ok:
+                    ids.append(aluno_id)
+            elif nome == "status":
+                ok = db.update_status_matricula(random.choice(ids), 1, 1, "Matrícula Efetivada", "Pix")
+            elif nome == "relatorio":
+                # Relatório da escola inteira, lido até o fim (como o PDF da lista de alunos)
+                for _ in db.iter_alunos_relatorio():
+                    pass
+                ok = True
+            else:
+                db.get_alunos()
+                ok = True
+        except Exception as e:
+            ok = False
+            falhas.setdefault(nome, {}).setdefault(type(e).__name__, 0)
+            falhas[nome][type(e).__name__] += 1
+        else:
+            if not ok:
+                # insert_aluno/update_status_* tratam o erro e devolvem False
+                falhas.setdefault(nome, {}).setdefault("retorno_falso", 0)
+                falhas[nome]["retorno_falso"] += 1
+        latencias.setdefault(nome, []).append(time.perf_counter() - comeco)
+        if nome not in ("listar", "relatorio"):
+            esperas.setdefault(nome, []).append(db.espera_escrita_s - espera_antes)
+        contagem[nome] = contagem.get(nome, 0) + 1
+
+        if intervalo:
+            # Ritmo fixo por mesa: depois de uma operação lenta, as seguintes saem sem pausa até recuperar
+            proxima += intervalo
+            time.sleep(max(0.0, proxima - time.perf_counter()))
+
+    db.close()
+    return latencias, esperas, contagem, falhas
+
+
+def _preparar_banco(db_name, journal_mode, alunos_iniciais):
+    db = DatabaseManager(db_name, journal_mode=journal_mode)
+    faltando = alunos_iniciais - len(db.get_alunos())
+    familias = _familias()
+    for _ in range(max(0, faltando)):
+        db.insert_aluno(_dados_aluno(familias))
+    db.close()
+
+
+def executar(args):
+    mistura = _ler_mistura(args.mistura)
+    pasta_temporaria = None
+    db_name = args.db
+    if db_name is None:
+        pasta_temporaria = tempfile.TemporaryDirectory(prefix="cemac_loadtest_")
+        db_name = os.path.join(pasta_temporaria.name, "matriculas.db")
+    try:
+        _preparar_banco(db_name, args.journal_mode, args.alunos_iniciais)
+
+        # Os processos abrem o banco antes do início combinado; todos começam juntos
+        inicio = time.time() + 1.0 + 0.05 * args.processos
+        with multiprocessing.Pool(args.processos) as pool:
+            resultados = pool.starmap(_mesa, [
+                (numero, db_name, args.journal_mode, mistura, args.taxa, inicio, args.duracao)
+                for numero in range(args.processos)
+            ])
+    finally:
+        if pasta_temporaria is not None:
+            pasta_temporaria.cleanup()
+
+    latencias, esperas, contagem, falhas = {}, {}, {}, {}
+    for lat, esp, cont, fal in resultados:
+        for nome, valores in lat.items():
+            latencias.setdefault(nome, []).extend(valores)
+        for nome, valores in esp.items():
+            esperas.setdefault(nome, []).extend(valores)
+        for nome, n in cont.items():
+            contagem[nome] = contagem.get(nome, 0) + n
+        for nome, tipos in fal.items():
+            for tipo, n in tipos.items():
+                falhas.setdefault(nome, {}).setdefault(tipo, 0)
+                falhas[nome][tipo] += n
+
+    todas = [l for valores in latencias.values() for l in valores]
+    todas_esperas = [e for valores in esperas.values() for e in valores]
+    operacoes = sum(contagem.values())
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "db": args.db or "(temporário)",
+        "journal_mode": args.journal_mode,
+        "processos": args.processos,
+        "taxa_por_processo": args.taxa or "máxima",
+        "mistura": args.mistura,
+        "duracao_s": args.duracao,
+        "operacoes": operacoes,
+        "operacoes_por_s": round(operacoes / args.duracao, 1),
+        "latencia_ms": {"p50": ms(_percentil(todas, 50)), "p99": ms(_percentil(todas, 99)),
+                        "max": ms(max(todas, default=0))},
+        "espera_lock_ms": {"total": ms(sum(todas_esperas)), "p50": ms(_percentil(todas_esperas, 50)),
+                           "p99": ms(_percentil(todas_esperas, 99)), "max": ms(max(todas_esperas, default=0))},
+        "falhas": sum(n for tipos in falhas.values() for n in tipos.values()),
+        "por_operacao": {
+            nome: {
+                "n": contagem.get(nome, 0),
+                "por_s": round(contagem.get(nome, 0) / args.duracao, 1),
+                "p50_ms": ms(_percentil(valores, 50)),
+                "p99_ms": ms(_percentil(valores, 99)),
+                **({"espera_lock_p99_ms": ms(_percentil(esperas[nome], 99))} if nome in esperas else {}),
+                "falhas": falhas.get(nome, {}),
+            }
+            for nome, valores in sorted(latencias.items())
+        },
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Teste de carga do banco de matrículas com vários processos (mesas).")
+    parser.add_argument("--db", help="Banco a usar (use uma CÓPIA). Padrão: banco novo em pasta temporária")
+    parser.add_argument("--processos", type=int, default=4, help="Mesas (processos) simultâneas")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Duração do teste em segundos")
+    parser.add_argument("--taxa", type=float, default=0.0, help="Operações por segundo por mesa (0 = o mais rápido possível)")
+    parser.add_argument("--mistura", default=MISTURA_PADRAO, help=f"Pesos das operações (padrão: {MISTURA_PADRAO})")
+    parser.add_argument("--journal-mode", default="WAL", choices=["WAL", "DELETE", "TRUNCATE", "PERSIST"],
+                        help="Modo de journal das conexões de escrita (padrão: WAL)")
+    parser.add_argument("--alunos-iniciais", type=int, default=500, help="Alunos no banco antes do teste")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(executar(args), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
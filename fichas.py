@@ -0,0 +1,226 @@
+from datetime import date
+from io import BytesIO
+import hashlib
+import json
+import os
+import re
+import zipfile
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+
+from cache import ResultCache
+
+# ====================================================================
+# FICHA DE MATRÍCULA (PDF)
+# ====================================================================
+
+# Caminhos de imagem do cabeçalho
+ESCUDO_PATH = "escudo.png"
+LOGO_PATH = "logo.jpg"
+
+# Foto 3x4 do aluno (canto direito, entre o cabeçalho e os dados)
+FOTO_LARGURA, FOTO_ALTURA = 3 * cm, 4 * cm
+
+
+def desenhar_ficha(c, aluno_data, foto=None):
+    """
+    Desenha a ficha de matrícula em uma página do canvas 'c' (aluno_data no formato de aluno_para_dict).
+    'foto': JPEG da versão de impressão (fotos.foto_impressao), ou None para a ficha sem foto.
+    """
+    width, height = A4
+
+    # --- CABEÇALHO (Logos e Info da Escola) ---
+    if os.path.exists(ESCUDO_PATH): 
+        c.drawImage(ESCUDO_PATH, 50, height - 90, width=60, height=75) 
+    if os.path.exists(LOGO_PATH): 
+        c.drawImage(LOGO_PATH, width - 110, height - 90, width=80, height=80) 
+
+    # Título principal
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(width/2, height - 50, "FICHA DE MATRÍCULA - CEMAC")
+
+    # Subtítulo e CNPJ
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(width/2, height - 70, "Centro Educacional Mariano Cavalcanti")
+    c.drawCentredString(width/2, height - 85, "CNPJ: 48.932.962/0001-05")
+
+    # Informação de Matrícula/Emissão
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(width/2, height - 110, f"Ficha de Matrícula - {date.today().year}")
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(width/2, height - 125, f"Data de Emissão: {date.today().strftime('%d/%m/%Y')}")
+
+    y_pos = height - 180 
+
+    if foto:
+        # Foto centralizada no quadro 3x4, sem distorcer; os dados começam abaixo dela
+        imagem = ImageReader(BytesIO(foto))
+        largura_img, altura_img = imagem.getSize()
+        escala = min(FOTO_LARGURA / largura_img, FOTO_ALTURA / altura_img)
+        x_quadro, y_quadro = width - 50 - FOTO_LARGURA, height - 140 - FOTO_ALTURA
+        c.drawImage(imagem, x_quadro + (FOTO_LARGURA - largura_img * escala) / 2,
+                    y_quadro + (FOTO_ALTURA - altura_img * escala) / 2,
+                    width=largura_img * escala, height=altura_img * escala)
+        c.rect(x_quadro, y_quadro, FOTO_LARGURA, FOTO_ALTURA)
+        y_pos = y_quadro - 20
+
+    # Formatação de campos vazios/padrão
+    alergia = aluno_data['Alergia'] if aluno_data['Alergia'] not in ('Não', '') else 'Nenhuma'
+    prob_med = aluno_data['ProbMed'] if aluno_data['ProbMed'] not in ('Não', '') else 'Nenhum'
+    cpf_aluno = aluno_data['CPFAluno'] if aluno_data['CPFAluno'] not in ('Não Informado', '') else 'Não Informado'
+
+    # 1. DADOS DO ALUNO
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, "1. DADOS DO ALUNO:")
+    y_pos -= 18 
+
+    c.setFont("Helvetica", 11)
+    c.drawString(50, y_pos, f"Nome da Criança: {aluno_data['Nome']}")
+    c.drawString(350, y_pos, f"Data Nasc: {aluno_data['DataNasc']} (Idade: {aluno_data['Idade']} anos)")
+    y_pos -= 18
+    c.drawString(50, y_pos, f"Endereço: {aluno_data['Endereco']}")
+    c.drawString(350, y_pos, f"Turma / Ano: {aluno_data['Turma']}")
+    y_pos -= 18
+    # CPF DO ALUNO
+    c.drawString(50, y_pos, f"CPF do Aluno: {cpf_aluno}") 
+    y_pos -= 25
+
+    # 2. DADOS DOS RESPONSÁVEIS
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, "2. DADOS DOS RESPONSÁVEIS:")
+    y_pos -= 18
+
+    c.setFont("Helvetica", 11)
+    c.drawString(50, y_pos, f"Responsável Legal: {aluno_data['RespLegal']}")
+    c.drawString(350, y_pos, f"Tel. Emergência: {aluno_data['TelEmerg']}")
+    y_pos -= 18
+    c.drawString(50, y_pos, f"Nome da Mãe: {aluno_data['NomeMae']} - Tel: {aluno_data['TelMae']}")
+    y_pos -= 18
+    c.drawString(50, y_pos, f"Nome do Pai: {aluno_data['NomePai']} - Tel: {aluno_data['TelPai']}")
+    y_pos -= 25
+
+    # 3. INFORMAÇÕES ADICIONAIS
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, "3. INFORMAÇÕES ADICIONAIS:")
+    y_pos -= 18
+
+    c.setFont("Helvetica", 11)
+    c.drawString(50, y_pos, f"Alergias: {alergia}")
+    c.drawString(350, y_pos, f"Problemas c/ Med.: {prob_med}")
+    y_pos -= 18
+
+    c.drawString(50, y_pos, f"Pagamento: {'PAGO' if aluno_data['PagtoStatus'] == 1 else 'PENDENTE'} - Método: {aluno_data['PagtoMetodo']}")
+    c.drawString(350, y_pos, f"Status Matrícula: {aluno_data['MatriculaStatus']}")
+    y_pos -= 50
+
+    # --- 4. ASSINATURAS (Centralizadas) ---
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, "4. ASSINATURAS:")
+    y_pos -= 30
+
+    PAGE_CENTER_X = width / 2 
+    LINE_WIDTH = 300 
+    TEXT_OFFSET = 10 
+    SPACE_BETWEEN_SIGNS = 120 
+
+    line_x_start = PAGE_CENTER_X - (LINE_WIDTH / 2)
+    line_x_end = PAGE_CENTER_X + (LINE_WIDTH / 2)
+
+    # 1. Assinatura do Responsável Legal 
+    c.line(line_x_start, y_pos, line_x_end, y_pos) 
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(PAGE_CENTER_X, y_pos - TEXT_OFFSET, f"Assinatura do Responsável Legal: {aluno_data['RespLegal']}")
+
+    y_pos -= SPACE_BETWEEN_SIGNS 
+
+    # 2. Espaço para Assinatura da Escola 
+    c.line(line_x_start, y_pos, line_x_end, y_pos)
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(PAGE_CENTER_X, y_pos - TEXT_OFFSET, "Assinatura da Escola (Diretora/Coordenadora)")
+
+    y_pos -= 40
+
+    # --- RODAPÉ DA ESCOLA (Fixo na parte inferior) ---
+    c.setFont("Helvetica", 8)
+    rodape_text = "Rua Governador Nilo Coelho, 198 - Bairro Centro - Macaparana, PE | Tel: (81) 99813-3609 | cemac.contato@gmail.com"
+    c.drawCentredString(width/2, 30, rodape_text)
+
+    c.showPage()
+
+
+def renderizar_ficha_pdf(aluno_data, foto=None):
+    """Desenha a ficha de matrícula em memória (sem cache) e retorna os bytes do PDF."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    desenhar_ficha(c, aluno_data, foto)
+    c.save()
+    return buffer.getvalue()
+
+
+# ====================================================================
+# CACHE DE FICHAS POR HASH DO CONTEÚDO
+# ====================================================================
+
+def chave_ficha(aluno_data, emissao=None, foto=None):
+    """
+    Hash (SHA-256) de tudo o que aparece na ficha: os campos do aluno, a data de emissão
+    (impressa na página), a foto e as imagens do cabeçalho (identificadas por tamanho e data de modificação).
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(aluno_data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    h.update((emissao or date.today()).isoformat().encode("ascii"))
+    h.update(hashlib.sha256(foto).digest() if foto else b"-")
+    for caminho in (ESCUDO_PATH, LOGO_PATH):
+        try:
+            info = os.stat(caminho)
+            h.update(f"{caminho}:{info.st_size}:{info.st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            h.update(f"{caminho}:-".encode("utf-8"))
+    return h.hexdigest()
+
+
+# Como a chave é o conteúdo, não há invalidação: ficha alterada gera outra chave e a antiga sai por LRU
+cache_fichas = ResultCache(max_entradas=512, max_bytes=32 * 1024 * 1024, tamanho=len)
+
+
+def gerar_ficha_pdf(aluno_data, foto=None):
+    """Retorna os bytes do PDF da ficha; reimprimir uma ficha que não mudou devolve o PDF já gerado."""
+    chave = chave_ficha(aluno_data, foto=foto)
+    pdf = cache_fichas.get(chave, None)
+    if pdf is None:
+        pdf = renderizar_ficha_pdf(aluno_data, foto)
+        cache_fichas.put(chave, None, pdf)
+    return pdf
+
+
+# ====================================================================
+# PACOTE ZIP DE FICHAS (STREAMING)
+# ====================================================================
+
+def nome_arquivo_ficha(aluno_data):
+    """Nome do PDF da ficha (sem caracteres inválidos em nomes de arquivo)."""
+    nome = re.sub(r'[\\/:*?"<>|]', "", aluno_data['Nome']).replace(' ', '_')
+    return f"Ficha_Matricula_{nome}.pdf"
+
+
+def gravar_zip_fichas(destino, alunos, progresso=None, foto=None):
+    """
+    Grava as fichas de 'alunos' (iterável de dicionários no formato de aluno_para_dict) em um ZIP.
+    Cada PDF é gerado em memória e escrito direto na saída antes do próximo: sem arquivos
+    temporários e com no máximo uma ficha na memória além do cache. 'destino' pode ser um
+    caminho ou um arquivo binário aberto (inclusive não pesquisável, como um socket).
+    'progresso(n)' é chamado após cada ficha; 'foto(aluno_data)', se informado, devolve o JPEG
+    de impressão da foto do aluno (ou None). Retorna quantas fichas foram gravadas.
+    """
+    total = 0
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as pacote:
+        for aluno_data in alunos:
+            # O ID no nome evita colisão entre alunos homônimos
+            pacote.writestr(f"{aluno_data['ID']}_{nome_arquivo_ficha(aluno_data)}", gerar_ficha_pdf(aluno_data, foto(aluno_data) if foto else None))
+            total += 1
+            if progresso is not None:
+                progresso(total)
+    return total
@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from io import BytesIO
+import os
+import queue
+import threading
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# ====================================================================
+# FOTOS DOS ALUNOS (ARMAZENAMENTO E MINIATURAS)
+# ====================================================================
+#
+# A foto escolhida no formulário é reduzida uma vez (lado maior LADO_MAXIMO,
+# JPEG) e gravada no banco fora da tabela 'alunos', endereçada pelo SHA-256 do
+# conteúdo (DatabaseManager.salvar_foto): irmãos com a mesma foto, ou a mesma
+# foto salva duas vezes, ocupam espaço uma vez só.
+#
+# Miniaturas (lista, formulário) e a versão de impressão (ficha) são derivadas
+# sob demanda e guardadas em um cache LRU em memória e em disco, endereçado por
+# (hash, lado). A lista só lê miniaturas prontas; as que faltam são geradas por
+# um worker em segundo plano. Fotos JPEG são decodificadas já em escala
+# reduzida (Image.draft): nem o worker decodifica a imagem em tamanho cheio.
+
+LADO_MAXIMO = 1200     # foto guardada no banco
+LADO_IMPRESSAO = 600   # ficha impressa (3x4 cm a ~400 dpi)
+LADO_FORMULARIO = 160
+LADO_LISTA = 32
+QUALIDADE_JPEG = 85
+MAX_BYTES_ARQUIVO = 25 * 1024 * 1024
+
+
+def _reduzir(imagem, lado):
+    """Imagem RGB com lado maior <= 'lado', já na orientação da câmera (EXIF)."""
+    if imagem.format == "JPEG":
+        # Decodifica direto em 1/2, 1/4 ou 1/8 da resolução (o necessário para 'lado')
+        imagem.draft("RGB", (lado, lado))
+    imagem = ImageOps.exif_transpose(imagem)
+    imagem.thumbnail((lado, lado))
+    return imagem.convert("RGB")
+
+
+def _jpeg(imagem):
+    saida = BytesIO()
+    imagem.save(saida, "JPEG", quality=QUALIDADE_JPEG, optimize=True)
+    return saida.getvalue()
+
+
+def preparar_foto(caminho):
+    """
+    Lê a foto escolhida pelo usuário e retorna (JPEG reduzido a LADO_MAXIMO, largura, altura).
+    Levanta ValueError se o arquivo não for uma imagem ou for grande demais.
+    """
+    if os.path.getsize(caminho) > MAX_BYTES_ARQUIVO:
+        raise ValueError(f"Arquivo maior que {MAX_BYTES_ARQUIVO // (1024 * 1024)} MB.")
+    try:
+        with Image.open(caminho) as imagem:
+            reduzida = _reduzir(imagem, LADO_MAXIMO)
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"O arquivo não é uma imagem válida: {e}")
+    return _jpeg(reduzida), reduzida.width, reduzida.height
+
+
+def gerar_derivado(dados, lado):
+    """JPEG com lado maior <= 'lado', a partir dos bytes da foto guardada."""
+    with Image.open(BytesIO(dados)) as imagem:
+        return _jpeg(_reduzir(imagem, lado))
+
+
+class CacheMiniaturas:
+    """
+    Cache LRU de derivados de foto (miniaturas e versão de impressão), chave (hash, lado).
+    Em memória: limitado por número de entradas. Em disco ('pasta'): limitado por bytes; cada
+    acerto renova a data de modificação do arquivo, e os mais antigos são apagados primeiro.
+    Derivados pedidos com pedir() são gerados por uma thread e entregues por concluidas().
+    """
+
+    def __init__(self, pasta="miniaturas", max_entradas=512, max_bytes_disco=64 * 1024 * 1024):
+        self.pasta = pasta
+        self.max_entradas = max_entradas
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()  # (hash, lado) -> bytes JPEG
+        self._lock = threading.Lock()
+        self._bytes_disco = None       # calculado na primeira gravação
+        self._fila = queue.Queue()
+        self._prontas = queue.Queue()
+        self._pendentes = set()
+        self._worker = None
+        self._liberar = None
+
+    def _arquivo(self, hash_foto, lado):
+        return os.path.join(self.pasta, f"{hash_foto}_{lado}.jpg")
+
+    # --- Leitura (nunca gera nada) ---
+
+    def obter(self, hash_foto, lado):
+        """Bytes do derivado se já estiver na memória ou no disco; None caso contrário."""
+        chave = (hash_foto, lado)
+        with self._lock:
+            dados = self._memoria.get(chave)
+            if dados is not None:
+                self._memoria.move_to_end(chave)
+                return dados
+        caminho = self._arquivo(hash_foto, lado)
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+            os.utime(caminho)
+        except OSError:
+            return None
+        self._guardar_memoria(chave, dados)
+        return dados
+
+    def _guardar_memoria(self, chave, dados):
+        with self._lock:
+            self._memoria[chave] = dados
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_entradas:
+                self._memoria.popitem(last=False)
+
+    def _guardar_disco(self, hash_foto, lado, dados):
+        """Grava o derivado e, se a pasta passar do limite, apaga os menos usados."""
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            caminho = self._arquivo(hash_foto, lado)
+            temporario = f"{caminho}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(dados)
+            os.replace(temporario, caminho)
+            with self._lock:
+                if self._bytes_disco is None:
+                    self._bytes_disco = sum(e.stat().st_size for e in os.scandir(self.pasta) if e.is_file())
+                else:
+                    self._bytes_disco += len(dados)
+                if self._bytes_disco <= self.max_bytes_disco:
+                    return
+                arquivos = sorted((e for e in os.scandir(self.pasta) if e.is_file()), key=lambda e: e.stat().st_mtime)
+                self._bytes_disco = sum(e.stat().st_size for e in arquivos)
+                for entrada in arquivos:
+                    if self._bytes_disco <= self.max_bytes_disco * 0.8:
+                        break
+                    tamanho = entrada.stat().st_size
+                    os.remove(entrada.path)
+                    self._bytes_disco -= tamanho
+        except OSError as e:
+            # Sem cache em disco (pasta sem permissão, disco cheio): segue só com a memória
+            print(f"Erro ao gravar miniatura: {e}")
+
+    # --- Geração ---
+
+    def gerar(self, hash_foto, lado, carregar):
+        """Derivado pronto ou gerado agora; 'carregar(hash)' devolve os bytes da foto guardada."""
+        dados = self.obter(hash_foto, lado)
+        if dados is None:
+            original = carregar(hash_foto)
+            if original is None:
+                return None
+            dados = gerar_derivado(original, lado)
+            self._guardar_memoria((hash_foto, lado), dados)
+            self._guardar_disco(hash_foto, lado, dados)
+        return dados
+
+    def pedir(self, hash_foto, lado, carregar, liberar=None):
+        """
+        Agenda a geração em segundo plano (pedidos repetidos são ignorados). A thread termina quando
+        a fila esvazia, chamando antes 'liberar()' (ex.: fechar as conexões de banco que abriu).
+        """
+        chave = (hash_foto, lado)
+        with self._lock:
+            if chave in self._pendentes:
+                return
+            self._pendentes.add(chave)
+            self._liberar = liberar
+            self._fila.put((chave, carregar))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._trabalhar, name="cemac-miniaturas", daemon=True)
+                self._worker.start()
+
+    def _trabalhar(self):
+        while True:
+            with self._lock:
+                if self._fila.empty():
+                    # Sai com o lock: um pedir() concorrente verá a thread morta e criará outra
+                    self._worker = None
+                    liberar = self._liberar
+                    break
+                (hash_foto, lado), carregar = self._fila.get()
+            try:
+                dados = self.gerar(hash_foto, lado, carregar)
+            except Exception as e:
+                print(f"Erro ao gerar miniatura de {hash_foto}: {e}")
+                dados = None
+            with self._lock:
+                self._pendentes.discard((hash_foto, lado))
+            self._prontas.put((hash_foto, lado, dados))
+        if liberar is not None:
+            liberar()
+
+    def concluidas(self):
+        """Derivados gerados desde a última chamada: [(hash, lado, bytes ou None)]. Chamar da thread da UI."""
+        prontas = []
+        while True:
+            try:
+                prontas.append(self._prontas.get_nowait())
+            except queue.Empty:
+                return prontas
+
+    def ocupado(self):
+        with self._lock:
+            return bool(self._pendentes)
+
+
+# Instância usada pelas telas e pela ficha
+cache_miniaturas = CacheMiniaturas()
+
+
+def foto_impressao(hash_foto, carregar):
+    """Versão de impressão (LADO_IMPRESSAO) da foto, para a ficha; None se a foto não existir."""
+    if not hash_foto:
+        return None
+    return cache_miniaturas.gerar(hash_foto, LADO_IMPRESSAO, carregar)
@@ -1,5 +1,45 @@
-from views import MatriculaApp
+import argparse
+import os
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CEMAC - Sistema de Matrícula")
+    parser.add_argument("--servidor", action="store_true",
+                        help="Roda o serviço HTTP/JSON do banco em vez da janela (ver api_server.py)")
+    parser.add_argument("--api", default=os.environ.get("CEMAC_API_URL"),
+                        help="URL do serviço (ex.: http://192.168.0.10:8765); padrão: variável CEMAC_API_URL. "
+                             "O token do serviço vem da variável CEMAC_API_TOKEN")
+    parser.add_argument("--arquivar", type=int, metavar="ANO",
+                        help="Move as matrículas de um ano encerrado para matriculas_ANO.db (só-leitura) e sai")
+    return parser.parse_known_args(argv)
+
 
 if __name__ == "__main__":
-    app = MatriculaApp()
-    app.mainloop()
\ No newline at end of file
+    args, resto = parse_args()
+
+    if args.servidor:
+        from api_server import main as servidor_main
+        sys.exit(servidor_main(resto))
+
+    if args.arquivar:
+        from database import DatabaseManager
+        db = DatabaseManager()
+        try:
+            movidos = db.arquivar_ano(args.arquivar)
+        except ValueError as e:
+            sys.exit(str(e))
+        finally:
+            db.close()
+        print(f"{movidos} matrículas de {args.arquivar} movidas para {db.caminho_arquivo(args.arquivar)}.")
+        sys.exit(0)
+
+    from views import MatriculaApp
+
+    db = None
+    if args.api:
+        from api_client import RemoteDatabaseManager
+        db = RemoteDatabaseManager(args.api)
+
+    app = MatriculaApp(db)
+    app.mainloop()
@@ -0,0 +1,130 @@
+import cProfile
+import functools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+# ====================================================================
+# MODO DE ANÁLISE DE DESEMPENHO DAS AÇÕES DA INTERFACE
+# ====================================================================
+#
+# Os callbacks da interface (filtrar, salvar, imprimir, trocar de tela...) são
+# embrulhados na própria classe, antes de as telas serem criadas. Com o modo
+# desligado o embrulho custa uma verificação de atributo; ligado, cada ação roda
+# sob cProfile e as que passam do limite viram um arquivo .pstats com data e
+# hora na pasta de perfis, mais uma linha em 'acoes_lentas.log'.
+#
+# Ligar: variável de ambiente CEMAC_PROFILE=1 (ou Ctrl+Shift+P na janela).
+# Limite: CEMAC_PROFILE_LIMITE_MS (padrão 500). Pasta: CEMAC_PROFILE_DIR (padrão profiles).
+# Ler depois: python profiling.py [arquivo.pstats]
+
+LIMITE_PADRAO_MS = 500
+PASTA_PADRAO = "profiles"
+ARQUIVO_LOG = "acoes_lentas.log"
+
+
+class ProfilerAcoes:
+    """Registra em .pstats as ações da interface que demoram mais que 'limite_ms'."""
+
+    def __init__(self, ativo=False, limite_ms=LIMITE_PADRAO_MS, pasta=PASTA_PADRAO):
+        self.ativo = ativo
+        self.limite_ms = limite_ms
+        self.pasta = pasta
+        self.registradas = 0
+        self._local = threading.local()
+
+    @classmethod
+    def do_ambiente(cls):
+        """Configuração a partir das variáveis CEMAC_PROFILE, CEMAC_PROFILE_LIMITE_MS e CEMAC_PROFILE_DIR."""
+        try:
+            limite_ms = float(os.environ.get("CEMAC_PROFILE_LIMITE_MS", LIMITE_PADRAO_MS))
+        except ValueError:
+            limite_ms = LIMITE_PADRAO_MS
+        return cls(
+            ativo=os.environ.get("CEMAC_PROFILE", "").strip().lower() in ("1", "true", "sim", "on"),
+            limite_ms=limite_ms,
+            pasta=os.environ.get("CEMAC_PROFILE_DIR") or PASTA_PADRAO,
+        )
+
+    def alternar(self):
+        self.ativo = not self.ativo
+        return self.ativo
+
+    def instrumentar(self, classe, nomes):
+        """Substitui os métodos 'nomes' da classe por versões medidas (fazer antes de criar as telas)."""
+        for nome in nomes:
+            original = getattr(classe, nome)
+            if getattr(original, "_perfilado", False):
+                continue
+            embrulho = self._embrulhar(original, f"{classe.__name__}.{nome}")
+            embrulho._perfilado = True
+            setattr(classe, nome, embrulho)
+
+    def _embrulhar(self, funcao, rotulo):
+        @functools.wraps(funcao)
+        def medido(*args, **kwargs):
+            # Ações aninhadas (ex.: _apply_filter -> _display_current_page) entram no perfil da externa
+            if not self.ativo or getattr(self._local, "medindo", False):
+                return funcao(*args, **kwargs)
+
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Outro profiler já está ativo no processo: executa sem medir
+                return funcao(*args, **kwargs)
+            self._local.medindo = True
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                perfil.disable()
+                self._local.medindo = False
+                decorrido_ms = (time.perf_counter() - inicio) * 1000
+                if decorrido_ms >= self.limite_ms:
+                    self._registrar(perfil, rotulo, decorrido_ms)
+        return medido
+
+    def _registrar(self, perfil, rotulo, decorrido_ms):
+        """Grava o perfil da ação lenta; falha ao gravar nunca interrompe a ação do usuário."""
+        agora = datetime.now()
+        nome = f"{agora.strftime('%Y%m%d_%H%M%S_%f')[:-3]}_{re.sub(r'[^A-Za-z0-9_.]', '', rotulo)}_{int(decorrido_ms)}ms.pstats"
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            caminho = os.path.join(self.pasta, nome)
+            perfil.dump_stats(caminho)
+            with open(os.path.join(self.pasta, ARQUIVO_LOG), "a", encoding="utf-8") as log:
+                log.write(f"{agora.isoformat(timespec='milliseconds')}\t{rotulo}\t{decorrido_ms:.0f} ms\t{nome}\n")
+            self.registradas += 1
+        except OSError as e:
+            print(f"Erro ao gravar perfil de {rotulo}: {e}")
+
+
+# Instância usada pela aplicação (views.py instrumenta as telas com ela)
+profiler = ProfilerAcoes.do_ambiente()
+
+
+def main(argv=None):
+    """Mostra as funções mais custosas de um .pstats (padrão: o mais recente da pasta de perfis)."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        caminho = argv[0]
+    else:
+        pasta = os.environ.get("CEMAC_PROFILE_DIR") or PASTA_PADRAO
+        arquivos = sorted(f for f in os.listdir(pasta) if f.endswith(".pstats")) if os.path.isdir(pasta) else []
+        if not arquivos:
+            print(f"Nenhum perfil encontrado em '{pasta}'.")
+            return 1
+        caminho = os.path.join(pasta, arquivos[-1])
+
+    print(caminho)
+    pstats.Stats(caminho).sort_stats("cumulative").print_stats(25)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
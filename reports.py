@@ -0,0 +1,222 @@
+import calendar
+import textwrap
+from datetime import date
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, Table, TableStyle
+from reportlab.platypus.doctemplate import LayoutError
+
+from database import TODOS_OS_ANOS
+from utils import TURMAS_CEMAC
+
+# ====================================================================
+# RELATÓRIOS DE TURMA (Lista de Alunos e Folha de Chamada)
+# ====================================================================
+#
+# As linhas vêm do banco em lotes (DatabaseManager.iter_alunos_relatorio) e são
+# convertidas em pequenas tabelas platypus de LINHAS_POR_BLOCO linhas. Cada bloco
+# é encaixado no Frame da página atual; quando a página enche, ela é finalizada
+# (showPage) e uma nova é aberta. Assim nunca existe na memória mais do que um
+# bloco de linhas nem os objetos platypus de mais de um bloco.
+#
+# As páginas prontas, porém, NÃO vão para o disco uma a uma: o canvas do
+# reportlab guarda o conteúdo (comprimido) de todas até o save() final. A
+# memória cresce com o número de páginas, cerca de 1,1 MB a cada 1.000 alunos
+# na lista de turma; o arquivo só é escrito no fim.
+
+PAGINA = landscape(A4)
+MARGEM = 30
+LINHAS_POR_BLOCO = 25
+ESCOLA = "Centro Educacional Mariano Cavalcanti - CEMAC"
+
+ESTILO_TABELA = TableStyle([
+    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+    ("FONT", (0, 1), (-1, -1), "Helvetica", 7.5),
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#DDE6F0")),
+    ("GRID", (0, 0), (-1, -1), 0.4, colors.grey),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("TOPPADDING", (0, 0), (-1, -1), 2),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+])
+
+
+def _quebrar(texto, largura):
+    """Quebra texto longo em linhas (células de Table aceitam '\\n' sem o custo de um Paragraph)."""
+    return "\n".join(textwrap.wrap(texto or "", largura)) or "-"
+
+
+def _ordenar_turmas(turmas):
+    ordem = {turma: i for i, turma in enumerate(TURMAS_CEMAC)}
+    return sorted(turmas, key=lambda t: (ordem.get(t, len(ordem)), t))
+
+
+class _PaginadorStreaming:
+    """
+    Desenha blocos de tabela página a página, com cabeçalho e rodapé em cada página.
+    "Streaming" vale para a entrada (linhas e tabelas); a saída não: cada página finalizada
+    fica no documento do canvas (comprimida) até salvar().
+    """
+
+    def __init__(self, destino, titulo):
+        self.canvas = canvas.Canvas(destino, pagesize=PAGINA, pageCompression=1)
+        self.titulo = titulo
+        self.subtitulo = ""
+        self.pagina = 0
+        self.frame = None
+
+    def nova_secao(self, subtitulo):
+        """Inicia uma nova seção (ex.: outra turma) sempre no topo de uma página nova."""
+        if self.frame is not None:
+            self._fechar_pagina()
+        self.subtitulo = subtitulo
+        self._abrir_pagina()
+
+    def _abrir_pagina(self):
+        largura, altura = PAGINA
+        self.pagina += 1
+        c = self.canvas
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(MARGEM, altura - MARGEM - 10, self.titulo)
+        c.setFont("Helvetica", 10)
+        c.drawString(MARGEM, altura - MARGEM - 26, self.subtitulo)
+        c.drawRightString(largura - MARGEM, altura - MARGEM - 10, ESCOLA)
+        c.drawRightString(largura - MARGEM, altura - MARGEM - 26, f"Emitido em {date.today().strftime('%d/%m/%Y')}")
+        c.setFont("Helvetica", 8)
+        c.drawCentredString(largura / 2, MARGEM - 12, f"Página {self.pagina}")
+        self.frame = Frame(MARGEM, MARGEM, largura - 2 * MARGEM, altura - 2 * MARGEM - 40,
+                           leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0, showBoundary=0)
+
+    def _fechar_pagina(self):
+        self.canvas.showPage()
+        self.frame = None
+
+    def adicionar(self, tabela):
+        """Encaixa a tabela na página atual, dividindo-a entre páginas se necessário."""
+        pendentes = [tabela]
+        while pendentes:
+            flowable = pendentes.pop(0)
+            if self.frame.add(flowable, self.canvas):
+                continue
+            # Não coube inteira: coloca a parte que cabe e leva o resto para a próxima página
+            partes = self.frame.split(flowable, self.canvas)
+            if partes and self.frame.add(partes[0], self.canvas):
+                pendentes[:0] = partes[1:]
+            elif self.frame._atTop:
+                raise LayoutError("Linha do relatório maior que uma página inteira.")
+            else:
+                pendentes.insert(0, flowable)
+            self._fechar_pagina()
+            self._abrir_pagina()
+
+    def salvar(self):
+        if self.frame is not None:
+            self._fechar_pagina()
+        self.canvas.save()
+
+
+def _subtitulo_ano(ano_letivo):
+    if ano_letivo is None:
+        return ""
+    return " - Todos os anos" if ano_letivo == TODOS_OS_ANOS else f" - Ano letivo {ano_letivo}"
+
+
+def _gerar(db, destino, titulo, turma, cabecalho, larguras, formatar, subtitulo_extra="", ano_letivo=None):
+    """
+    Motor comum: uma seção por turma, linhas convertidas em blocos de tabela. Todas as leituras
+    rodam em um único snapshot (db.snapshot_relatorio): gravações feitas durante o relatório não
+    esperam por ele e não aparecem pela metade.
+    'ano_letivo': como nas consultas do banco (None = ano atual, TODOS_OS_ANOS ou um ano arquivado).
+    As linhas do banco passam em lotes, mas as páginas prontas ficam no canvas até o fim: a memória
+    cresce com o tamanho do relatório (ver o início do módulo), não é constante.
+    """
+    subtitulo_extra = _subtitulo_ano(ano_letivo) + subtitulo_extra
+    with db.snapshot_relatorio():
+        turmas = [turma] if turma else _ordenar_turmas(db.get_turmas(ano_letivo))
+        paginador = _PaginadorStreaming(destino, titulo)
+        total = 0
+
+        for turma_atual in turmas:
+            paginador.nova_secao(f"Turma: {turma_atual}{subtitulo_extra}")
+            bloco = []
+            numero = 0
+            for aluno in db.iter_alunos_relatorio(turma_atual, ano=ano_letivo):
+                numero += 1
+                bloco.append(formatar(numero, aluno))
+                if len(bloco) == LINHAS_POR_BLOCO:
+                    paginador.adicionar(Table([cabecalho] + bloco, colWidths=larguras, repeatRows=1, style=ESTILO_TABELA))
+                    bloco = []
+            if bloco or numero == 0:
+                bloco = bloco or [["", "Nenhum aluno nesta turma."] + [""] * (len(cabecalho) - 2)]
+                paginador.adicionar(Table([cabecalho] + bloco, colWidths=larguras, repeatRows=1, style=ESTILO_TABELA))
+            total += numero
+
+    paginador.salvar()
+    return total
+
+
+def gerar_lista_turma(db, destino, turma=None, ano_letivo=None):
+    """
+    Gera a lista de alunos (PDF) de uma turma ou, se 'turma' for None, da escola inteira
+    (uma seção por turma), do ano letivo atual ou do 'ano_letivo' informado.
+    Inclui telefones dos responsáveis, alergias e situação do pagamento.
+    Retorna o número de alunos listados.
+    """
+    cabecalho = ["Nº", "Nome do Aluno", "Nasc.", "Mãe / Tel.", "Pai / Tel.",
+                 "Resp. Legal / Emergência", "Alergias / Medicamentos", "Pagto", "Matrícula"]
+    larguras = [22, 145, 52, 112, 105, 112, 120, 45, 69]
+
+    def formatar(numero, aluno):
+        (_, nome, nasc, _, mae, tel_mae, pai, tel_pai, resp, tel_emerg,
+         alergia, prob_med, status_pagto, status_matricula) = aluno
+        saude = f"Alergia: {alergia or 'Não'} / Med.: {prob_med or 'Não'}"
+        return [
+            numero,
+            _quebrar(nome, 32),
+            nasc,
+            f"{_quebrar(mae, 24)}\n{tel_mae or '-'}",
+            f"{_quebrar(pai, 22) if pai else '-'}\n{tel_pai or '-'}",
+            f"{_quebrar(resp, 24)}\n{tel_emerg or '-'}",
+            _quebrar(saude, 28),
+            "Pago" if status_pagto == 1 else "PENDENTE",
+            "Efetivada" if status_matricula == "Matrícula Efetivada" else "Pendente",
+        ]
+
+    return _gerar(db, destino, "LISTA DE ALUNOS POR TURMA", turma, cabecalho, larguras, formatar,
+                  ano_letivo=ano_letivo)
+
+
+def dias_letivos(ano, mes):
+    """Dias úteis (seg-sex) do mês, usados como colunas da folha de chamada."""
+    _, ultimo = calendar.monthrange(ano, mes)
+    return [dia for dia in range(1, ultimo + 1) if date(ano, mes, dia).weekday() < 5]
+
+
+def gerar_folha_chamada(db, destino, turma=None, ano=None, mes=None, ano_letivo=None):
+    """
+    Gera a folha de chamada mensal (PDF): uma linha por aluno e uma coluna por dia útil do mês,
+    com telefone de emergência e alergias para consulta rápida do professor.
+    'ano'/'mes' são o mês do calendário da chamada; 'ano_letivo' escolhe os alunos (padrão: o atual).
+    Retorna o número de alunos listados.
+    """
+    hoje = date.today()
+    ano, mes = ano or hoje.year, mes or hoje.month
+    dias = dias_letivos(ano, mes)
+
+    cabecalho = ["Nº", "Nome do Aluno", "Tel. Emergência", "Alergias"] + [str(dia) for dia in dias]
+    largura_fixa = [22, 150, 72, 80]
+    largura_dia = (PAGINA[0] - 2 * MARGEM - sum(largura_fixa)) / max(len(dias), 1)
+    larguras = largura_fixa + [largura_dia] * len(dias)
+
+    # Tupla vazia = célula sem conteúdo; '' faria a Table desenhar uma string vazia por dia
+    celulas_vazias = [()] * len(dias)
+
+    def formatar(numero, aluno):
+        nome, alergia, tel_emerg, tel_mae = aluno[1], aluno[10], aluno[9], aluno[5]
+        return [numero, _quebrar(nome, 32), tel_emerg or tel_mae or "-",
+                _quebrar(alergia if alergia not in ("Não", "") else "-", 16)] + celulas_vazias
+
+    mes_ano = f" - {mes:02d}/{ano}"
+    return _gerar(db, destino, "FOLHA DE CHAMADA", turma, cabecalho, larguras, formatar, subtitulo_extra=mes_ano,
+                  ano_letivo=ano_letivo)
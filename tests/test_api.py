@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api_client import ErroAPI, RemoteDatabaseManager
+from api_server import ServicoMatriculas, ServidorAPI
+from database import DatabaseManager
+
+# Não-ASCII de propósito: o cabeçalho chega como bytes e o servidor compara com o token em UTF-8
+TOKEN = "segredo-çã€"
+
+
+def _dados(nome):
+    return (nome, "01/01/2021", "Pré I", "5", "Rua A, 1", "Maria Souza", "João Souza", "(81) 99999-0000",
+            "", "123.456.789-00", "Maria Souza", "", "", "", "Pix", "01/02/2025")
+
+
+@pytest.fixture
+def url(tmp_path):
+    """Sobe o api_server em uma porta livre, com o loop asyncio em uma thread própria."""
+    db = DatabaseManager(str(tmp_path / "matriculas.db"), ano_letivo=2025)
+    servidor = ServidorAPI(ServicoMatriculas(db), porta=0, max_workers=2, timeout_ocioso=0.3, token=TOKEN)
+    loop = asyncio.new_event_loop()
+    pronto = threading.Event()
+
+    def rodar():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(servidor.iniciar())
+        pronto.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=rodar, daemon=True)
+    thread.start()
+    assert pronto.wait(5)
+    porta = servidor._servidor.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{porta}"
+
+    async def parar():
+        # Fecha o servidor e encerra as conexões ainda abertas antes de parar o loop
+        servidor._servidor.close()
+        tarefas = [tarefa for tarefa in asyncio.all_tasks() if tarefa is not asyncio.current_task()]
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(parar(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+    servidor.executor.shutdown(wait=True)
+    db.close()
+
+
+@pytest.fixture
+def cliente(url):
+    cliente = RemoteDatabaseManager(url, timeout=5, token=TOKEN)
+    yield cliente
+    cliente.close()
+
+
+def test_token_ausente_ou_errado_recebe_401(url, cliente):
+    for token in (None, "segredo-errado", TOKEN.encode("utf-8").decode("latin-1")):
+        intruso = RemoteDatabaseManager(url, timeout=5, token=token)
+        with pytest.raises(ErroAPI) as erro:
+            intruso.get_alunos()
+        assert erro.value.status == 401
+        intruso.close()
+    assert cliente.get_alunos() == ()
+
+
+def test_keep_alive_e_reconexao_depois_do_timeout_ocioso(cliente):
+    aluno_id = cliente.insert_aluno(_dados("Ana Souza"))
+    conexao = cliente._local.conn
+    socket = conexao.sock
+    assert cliente.get_aluno_by_id(aluno_id)[1] == "Ana Souza"
+    assert cliente.versao_dados()
+    # Várias requisições, uma conexão TCP
+    assert cliente._local.conn is conexao and conexao.sock is socket
+
+    # O servidor fecha a conexão ociosa; o cliente reconecta uma vez, sem erro
+    time.sleep(0.6)
+    assert [linha[0] for linha in cliente.get_alunos()] == [aluno_id]
+
+
+def test_404_vira_none_e_demais_erros_sobem_com_status(cliente):
+    assert cliente.get_aluno_by_id(999) is None
+    assert cliente.get_familia_responsavel(999) is None
+    assert cliente.get_responsaveis(999) is None
+    assert cliente.get_foto("0" * 64) is None
+    with pytest.raises(ErroAPI) as erro:
+        cliente._requisitar("GET", "/rota/inexistente")
+    assert erro.value.status == 404
+    with pytest.raises(ErroAPI) as erro:
+        cliente._requisitar("POST", "/alunos/status", {"ids": "x"})
+    assert erro.value.status == 400
+
+
+def test_ids_no_corpo_e_lote(cliente):
+    ids = [cliente.insert_aluno(_dados(nome)) for nome in ("Ana Souza", "Bia Souza", "Caio Souza")]
+    assert [linha[1] for linha in cliente.get_alunos_by_ids(ids[:2] + [999])] == ["Ana Souza", "Bia Souza"]
+    assert cliente.update_status_many(ids, 1, 1, "Matrícula Efetivada", "Pix")
+
+    respostas = cliente.lote([
+        ("GET", f"/alunos/{ids[0]}", None),
+        ("GET", "/alunos/999", None),
+        ("POST", "/alunos/lote", {"ids": ids}),
+        ("POST", "/lote", {"requisicoes": []}),
+    ])
+    assert [status for status, _ in respostas] == [200, 404, 200, 400]
+    assert respostas[0][1][18] == "Matrícula Efetivada"
+    assert len(respostas[2][1]) == 3
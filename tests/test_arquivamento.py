@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import stat
+
+import pytest
+
+from database import TODOS_OS_ANOS, DatabaseManager
+
+
+def _dados(nome, data_matricula="01/02/2024"):
+    return (nome, "01/01/2021", "Pré I", "5", "Rua A, 1", "Maria Souza", "João Souza", "(81) 99999-0000",
+            "", "123.456.789-00", "Maria Souza", "", "", "", "Pix", data_matricula)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "matriculas.db"), ano_letivo=2025)
+    yield db
+    db.close()
+
+
+def _matricular(db, ano, nome):
+    atual, db.ano_letivo = db.ano_letivo, ano
+    try:
+        return db.insert_aluno(_dados(nome))
+    finally:
+        db.ano_letivo = atual
+
+
+def test_arquivar_move_o_ano_e_a_view_historico_le_os_dois_bancos(db):
+    ana = _matricular(db, 2024, "Ana")
+    bia = _matricular(db, 2024, "Bia")
+    caio = _matricular(db, 2025, "Caio")
+    antes = {aluno[0]: aluno for aluno in db.get_alunos(TODOS_OS_ANOS)}
+
+    assert db.arquivar_ano(2024) == 2
+
+    caminho = db.caminho_arquivo(2024)
+    assert db.anos_arquivados() == [2024]
+    assert not os.stat(caminho).st_mode & stat.S_IWUSR  # o arquivo fica só-leitura
+    # O banco atual fica só com o ano corrente; a família sem alunos é removida
+    assert [linha[0] for linha in db.conn.execute("SELECT id FROM alunos")] == [caio]
+    # As mesmas 21 colunas, lidas do arquivo (2024) e do banco atual (todos os anos)
+    assert [aluno[0] for aluno in db.get_alunos(2024)] == [bia, ana]
+    assert {aluno[0]: aluno for aluno in db.get_alunos(TODOS_OS_ANOS)} == antes
+    assert [aluno[0] for aluno in db.search_alunos("Bia", ano=TODOS_OS_ANOS)] == [bia]
+    assert [aluno[0] for aluno in db.get_alunos_by_ids([caio, ana])] == [caio, ana]
+    assert db.anos_letivos() == [2025, 2024]
+
+
+def test_rearquivar_leva_matriculas_atrasadas(db):
+    _matricular(db, 2024, "Ana")
+    db.arquivar_ano(2024)
+    atrasada = _matricular(db, 2024, "Bia")
+
+    assert db.arquivar_ano(2024) == 1
+    assert sorted(aluno[0] for aluno in db.get_alunos(2024)) == [1, atrasada]
+
+
+def test_so_arquiva_anos_encerrados(db):
+    with pytest.raises(ValueError):
+        db.arquivar_ano(2025)
+
+
+def test_arquivar_move_fotos_e_historico(db):
+    ana = _matricular(db, 2024, "Ana")
+    caio = _matricular(db, 2025, "Caio")
+    db.salvar_foto(ana, b"foto-ana")
+    db.salvar_foto(caio, b"foto-caio")
+    historico = db.get_historico(ana)
+
+    assert db.arquivar_ano(2024) == 1
+
+    # Nada do aluno arquivado fica no banco atual...
+    assert db.conn.execute("SELECT aluno_id FROM alunos_fotos").fetchall() == [(caio,)]
+    assert db.conn.execute("SELECT COUNT(*) FROM fotos").fetchone()[0] == 1
+    assert db.conn.execute("SELECT DISTINCT aluno_id FROM alunos_eventos").fetchall() == [(caio,)]
+    # ...mas continua acessível pelo arquivo do ano
+    assert db.get_historico(ana) == historico
+    assert db.get_foto(db.get_foto_hash(ana)) == b"foto-ana"
+    # O histórico de quem está no banco atual continua só aceitando inclusões
+    with pytest.raises(sqlite3.DatabaseError):
+        db.conn.execute("DELETE FROM alunos_eventos WHERE aluno_id = ?", (caio,))
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from backup import BackupError, BackupManager
+from database import DatabaseManager
+
+DADOS = ("Ana Souza", "01/01/2021", "Pré I", "5", "Rua A, 1", "Maria Souza", "João Souza", "(81) 99999-0000",
+         "", "123.456.789-00", "Maria Souza", "", "", "", "Pix", "01/02/2024")
+
+
+def test_snapshot_copia_arquivos_anuais_uma_vez(tmp_path):
+    db = DatabaseManager(str(tmp_path / "matriculas.db"), ano_letivo=2025)
+    try:
+        db.ano_letivo = 2024
+        db.insert_aluno(DADOS)
+        db.ano_letivo = 2025
+        db.insert_aluno(DADOS)
+        assert db.arquivar_ano(2024) == 1
+    finally:
+        db.close()
+
+    backup = BackupManager(db.db_name)
+    backup.criar_snapshot()
+    (copia, ano), = backup.listar_arquivos_anuais()
+    assert ano == 2024 and backup.verificar_snapshot(copia)
+    # O arquivo não mudou: o próximo snapshot não o copia de novo
+    assert backup.copiar_arquivos_anuais() == []
+    assert os.path.basename(copia) == "matriculas_2024.db.gz"
+
+
+def test_restaurar_recusa_banco_aberto_e_troca_o_arquivo_com_ele_fechado(tmp_path):
+    db = DatabaseManager(str(tmp_path / "matriculas.db"), ano_letivo=2024)
+    backup = BackupManager(db.db_name)
+    try:
+        db.insert_aluno(DADOS)
+        snapshot = backup.criar_snapshot()
+        db.insert_aluno(DADOS)
+        with pytest.raises(BackupError, match="em uso"):
+            backup.restaurar(snapshot)
+    finally:
+        db.close()
+
+    seguranca = backup.restaurar(snapshot)
+    assert seguranca != snapshot and backup.verificar_snapshot(seguranca)
+    assert not os.path.exists(db.db_name + ".restaurando")
+    db = DatabaseManager(db.db_name, ano_letivo=2024)
+    try:
+        assert len(db.get_alunos()) == 1
+    finally:
+        db.close()
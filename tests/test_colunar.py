@@ -0,0 +1,113 @@
+import random
+
+from colunar import AlunosColunar
+
+TURMAS = ["Berçário", "Infantil I", "Pré I", "Pré II"]
+STATUS = ["Matrícula Efetivada", "Pendente"]
+
+
+def _linha(aluno_id, nome, turma="Pré I", status="Pendente", pagto=0, metodo="Pix", data="01/02/2026"):
+    """Linha no layout de COLUNAS_ALUNOS (21 campos); só as colunas usadas pela lista importam."""
+    linha = [None] * 21
+    linha[0], linha[1], linha[3], linha[15], linha[16], linha[18], linha[19], linha[20] = (
+        aluno_id, nome, turma, metodo, pagto, status, data, 2026)
+    return tuple(linha)
+
+
+def _linhas_aleatorias(n, semente=7):
+    aleatorio = random.Random(semente)
+    nomes = ["Ana", "Bia", "Caio", "Davi", "Élida", "João", "Maria"]
+    return [_linha(aluno_id, f"{aleatorio.choice(nomes)} {aleatorio.choice(nomes)} {aluno_id}",
+                   aleatorio.choice(TURMAS), aleatorio.choice(STATUS), aleatorio.randint(0, 1))
+            for aluno_id in range(n, 0, -1)]
+
+
+def _esperado(linhas, turma=None, termo=None, status=None, ids=None):
+    """Filtro de referência (lista de tuplas, como a tela fazia antes)."""
+    return [linha[0] for linha in linhas
+            if (turma is None or linha[3] == turma) and (status is None or linha[18] == status)
+            and (termo is None or termo.lower() in linha[1].lower()) and (ids is None or linha[0] in ids)]
+
+
+def _selecionados(colunar, mascara):
+    return [colunar.ids[i] for i in colunar.indices(mascara, 0, len(colunar))]
+
+
+def test_filtros_batem_com_a_filtragem_de_referencia():
+    linhas = _linhas_aleatorias(500)
+    colunar = AlunosColunar()
+    colunar.carregar(linhas)
+
+    for filtros in ({}, {"turma": "Pré I"}, {"status": "Pendente"}, {"termo": "ÉLI"}, {"termo": "ana b"},
+                    {"turma": "Pré II", "status": "Matrícula Efetivada", "termo": "a"},
+                    {"ids": {3, 10, 250, 999}}, {"turma": "Inexistente"}):
+        mascara = colunar.filtrar(**filtros)
+        esperado = _esperado(linhas, **filtros)
+        assert _selecionados(colunar, mascara) == esperado, filtros
+        assert colunar.contar(mascara) == len(esperado)
+
+
+def test_indices_pagina_a_pagina():
+    colunar = AlunosColunar()
+    colunar.carregar(_linhas_aleatorias(200))
+    mascara = colunar.filtrar(turma="Pré I")
+    todos = _selecionados(colunar, mascara)
+
+    paginas = [colunar.indices(mascara, inicio, 15) for inicio in range(0, len(todos), 15)]
+
+    assert [colunar.ids[i] for pagina in paginas for i in pagina] == todos
+    assert colunar.indices(mascara, len(todos), 15) == []
+
+
+def test_busca_por_nome_com_caractere_que_muda_de_tamanho_em_minusculas():
+    # "İ".lower() tem 2 caracteres: os limites de cada nome não podem se deslocar
+    colunar = AlunosColunar()
+    colunar.carregar([_linha(3, "İİİİ Ana"), _linha(2, "Bia"), _linha(1, "Caio")])
+
+    assert _selecionados(colunar, colunar.filtrar(termo="bia")) == [2]
+    assert _selecionados(colunar, colunar.filtrar(termo="caio")) == [1]
+
+
+def test_aplicar_alteracoes_insercoes_e_remocoes():
+    linhas = _linhas_aleatorias(50)
+    colunar = AlunosColunar()
+    colunar.carregar(linhas)
+    colunar.filtrar(termo="a")  # monta a string de busca, que precisa ser refeita
+
+    alterado = _linha(10, "Renomeado", "Berçário", "Matrícula Efetivada", 1)
+    novos = [_linha(60, "Nova Aluna", "Pré I"), _linha(55, "Outro Novo", "Pré II")]
+    refiltrar = colunar.aplicar([alterado] + novos, removidos=[1, 20, 999])
+
+    atualizadas = [linha for linha in linhas if linha[0] not in (1, 20, 10)] + [alterado] + novos
+    atualizadas.sort(key=lambda linha: linha[0], reverse=True)
+    assert refiltrar
+    assert list(colunar.ids) == [linha[0] for linha in atualizadas]
+    assert colunar.exibicao(colunar.posicao(10)) == (
+        10, "Renomeado", "Berçário", "01/02/2026", "Matrícula Efetivada", "Pago")
+    for filtros in ({"termo": "renomeado"}, {"termo": "novo"}, {"turma": "Berçário"}):
+        assert _selecionados(colunar, colunar.filtrar(**filtros)) == _esperado(atualizadas, **filtros)
+
+
+def test_aplicar_so_status_nao_pede_refiltro():
+    colunar = AlunosColunar()
+    colunar.carregar([_linha(2, "Ana"), _linha(1, "Bia")])
+
+    assert not colunar.aplicar([_linha(1, "Bia", status="Matrícula Efetivada", pagto=1)], removidos=[])
+    assert colunar.status_de(1) == "Matrícula Efetivada"
+
+
+def test_mais_de_256_valores_distintos_numa_coluna_categorica():
+    # O método de pagamento é texto livre: a coluna troca de um byte para dois por linha
+    linhas = [_linha(i, f"Aluno {i}", metodo=f"Pix conta {i}", turma=TURMAS[i % 4]) for i in range(400, 0, -1)]
+    colunar = AlunosColunar()
+    colunar.carregar(linhas[:100])
+    colunar.aplicar(linhas[100:], removidos=[])
+    colunar.aplicar([_linha(300, "Aluno 300", metodo="Outro método", status="Matrícula Efetivada")], removidos=[])
+
+    assert len(colunar) == 400
+    assert not isinstance(colunar.metodo, bytearray) and isinstance(colunar.turma, bytearray)
+    mascara = colunar.filtrar(turma="Pré I", status="Pendente")
+    assert _selecionados(colunar, mascara) == [i for i in range(400, 0, -1) if i % 4 == 2 and i != 300]
+    assert colunar._mascara_categoria(colunar.metodo, colunar.metodos, "Pix conta 257").count(1) == 1
+    assert colunar._mascara_categoria(colunar.metodo, colunar.metodos, "Pix conta 1") == bytes(
+        1 if i == 1 else 0 for i in colunar.ids)
@@ -0,0 +1,156 @@
+import pytest
+
+from conciliacao import (CRITERIO_CPF, CRITERIO_NOME, CRITERIO_NOME_ABREVIADO, Lancamento, conciliar,
+                         formatar_valor, ler_csv, ler_extrato, valor_em_centavos)
+
+
+def _escrever(tmp_path, texto, nome="extrato.csv", codificacao="utf-8"):
+    caminho = tmp_path / nome
+    caminho.write_text(texto, encoding=codificacao)
+    return str(caminho)
+
+
+@pytest.mark.parametrize("texto, centavos", [
+    ("1.234,56", 123456),
+    ("1234.56", 123456),
+    ("1,234.56", 123456),
+    ("350", 35000),
+    ("1.234", 123400),       # só pontos e três dígitos depois: separador de milhar
+    ("12.5", 1250),
+    ("R$ -50,00", -5000),
+    ("(50,00)", -5000),
+    ("50,00-", -5000),
+    ("R$\xa01.040,00", 104000),
+])
+def test_valor_em_centavos(texto, centavos):
+    assert valor_em_centavos(texto) == centavos
+
+
+@pytest.mark.parametrize("texto", ["", "abc", "1,2345", "R$"])
+def test_valor_em_centavos_rejeita_texto_que_nao_e_valor(texto):
+    with pytest.raises(ValueError):
+        valor_em_centavos(texto)
+
+
+def test_formatar_valor():
+    assert formatar_valor(123456) == "R$ 1.234,56"
+    assert formatar_valor(-5) == "-R$ 0,05"
+
+
+def test_ler_csv_cp1252_com_titulo_e_coluna_de_pagador(tmp_path):
+    caminho = _escrever(tmp_path, (
+        "Banco Exemplo - Extrato\n"
+        "Agência 0001\n"
+        "Data Lançamento,Histórico,Nome do Pagador,CPF/CNPJ,Valor (R$)\n"
+        "05/02/2026,PIX RECEBIDO,José Antônio,123.456.789-00,\"350,00\"\n"
+        "05/02/2026,TARIFA PACOTE,,,\"-12,50\"\n"
+    ), codificacao="cp1252")
+
+    lancamentos = list(ler_csv(caminho))
+
+    assert lancamentos == [
+        Lancamento(4, "05/02/2026", 35000, "José Antônio", "12345678900", "PIX RECEBIDO"),
+        Lancamento(5, "05/02/2026", -1250, "TARIFA PACOTE", "", "TARIFA PACOTE"),  # nome tirado da descrição
+    ]
+
+
+def test_ler_csv_sem_cabecalho(tmp_path):
+    caminho = _escrever(tmp_path, "05/02/2026;PIX;350,00\n" * 40)
+    with pytest.raises(ValueError):
+        list(ler_csv(caminho))
+
+
+def test_ler_ofx_sgml(tmp_path):
+    caminho = _escrever(tmp_path, (
+        "OFXHEADER:100\nDATA:OFXSGML\nCHARSET:1252\n\n"
+        "<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n"
+        "<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20260205120000[-3:BRT]\n<TRNAMT>700.00\n"
+        "<MEMO>PIX RECEBIDO - MARIA DE SOUZA 123.456.789-00\n</STMTTRN>\n"
+        "<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20260206\n<TRNAMT>-12.50\n<MEMO>TARIFA\n</STMTTRN>\n"
+        "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+    ), nome="extrato.txt", codificacao="cp1252")
+
+    # Reconhecido pelo conteúdo, mesmo sem a extensão .ofx
+    lancamentos = list(ler_extrato(caminho))
+
+    assert [(l.data, l.valor, l.nome, l.documento) for l in lancamentos] == [
+        ("05/02/2026", 70000, "MARIA DE SOUZA", "12345678900"),
+        ("06/02/2026", -1250, "TARIFA", ""),
+    ]
+
+
+def test_ler_csv_ignora_linhas_de_saldo_e_totais(tmp_path):
+    caminho = _escrever(tmp_path, (
+        "Extrato Conta Corrente;;;\n"
+        "Data;Histórico;Documento;Valor\n"
+        ";Saldo anterior;;1.000,00\n"
+        "05/02/2026;PIX RECEBIDO MARIA SILVA;;350,00\n"
+        "05/02/2026;SALDO DO DIA;;1.350,00\n"
+        "Saldo;;;1040,00\n"
+        "Total de créditos;;;350,00\n"
+        "2026-02-06 10:00;TED JOSE TOTALINO;;100,00\n"
+    ))
+
+    lancamentos = list(ler_csv(caminho))
+
+    assert [(l.linha, l.valor, l.nome) for l in lancamentos] == [
+        (4, 35000, "MARIA SILVA"),
+        (8, 10000, "JOSE TOTALINO"),
+    ]
+
+
+def _lancamento(valor, nome="", documento=""):
+    return Lancamento(1, "05/02/2026", valor, nome, documento, "")
+
+
+# (id, nome, cpf_digitos, mãe, pai, responsável): linhas de iter_pendentes_pagamento, mais antigos primeiro
+PENDENTES = [
+    (1, "Ana Souza", "12345678900", "maria jose de souza", "joao souza", "maria jose de souza"),
+    (2, "Bia Souza", "12345678900", "maria jose de souza", "", "maria jose de souza"),
+    (3, "Caio Lima", "98765432100", "joana lima", "", "joana lima"),
+    (4, "Davi Rocha", "", "paula rocha", "", ""),
+]
+
+
+def test_conciliar_por_cpf_nome_e_nome_abreviado():
+    resultado = conciliar([
+        _lancamento(35000, documento="98765432100"),
+        _lancamento(70000, nome="MARIA JOSÉ DE SOUZA"),
+        _lancamento(35000, nome="Paula M. Rocha"),
+        _lancamento(-1250, nome="TARIFA"),
+        _lancamento(35000, nome="Fulano de Tal"),
+    ], PENDENTES, valor_matricula=35000)
+
+    assert [(p.aluno_ids, p.criterio, p.valor_confere, p.aceitar) for p in resultado.propostas] == [
+        ([3], CRITERIO_CPF, True, True),
+        ([1, 2], CRITERIO_NOME, True, True),
+        ([4], CRITERIO_NOME_ABREVIADO, True, False),  # nome abreviado: sempre para conferir
+    ]
+    assert [l.nome for l in resultado.sem_par] == ["Fulano de Tal"]
+    assert (resultado.lidos, resultado.debitos) == (5, 1)
+
+
+def test_conciliar_pagamento_parcial_da_familia_e_valor_errado():
+    resultado = conciliar([
+        _lancamento(35000, documento="12345678900"),   # paga só o mais antigo dos irmãos
+        _lancamento(35000, documento="12345678900"),   # o próximo lançamento paga o outro
+        _lancamento(20000, nome="Joana Lima"),         # valor que não é múltiplo da matrícula
+    ], PENDENTES, valor_matricula=35000)
+
+    parcial, restante, errado = resultado.propostas
+    assert (parcial.aluno_ids, parcial.aceitar) == ([1], False)
+    assert parcial.observacao == "Paga 1 de 2 alunos da família"
+    assert (restante.aluno_ids, restante.aceitar) == ([2], True)
+    assert (errado.aluno_ids, errado.valor_confere, errado.aceitar) == ([3], False, False)
+
+
+def test_conciliar_sem_valor_da_matricula_nao_aceita_nada():
+    resultado = conciliar([
+        _lancamento(12345, documento="98765432100"),
+        _lancamento(70000, nome="Maria José de Souza"),
+    ], PENDENTES)
+
+    assert [(p.criterio, p.valor_confere, p.aceitar) for p in resultado.propostas] == [
+        (CRITERIO_CPF, None, False),  # o CPF é o do aluno: sem o valor, sempre para conferir
+        (CRITERIO_NOME, None, False),
+    ]
@@ -0,0 +1,197 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database import (EVENTO_ASSINATURA_CONFIRMADA, EVENTO_METODO, EVENTO_PAGAMENTO_CONFIRMADO,
+                      EVENTO_PAGAMENTO_PENDENTE, EVENTO_STATUS, ConnectionPool, DatabaseManager, PoolEsgotadoError)
+
+
+def _dados(nome, mae="Maria Souza", tel_mae="(81) 99999-0000", endereco="Rua A, 1", cpf="123.456.789-00",
+           tel_pai=""):
+    return (nome, "01/01/2021", "Pré I", "5", endereco, mae, "João Souza", tel_mae,
+            tel_pai, cpf, mae, "", "", "", "Pix", "01/02/2025")
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "matriculas.db"), ano_letivo=2025)
+    yield db
+    db.close()
+
+
+def test_pool_devolve_a_mesma_conexao_por_thread_e_esgota_com_timeout(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_conexoes=1, timeout=0.1)
+    conn = pool.get()
+    assert pool.get() is conn
+
+    erros = []
+
+    def outra_thread():
+        try:
+            pool.get()
+        except PoolEsgotadoError as erro:
+            erros.append(erro)
+
+    # A thread principal ainda está viva: sua conexão não é recolhida e a outra thread espera o timeout
+    thread = threading.Thread(target=outra_thread)
+    thread.start()
+    thread.join()
+    assert len(erros) == 1
+
+    pool.release()
+    thread = threading.Thread(target=outra_thread)
+    thread.start()
+    thread.join()
+    assert len(erros) == 1
+    pool.close_all()
+
+
+def test_cache_devolve_o_mesmo_resultado_ate_alguem_gravar(db):
+    db.insert_aluno(_dados("Ana"))
+    alunos = db.get_alunos()
+    assert db.get_alunos() is alunos
+
+    db.update_status_matricula(alunos[0][0], 1, 1, "Matrícula Efetivada", "Pix")
+    depois = db.get_alunos()
+    assert depois is not alunos
+    assert depois[0][18] == "Matrícula Efetivada"
+
+    # Commit de outra conexão (outra estação): muda o PRAGMA data_version da sentinela
+    externa = sqlite3.connect(db.db_name)
+    externa.execute("UPDATE alunos SET status_matricula = 'Pendente'")
+    externa.commit()
+    externa.close()
+    assert db.get_alunos()[0][18] == "Pendente"
+
+
+def test_historico_aceita_apenas_inclusoes_de_alunos_ativos(db):
+    aluno_id = db.insert_aluno(_dados("Ana"))
+    db.update_status_matricula(aluno_id, 1, 0, "Pendente", "Dinheiro")
+    historico = db.get_historico(aluno_id)
+    assert len(historico) >= 2
+
+    with pytest.raises(sqlite3.IntegrityError, match="apenas inclusões"):
+        db.conn.execute("UPDATE alunos_eventos SET valor = 'Pix'")
+    with pytest.raises(sqlite3.IntegrityError, match="apenas inclusões"):
+        db.conn.execute("DELETE FROM alunos_eventos WHERE aluno_id = ?", (aluno_id,))
+    assert db.get_historico(aluno_id) == historico
+
+
+def _eventos(db, aluno_id):
+    return [(codigo, valor, estacao) for _, codigo, valor, estacao in db.get_historico(aluno_id)[1:]]
+
+
+def test_historico_registra_so_o_que_mudou_em_cada_aluno(db):
+    ana, bia, caio = (db.insert_aluno(_dados(nome)) for nome in ("Ana", "Bia", "Caio"))
+    db.update_status_many([ana], 0, 0, "Pendente", estacao="Secretaria")
+    db.update_status_many([bia], 0, 1, "Pendente", estacao="Secretaria")
+
+    # Caio já está com esses valores: nenhum evento; Ana e Bia só nos campos que mudaram
+    assert db.update_status_many([ana, bia, caio], 1, 1, "Matrícula Efetivada", estacao="Caixa")
+    assert _eventos(db, ana)[-3:] == [(EVENTO_PAGAMENTO_CONFIRMADO, None, "Caixa"),
+                                      (EVENTO_ASSINATURA_CONFIRMADA, None, "Caixa"),
+                                      (EVENTO_STATUS, "Matrícula Efetivada", "Caixa")]
+    assert _eventos(db, bia)[-2:] == [(EVENTO_PAGAMENTO_CONFIRMADO, None, "Caixa"),
+                                      (EVENTO_STATUS, "Matrícula Efetivada", "Caixa")]
+    assert _eventos(db, caio) == []
+
+
+def test_confirmar_pagamentos_registra_apenas_os_pendentes(db):
+    ana, bia = db.insert_aluno(_dados("Ana")), db.insert_aluno(_dados("Bia"))
+    db.update_status_many([bia], 0, 1, "Pendente")
+    assert _eventos(db, bia)[0][0] == EVENTO_PAGAMENTO_PENDENTE
+
+    assert db.confirmar_pagamentos([ana, bia], "Dinheiro", estacao="Caixa")
+    assert _eventos(db, ana) == []
+    assert _eventos(db, bia)[2:] == [(EVENTO_PAGAMENTO_CONFIRMADO, None, "Caixa"),
+                                     (EVENTO_METODO, "Dinheiro", "Caixa"),
+                                     (EVENTO_STATUS, "Matrícula Efetivada", "Caixa")]
+
+
+def test_conexao_de_relatorio_le_mas_nao_grava(db):
+    db.insert_aluno(_dados("Bia"))
+    db.insert_aluno(_dados("Ana"))
+
+    assert [aluno[1] for aluno in db.iter_alunos_relatorio(turma="Pré I")] == ["Ana", "Bia"]
+    with db.read_connection(relatorio=True) as conn:
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("UPDATE alunos SET nome = 'X'")
+
+
+def test_corrigir_responsavel_vale_para_os_irmaos_e_unifica_duplicados(db):
+    ana = db.insert_aluno(_dados("Ana"))
+    bia = db.insert_aluno(_dados("Bia"))
+    # Mesma mãe digitada com outra grafia: virou outro responsável
+    caio = db.insert_aluno(_dados("Caio", mae="Maria Sousa"))
+    mae_id = db.get_responsaveis(ana)["mae"][0]
+    assert db.get_responsaveis(bia)["mae"][0] == mae_id
+    duplicada = db.get_responsaveis(caio)["mae"][0]
+    assert duplicada != mae_id
+
+    assert db.update_responsavel(duplicada, "Maria Souza", "(81) 99999-0000") == mae_id
+    assert db.get_responsaveis(caio)["mae"][0] == mae_id
+    assert db.conn.execute("SELECT COUNT(*) FROM responsaveis WHERE id = ?", (duplicada,)).fetchone()[0] == 0
+
+    assert db.update_responsavel(mae_id, "Maria Souza", "(81) 98888-1111") == mae_id
+    for aluno_id in (ana, bia, caio):
+        assert db.get_aluno_by_id(aluno_id)[8] == "(81) 98888-1111"
+    assert db.get_responsaveis(9999) is None
+
+
+def test_corrigir_endereco_muda_os_irmaos_e_apagar_limpa_a_familia(db):
+    ana = db.insert_aluno(_dados("Ana"))
+    bia = db.insert_aluno(_dados("Bia"))
+    outra = db.insert_aluno(_dados("Davi", mae="Joana Lima", tel_mae="(81) 97777-0000", endereco="Rua B, 2"))
+
+    assert db.update_endereco(ana, "Rua C, 3")
+    assert [db.get_aluno_by_id(i)[5] for i in (ana, bia, outra)] == ["Rua C, 3", "Rua C, 3", "Rua B, 2"]
+
+    assert db.update_endereco(bia, "")
+    assert [db.get_aluno_by_id(i)[5] for i in (ana, bia, outra)] == ["", "", "Rua B, 2"]
+    assert [linha[0] for linha in db.conn.execute("SELECT endereco FROM enderecos")] == ["Rua B, 2"]
+    assert not db.update_endereco(9999, "Rua D, 4")
+
+
+def test_busca_por_contato_acha_irmaos_pelo_telefone_ou_cpf(db):
+    ana = db.insert_aluno(_dados("Ana", cpf="111.111.111-11"))
+    bia = db.insert_aluno(_dados("Bia", cpf="222.222.222-22"))
+    # Outra mãe, mas o pai usa o mesmo telefone da família de Ana e Bia
+    davi = db.insert_aluno(_dados("Davi", mae="Joana Lima", tel_mae="(81) 97777-0000", cpf="333.333.333-33",
+                                  tel_pai="81 99999 0000"))
+    db.insert_aluno(_dados("Caio", mae="Paula Rocha", tel_mae="(81) 96666-0000", cpf="444.444.444-44"))
+
+    for digitos in ("(81) 99999-0000", "81999990000"):
+        assert [aluno[0] for aluno in db.find_by_contact(digitos)] == [davi, bia, ana]
+    for digitos in ("222.222.222-22", "22222222222"):
+        assert [aluno[0] for aluno in db.find_by_contact(digitos)] == [bia]
+    assert [aluno[0] for aluno in db.find_by_contact("(81) 97777-0000")] == [davi]
+    # Só o número completo: um prefixo não é um contato
+    assert db.find_by_contact("(81) 9") == ()
+    assert db.find_by_contact("") == ()
+
+
+def test_autocompletar_responsaveis_e_enderecos_por_prefixo(db):
+    db.insert_aluno(_dados("Ana", mae="Maria José Souza", endereco="Rua das Flores, 10"))
+    db.insert_aluno(_dados("Bia", mae="Maria José Souza", endereco="Rua das Flores, 10"))
+    db.insert_aluno(_dados("Caio", mae="Mariana Lima", tel_mae="(81) 97777-0000", endereco="Rua Álvares, 5"))
+    db.insert_aluno(_dados("Davi", mae="Joana Maria", tel_mae="(81) 96666-0000", endereco="Avenida Rua, 1"))
+
+    def sugestoes(prefixo, **kwargs):
+        return [(nome, telefone) for _, nome, telefone in db.sugerir_responsaveis(prefixo, **kwargs)]
+
+    # Sem diferenciar acentos/maiúsculas, só no começo do nome; cada (nome, telefone) uma vez só,
+    # mesmo cadastrado em vários alunos (o responsável legal sem telefone é outra sugestão)
+    assert sugestoes("MARIA") == [("Maria José Souza", ""), ("Maria José Souza", "(81) 99999-0000"),
+                                  ("Mariana Lima", ""), ("Mariana Lima", "(81) 97777-0000")]
+    assert sugestoes("maria jose") == [("Maria José Souza", ""), ("Maria José Souza", "(81) 99999-0000")]
+    assert sugestoes("j") == [("Joana Maria", ""), ("Joana Maria", "(81) 96666-0000"), ("João Souza", "")]
+    assert sugestoes("ria") == [] and sugestoes("") == []
+    assert db.sugerir_enderecos("rua a") == ["Rua Álvares, 5"]
+    assert db.sugerir_enderecos("RUA") == ["Rua Álvares, 5", "Rua das Flores, 10"]
+    assert db.sugerir_enderecos("  ") == []
+
+    # O limite corta na ordem da chave (sem acentos)
+    assert sugestoes("mar", limite=3) == [("Maria José Souza", ""), ("Maria José Souza", "(81) 99999-0000"),
+                                          ("Mariana Lima", "")]
+    assert db.sugerir_enderecos("rua", limite=1) == ["Rua Álvares, 5"]
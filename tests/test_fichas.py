@@ -0,0 +1,54 @@
+import zipfile
+
+import fichas
+from fichas import cache_fichas, gerar_ficha_pdf, gravar_zip_fichas
+
+
+def _aluno(aluno_id=1, nome="Ana Souza", **campos):
+    aluno = {
+        "ID": aluno_id, "Nome": nome, "DataNasc": "01/01/2021", "Idade": "4", "Endereco": "Rua A, 1",
+        "Turma": "Pré I", "RespLegal": "Maria Souza", "TelEmerg": "(81) 99999-0000",
+        "NomeMae": "Maria Souza", "TelMae": "(81) 99999-0000", "NomePai": "João Souza", "TelPai": "",
+        "Alergia": "Não", "ProbMed": "Não", "CPFAluno": "", "PagtoStatus": 1, "PagtoMetodo": "Pix",
+        "MatriculaStatus": "Pendente",
+    }
+    aluno.update(campos)
+    return aluno
+
+
+def test_ficha_igual_vem_do_cache_e_ficha_alterada_gera_outra():
+    cache_fichas.invalidate()
+    pdf = gerar_ficha_pdf(_aluno())
+    assert pdf.startswith(b"%PDF")
+    assert gerar_ficha_pdf(_aluno()) is pdf
+    assert cache_fichas.acertos >= 1
+
+    alterada = gerar_ficha_pdf(_aluno(Endereco="Rua B, 2"))
+    assert alterada is not pdf
+    assert fichas.chave_ficha(_aluno()) != fichas.chave_ficha(_aluno(Endereco="Rua B, 2"))
+
+
+def test_cache_de_fichas_limitado_pelo_tamanho_dos_pdfs():
+    cache_fichas.invalidate()
+    pdf = gerar_ficha_pdf(_aluno())
+    assert cache_fichas._bytes == len(pdf)
+
+    limite = cache_fichas.max_bytes
+    cache_fichas.max_bytes = len(pdf) * 2
+    try:
+        for i in range(2, 6):
+            gerar_ficha_pdf(_aluno(i, f"Aluno {i}"))
+        assert cache_fichas._bytes <= cache_fichas.max_bytes
+        assert len(cache_fichas._entradas) <= 2
+    finally:
+        cache_fichas.max_bytes = limite
+        cache_fichas.invalidate()
+
+
+def test_zip_de_fichas(tmp_path):
+    destino = tmp_path / "fichas.zip"
+    gravar_zip_fichas(str(destino), [_aluno(1, "Ana Souza"), _aluno(2, "Bruno Lima")])
+    with zipfile.ZipFile(destino) as pacote:
+        nomes = pacote.namelist()
+        assert len(nomes) == 2
+        assert all(pacote.read(n).startswith(b"%PDF") for n in nomes)
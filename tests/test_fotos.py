@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from database import DatabaseManager
+from fotos import LADO_LISTA, CacheMiniaturas, gerar_derivado, preparar_foto
+
+
+def _dados(nome):
+    return (nome, "01/01/2021", "Pré I", "5", "Rua A, 1", "Maria Souza", "João Souza", "(81) 99999-0000",
+            "", "123.456.789-00", "Maria Souza", "", "", "", "Pix", "01/02/2025")
+
+
+def _foto(tmp_path, cor, nome="foto.jpg"):
+    caminho = tmp_path / nome
+    Image.new("RGB", (1600, 1200), cor).save(caminho, "JPEG")
+    return preparar_foto(str(caminho))
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "matriculas.db"), ano_letivo=2025)
+    yield db
+    db.close()
+
+
+def _fotos_guardadas(db):
+    return db.conn.execute("SELECT COUNT(*) FROM fotos").fetchone()[0]
+
+
+def test_foto_igual_e_guardada_uma_vez_e_apagada_quando_ninguem_usa(db, tmp_path):
+    dados, largura, altura = _foto(tmp_path, "red")
+    assert max(largura, altura) == 1200
+    ana, bia = db.insert_aluno(_dados("Ana")), db.insert_aluno(_dados("Bia"))
+
+    hash_foto = db.salvar_foto(ana, dados, largura, altura)
+    assert db.salvar_foto(bia, dados, largura, altura) == hash_foto
+    assert _fotos_guardadas(db) == 1
+    assert db.get_fotos_hashes([ana, bia, 999]) == {ana: hash_foto, bia: hash_foto}
+    assert db.get_foto(hash_foto) == dados
+
+    # Ana troca de foto: a antiga continua guardada enquanto Bia a usa
+    nova = db.salvar_foto(ana, _foto(tmp_path, "blue", "nova.jpg")[0])
+    assert nova != hash_foto and _fotos_guardadas(db) == 2
+    assert db.remover_foto(bia)
+    assert db.get_foto(hash_foto) is None and _fotos_guardadas(db) == 1
+    assert db.get_foto_hash(ana) == nova and db.get_foto_hash(bia) is None
+
+
+def test_miniaturas_lru_em_memoria_e_em_disco(tmp_path):
+    original = _foto(tmp_path, "green")[0]
+    tamanho = len(gerar_derivado(original, LADO_LISTA))
+    carregadas = []
+
+    def carregar(hash_foto):
+        carregadas.append(hash_foto)
+        return original
+
+    cache = CacheMiniaturas(str(tmp_path / "miniaturas"), max_entradas=1, max_bytes_disco=3 * tamanho)
+    for momento, hash_foto in ((1000, "a"), (2000, "b"), (3000, "c")):
+        cache.gerar(hash_foto, LADO_LISTA, carregar)
+        os.utime(cache._arquivo(hash_foto, LADO_LISTA), (momento, momento))
+    assert list(cache._memoria) == [("c", LADO_LISTA)]
+
+    # Fora da memória, mas no disco: nada é gerado de novo e o acesso renova o arquivo
+    assert cache.obter("a", LADO_LISTA) is not None
+    assert carregadas == ["a", "b", "c"]
+
+    # Passou do limite do disco: apaga os menos usados (b e c) até 80% do limite
+    cache.gerar("d", LADO_LISTA, carregar)
+    assert sorted(os.listdir(cache.pasta)) == [f"a_{LADO_LISTA}.jpg", f"d_{LADO_LISTA}.jpg"]
+    assert cache.obter("b", LADO_LISTA) is None
+
+
+def test_worker_entrega_as_miniaturas_e_libera_as_conexoes_do_banco(db, tmp_path):
+    aluno_id = db.insert_aluno(_dados("Ana"))
+    hash_foto = db.salvar_foto(aluno_id, _foto(tmp_path, "red")[0])
+    cache = CacheMiniaturas(str(tmp_path / "miniaturas"))
+    threads = []
+
+    def liberar():
+        threads.append(threading.current_thread().name)
+        db.liberar_conexoes_da_thread()
+
+    cache.pedir(hash_foto, LADO_LISTA, db.get_foto, liberar)
+    cache.pedir("f" * 64, LADO_LISTA, db.get_foto, liberar)  # foto que não existe: entregue como None
+    prontas, limite = {}, time.monotonic() + 10
+    while len(prontas) < 2 and time.monotonic() < limite:
+        prontas.update((hash_pedido, dados) for hash_pedido, _, dados in cache.concluidas())
+        time.sleep(0.01)
+    for thread in threading.enumerate():
+        if thread.name == "cemac-miniaturas":
+            thread.join(10)
+
+    assert prontas["f" * 64] is None
+    assert prontas[hash_foto] == cache.obter(hash_foto, LADO_LISTA)
+    # 'liberar' roda na thread do worker ao fim de cada rodada; a conexão só-leitura que ele abriu foi fechada
+    assert threads and set(threads) == {"cemac-miniaturas"} and not cache.ocupado()
+    assert not db.pool_leitura._abertas
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+from database import COLUNAS_ALUNOS, DatabaseManager
+
+# Tabela 'alunos' do formato original (20 colunas, sem ano_letivo), uma linha com os dados da família
+SQL_ALUNOS_20_COLUNAS = """
+    CREATE TABLE alunos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL, data_nascimento TEXT NOT NULL, turma TEXT NOT NULL, idade INTEGER,
+        endereco TEXT, nome_mae TEXT, nome_pai TEXT, tel_mae TEXT, tel_pai TEXT, cpf_responsavel TEXT,
+        responsavel_legal TEXT, tel_responsavel_emergencia TEXT, alergia TEXT, problema_medicamento TEXT,
+        metodo_pagamento TEXT, status_pagamento INTEGER, status_assinatura INTEGER, status_matricula TEXT,
+        data_matricula TEXT
+    )
+"""
+
+# Dois irmãos (mesma mãe, mesmo endereço) e um aluno sem data de matrícula
+LINHAS = [
+    (1, "Ana Souza", "01/01/2021", "Pré I", 5, "Rua A, 1", "Maria Souza", "João Souza", "(81) 99999-0000",
+     "(81) 98888-0000", "123.456.789-00", "Maria Souza", "(81) 99999-0000", "Não", "Não", "Pix", 1, 1,
+     "Matrícula Efetivada", "05/02/2025"),
+    (2, "Bia Souza", "01/01/2022", "Infantil III", 4, "Rua A, 1", "Maria Souza", "", "(81) 99999-0000",
+     "", "123.456.789-00", "Maria Souza", "(81) 99999-0000", "Camarão", "Não", "Dinheiro", 0, 1,
+     "Pendente", "10/01/2026"),
+    (5, "Caio Lima", "02/03/2020", "Pré II", 6, "Rua B, 2", "Joana Lima", "", "(81) 97777-0000",
+     "", "987.654.321-00", "Joana Lima", "", "", "", None, 0, 0, "Pendente", ""),
+]
+
+
+@pytest.fixture
+def banco_antigo(tmp_path):
+    caminho = str(tmp_path / "matriculas.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute(SQL_ALUNOS_20_COLUNAS)
+    conn.executemany(f"INSERT INTO alunos VALUES ({', '.join('?' * 20)})", LINHAS)
+    conn.commit()
+    conn.close()
+    return caminho
+
+
+def test_migra_formato_antigo_para_o_normalizado(banco_antigo):
+    db = DatabaseManager(banco_antigo, ano_letivo=2026)
+    try:
+        colunas = {linha[1] for linha in db.conn.execute("PRAGMA table_info(alunos)")}
+        assert "nome_mae" not in colunas and {"mae_id", "endereco_id", "ano_letivo"} <= colunas
+
+        # As 21 colunas voltam pela view, iguais às antigas mais o ano letivo tirado da data de matrícula
+        migrados = db.conn.execute(f"SELECT {COLUNAS_ALUNOS} FROM alunos_completos ORDER BY id").fetchall()
+        anos = [2025, 2026, 2026]  # sem data de matrícula: o ano letivo atual
+        assert migrados == [linha + (ano,) for linha, ano in zip(LINHAS, anos)]
+
+        # Irmãos apontam para a mesma mãe e o mesmo endereço
+        assert db.conn.execute("SELECT COUNT(DISTINCT mae_id), COUNT(DISTINCT endereco_id) FROM alunos "
+                               "WHERE id IN (1, 2)").fetchone() == (1, 1)
+        assert db.conn.execute("SELECT COUNT(*) FROM enderecos").fetchone()[0] == 2
+
+        # Ids e o contador AUTOINCREMENT são preservados
+        novo = db.insert_aluno(("Davi", "01/01/2021", "Pré I", "5", "Rua C", "Ana", "", "", "", "", "Ana",
+                                "", "", "", "Pix", "01/02/2026"))
+        assert novo == 6
+    finally:
+        db.close()
+
+
+def test_migracao_e_idempotente(banco_antigo):
+    DatabaseManager(banco_antigo, ano_letivo=2026).close()
+    db = DatabaseManager(banco_antigo, ano_letivo=2026)
+    try:
+        assert db.conn.execute("SELECT COUNT(*) FROM alunos").fetchone()[0] == len(LINHAS)
+        assert len(db.get_alunos(2026)) == 2 and len(db.get_alunos(2025)) == 1
+    finally:
+        db.close()
@@ -1,4 +1,6 @@
+import os
 import re
+import unicodedata
 from datetime import date
 from tkinter import Entry # Necessário para tipagem, mas não para a lógica do FocusOut
 
@@ -6,9 +8,22 @@ from tkinter import Entry # Necessário para tipagem, mas não para a lógica do
 # FUNÇÕES DE LÓGICA DE NEGÓCIO DA TURMA (Corrigida)
 # ====================================================================
 
-def calcular_turma_cemac(data_nascimento_str: str) -> str:
+# Turmas na ordem pedagógica (usada em filtros e relatórios)
+TURMAS_CEMAC = ["Berçário", "Infantil I", "Infantil II", "Infantil III", "Pré I", "Pré II", "2º Ano ou Acima"]
+
+# Ano letivo fixo (ex.: 2026), só para sobrepor o padrão; None usa CEMAC_ANO_LETIVO ou o ano corrente
+ANO_LETIVO = None
+
+def ano_letivo_atual() -> int:
+    """Ano letivo das matrículas em andamento (corte de idade, ano padrão das consultas e do arquivamento)."""
+    if ANO_LETIVO:
+        return ANO_LETIVO
+    return int(os.environ.get("CEMAC_ANO_LETIVO") or date.today().year)
+
+def calcular_turma_cemac(data_nascimento_str: str, ano_letivo: int = None) -> str:
     """
-    Calcula a turma com base na idade que o aluno terá em 31 de Março do ano de 2026.
+    Calcula a turma com base na idade que o aluno terá em 31 de Março do ano letivo
+    ('ano_letivo'; padrão: ano_letivo_atual()).
     A lógica é baseada na idade em anos e meses completos na data de corte.
     
     Regras:
@@ -29,8 +44,7 @@ def calcular_turma_cemac(data_nascimento_str: str) -> str:
         return "Erro na Data (dd/mm/aaaa)"
 
     # --- CONFIGURAÇÃO DE CORTE ---
-    ANO_LETIVO = 2026
-    data_corte = date(ANO_LETIVO, 3, 31) 
+    data_corte = date(ano_letivo or ano_letivo_atual(), 3, 31) 
     
     # Cálculo da idade na data de corte
     idade_anos = data_corte.year - data_nasc.year - ((data_corte.month, data_corte.day) < (data_nasc.month, data_nasc.day))
@@ -125,9 +139,19 @@ def format_date(entry: Entry):
     if hasattr(entry, 'set'):
         entry.set(text) 
     
+def so_digitos(texto) -> str:
+    """Forma canônica de CPF/telefone: só os dígitos (ex.: '(81) 99813-3609' -> '81998133609')."""
+    return ''.join(filter(str.isdigit, texto or ''))
+
+def chave_busca(texto) -> str:
+    """Forma canônica de nomes/endereços para busca por prefixo: sem acentos, minúsculas, espaços simples."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.casefold().split())
+
 def format_cpf(entry: Entry):
     """Formata o CPF para ###.###.###-## ao perder o foco."""
-    text = ''.join(filter(str.isdigit, entry.get()))
+    text = so_digitos(entry.get())
     if len(text) > 11: text = text[:11]
     
     if len(text) > 9:
@@ -142,7 +166,7 @@ def format_cpf(entry: Entry):
 
 def format_phone(entry: Entry):
     """Formata o Telefone para (##) #####-#### ao perder o foco."""
-    text = ''.join(filter(str.isdigit, entry.get()))
+    text = so_digitos(entry.get())
     
     if len(text) > 11: text = text[:11]
         
@@ -2,26 +2,41 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 from ttkbootstrap import Style, ttk
 from PIL import Image, ImageTk 
-from datetime import date
+from datetime import date, datetime
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 import os
 import sqlite3
 import re
+import threading
 
 from utils import format_date 
 
 # Componentes de Domínio/Lógica Separados
 try:
     # Atenção: database.py deve conter o método update_status_matricula
-    from database import DatabaseManager
+    from database import DatabaseManager, aluno_para_dict, DESCRICAO_EVENTOS, TODOS_OS_ANOS
+    from backup import BackupManager
+    from colunar import AlunosColunar
+    from conciliacao import aplicar_propostas, conciliar_extrato, formatar_valor, valor_em_centavos
+    import reports
+    from fichas import gerar_ficha_pdf, gravar_zip_fichas, nome_arquivo_ficha
+    from fotos import (
+        cache_miniaturas,
+        foto_impressao,
+        gerar_derivado,
+        preparar_foto,
+        LADO_FORMULARIO,
+        LADO_LISTA
+    )
+    from profiling import profiler
     from utils import (
         calcular_turma_cemac, 
         is_valid_name, 
         format_cpf, 
         format_phone, 
-        is_valid_date_format
+        is_valid_date_format,
+        so_digitos,
+        TURMAS_CEMAC
     )
 except ImportError as e:
     # Saída de erro aprimorada, caso o usuário não tenha os arquivos
@@ -35,9 +50,12 @@ except ImportError as e:
 
 class MatriculaApp(tk.Tk):
     """Classe principal que gerencia o banco de dados, estilos e troca de telas."""
-    def __init__(self):
+    def __init__(self, db=None):
         super().__init__()
-        self.db = DatabaseManager() 
+        # 'db' pode ser um RemoteDatabaseManager (api_client.py) apontando para o serviço da rede
+        self.db = db or DatabaseManager() 
+        # Estações remotas não têm o arquivo do banco: o backup é feito no servidor
+        self.backup = None if getattr(self.db, "remoto", False) else BackupManager(self.db.db_name)
         
         self.title("CEMAC - Sistema de Matrícula")
         self.geometry("1000x700") 
@@ -52,6 +70,19 @@ class MatriculaApp(tk.Tk):
         self._create_frames()
         self.show_frame("HomeFrame")
 
+        # Backup automático diário, em segundo plano (não bloqueia a janela)
+        if self.backup and self.backup.backup_necessario():
+            self.after(2000, self.iniciar_backup)
+
+        # Atalho oculto: liga/desliga o registro de ações lentas (ver profiling.py)
+        self.bind_all("<Control-Shift-P>", self._alternar_profiling)
+
+    def _alternar_profiling(self, event=None):
+        if profiler.alternar():
+            messagebox.showinfo("Análise de Desempenho", f"Ações acima de {profiler.limite_ms:.0f} ms serão gravadas em '{os.path.abspath(profiler.pasta)}'.")
+        else:
+            messagebox.showinfo("Análise de Desempenho", f"Registro desligado ({profiler.registradas} ação(ões) lenta(s) gravada(s)).")
+
     def _configure_styles(self):
         """Configura os estilos globais TTK/Bootstrap."""
         self.style.configure('C.TButton', font=('default', 11, 'bold'))
@@ -87,6 +118,41 @@ class MatriculaApp(tk.Tk):
         else:
             messagebox.showerror("Erro de Navegação", f"Frame '{frame_name}' não encontrado.")
 
+    def destroy(self):
+        """Fecha as conexões do pool (checkpoint do WAL) antes de encerrar a janela."""
+        self.db.close()
+        super().destroy()
+
+    # --- Backup em Segundo Plano ---
+
+    def iniciar_backup(self, avisar=False):
+        """Dispara o backup em uma thread e acompanha o progresso com after()."""
+        if self.backup is None:
+            messagebox.showinfo("Backup", "Esta estação usa o serviço da rede; o backup é feito no servidor.")
+            return
+        if not self.backup.iniciar_backup_async():
+            if avisar:
+                messagebox.showinfo("Backup", "Já existe um backup em andamento.")
+            return
+        self._acompanhar_backup(avisar)
+
+    def _acompanhar_backup(self, avisar):
+        """Consulta o estado do backup sem bloquear o loop de eventos do Tk."""
+        home = self.frames["HomeFrame"]
+        if self.backup.em_andamento():
+            copiadas, total = self.backup.progresso
+            home.backup_status_var.set(f"Backup em andamento... {copiadas}/{total} páginas")
+            self.after(200, self._acompanhar_backup, avisar)
+            return
+
+        if self.backup.ultimo_erro:
+            home.backup_status_var.set("Falha no último backup.")
+            messagebox.showerror("Erro de Backup", f"Falha ao criar o backup: {self.backup.ultimo_erro}")
+        else:
+            home.backup_status_var.set(f"Último backup: {date.today().strftime('%d/%m/%Y')}")
+            if avisar:
+                messagebox.showinfo("Backup", f"Backup salvo em: {self.backup.ultimo_resultado}")
+
 
 # ====================================================================
 # TELA 1: HOME (Menu Principal)
@@ -117,10 +183,122 @@ class HomeFrame(ttk.Frame):
                    command=lambda: controller.show_frame("ListFrame"),
                    bootstyle="info", width=25, style='C.TButton').pack(pady=15, padx=10)
                    
+        ttk.Button(button_frame, text="Fazer Backup", 
+                   command=lambda: controller.iniciar_backup(avisar=True),
+                   bootstyle="secondary", width=25, style='C.TButton').pack(pady=15, padx=10)
+
         ttk.Button(button_frame, text="Sair", 
                    command=controller.destroy,
                    bootstyle="danger", width=25, style='C.TButton').pack(pady=15, padx=10)
+
+        # Status do backup (atualizado pelo controller)
+        self.backup_status_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.backup_status_var, style='N.TLabel').grid(row=3, column=0, pady=10)
                    
+# ====================================================================
+# COMPONENTE: AUTOCOMPLETAR (sugestões sob um campo de texto)
+# ====================================================================
+
+class AutoCompletar:
+    """
+    Lista de sugestões sob um Entry enquanto o usuário digita. A busca só roda DEBOUNCE_MS
+    depois da última tecla: digitar rápido não gera uma consulta por tecla.
+    'buscar(texto)' devolve [(texto exibido, valor)]; 'ao_escolher(valor)' recebe o escolhido.
+    Setas navegam, Enter escolhe, Esc fecha.
+    """
+    DEBOUNCE_MS = 150
+    MIN_CARACTERES = 2
+    TECLAS_IGNORADAS = {"Up", "Down", "Return", "KP_Enter", "Escape", "Tab", "Shift_L", "Shift_R",
+                        "Control_L", "Control_R", "Alt_L", "Alt_R", "Left", "Right", "Home", "End"}
+
+    def __init__(self, entry, buscar, ao_escolher):
+        self.entry = entry
+        self.buscar = buscar
+        self.ao_escolher = ao_escolher
+        self._agendado = None
+        self._popup = None
+        self._lista = None
+        self._valores = []
+
+        entry.bind("<KeyRelease>", self._tecla, add="+")
+        entry.bind("<Down>", lambda e: self._mover(1), add="+")
+        entry.bind("<Up>", lambda e: self._mover(-1), add="+")
+        entry.bind("<Return>", self._confirmar, add="+")
+        entry.bind("<Escape>", lambda e: self.fechar(), add="+")
+        # Com atraso: um clique na lista tira o foco do Entry antes de ser tratado
+        entry.bind("<FocusOut>", lambda e: entry.after(200, self.fechar), add="+")
+
+    def _tecla(self, event):
+        if event.keysym in self.TECLAS_IGNORADAS:
+            return
+        if self._agendado is not None:
+            self.entry.after_cancel(self._agendado)
+        self._agendado = self.entry.after(self.DEBOUNCE_MS, self._atualizar)
+
+    def _atualizar(self):
+        self._agendado = None
+        texto = self.entry.get().strip()
+        if len(texto) < self.MIN_CARACTERES:
+            self.fechar()
+            return
+        try:
+            sugestoes = self.buscar(texto)
+        except Exception as e:
+            print(f"Erro ao buscar sugestões: {e}")
+            sugestoes = []
+        if not sugestoes:
+            self.fechar()
+            return
+        self._mostrar(sugestoes)
+
+    def _mostrar(self, sugestoes):
+        if self._popup is None:
+            self._popup = tk.Toplevel(self.entry)
+            self._popup.overrideredirect(True)
+            self._lista = tk.Listbox(self._popup, activestyle="dotbox", exportselection=False)
+            self._lista.pack(fill=tk.BOTH, expand=True)
+            self._lista.bind("<ButtonRelease-1>", lambda e: self._escolher())
+        self._valores = [valor for _, valor in sugestoes]
+        self._lista.delete(0, tk.END)
+        for exibido, _ in sugestoes:
+            self._lista.insert(tk.END, exibido)
+        self._lista.configure(height=len(sugestoes), width=max(len(exibido) for exibido, _ in sugestoes) + 2)
+        self._popup.geometry(f"+{self.entry.winfo_rootx()}+{self.entry.winfo_rooty() + self.entry.winfo_height()}")
+        self._popup.lift()
+
+    def _mover(self, passo):
+        if self._popup is None:
+            return
+        atual = self._lista.curselection()
+        indice = 0 if not atual else max(0, min(len(self._valores) - 1, atual[0] + passo))
+        self._lista.selection_clear(0, tk.END)
+        self._lista.selection_set(indice)
+        self._lista.see(indice)
+        return "break"
+
+    def _confirmar(self, event=None):
+        if self._popup is None or not self._lista.curselection():
+            return
+        self._escolher()
+        return "break"
+
+    def _escolher(self):
+        selecao = self._lista.curselection() if self._lista is not None else ()
+        if not selecao:
+            return
+        valor = self._valores[selecao[0]]
+        self.fechar()
+        self.ao_escolher(valor)
+
+    def fechar(self):
+        if self._agendado is not None:
+            self.entry.after_cancel(self._agendado)
+            self._agendado = None
+        if self._popup is not None:
+            self._popup.destroy()
+            self._popup = self._lista = None
+
+
 # ====================================================================
 # TELA 2: FORMULÁRIO DE MATRÍCULA (Com Scrollbar e Layout Fixado)
 # ====================================================================
@@ -159,6 +337,9 @@ class FormsFrame(ttk.Frame):
         # Configurar coluna 1 do frame interno para expandir
         self.scrollable_frame.grid_columnconfigure(1, weight=1)
 
+        self._foto = None # (JPEG, largura, altura) de fotos.preparar_foto, gravado ao salvar
+        self._foto_preview = None # referência da imagem exibida (o Tk não a mantém sozinho)
+
         # Configuração de Rolagem
         self.scrollable_frame.bind(
             "<Configure>",
@@ -216,7 +397,9 @@ class FormsFrame(ttk.Frame):
         cpf_entry = self._create_label_entry(form_frame, row, "CPF do Aluno (Opcional):", self.vars["cpf_aluno"])
         cpf_entry.bind('<FocusOut>', lambda e: format_cpf(cpf_entry)); row += 1
         
-        self._create_label_entry(form_frame, row, "Endereço Completo:", self.vars["endereco"]); row += 1
+        endereco_entry = self._create_label_entry(form_frame, row, "Endereço Completo:", self.vars["endereco"]); row += 1
+
+        row = self._create_foto_line(form_frame, row)
 
         # Data, Idade e Turma
         row = self._create_data_turma_line(form_frame, row)
@@ -225,19 +408,24 @@ class FormsFrame(ttk.Frame):
         row += 1
 
         # --- DADOS DOS PAIS/RESPONSÁVEIS ---
-        self._create_label_entry(form_frame, row, "Nome da Mãe:", self.vars["mae"]); row += 1
+        mae_entry = self._create_label_entry(form_frame, row, "Nome da Mãe:", self.vars["mae"]); row += 1
         tel_mae_entry = self._create_label_entry(form_frame, row, "Tel. da Mãe:", self.vars["tel_mae"])
         tel_mae_entry.bind('<FocusOut>', lambda e: format_phone(tel_mae_entry)); row += 1 
         
-        self._create_label_entry(form_frame, row, "Nome do Pai:", self.vars["pai"]); row += 1
+        pai_entry = self._create_label_entry(form_frame, row, "Nome do Pai:", self.vars["pai"]); row += 1
         tel_pai_entry = self._create_label_entry(form_frame, row, "Tel. do Pai:", self.vars["tel_pai"])
         tel_pai_entry.bind('<FocusOut>', lambda e: format_phone(tel_pai_entry)); row += 1
         
-        self._create_label_entry(form_frame, row, "Responsável Legal:", self.vars["resp_legal"]); row += 1
+        resp_entry = self._create_label_entry(form_frame, row, "Responsável Legal:", self.vars["resp_legal"]); row += 1
         
         tel_emerg_entry = self._create_label_entry(form_frame, row, "Tel. Emergência:", self.vars["tel_resp_emerg"])
         tel_emerg_entry.bind('<FocusOut>', lambda e: format_phone(tel_emerg_entry)); row += 1
 
+        # Autocompletar com as famílias já cadastradas (irmãos): escolher um responsável preenche a família
+        for campo, entry in (("mae", mae_entry), ("pai", pai_entry), ("resp_legal", resp_entry)):
+            AutoCompletar(entry, self._sugerir_responsaveis, lambda r, c=campo: self._preencher_responsavel(c, r))
+        AutoCompletar(endereco_entry, self._sugerir_enderecos, self.vars["endereco"].set)
+
         ttk.Separator(form_frame, bootstyle="info").grid(row=row, columnspan=2, sticky="ew", pady=15)
         row += 1
 
@@ -285,6 +473,43 @@ class FormsFrame(ttk.Frame):
         setattr(entry, 'set', textvariable.set) 
         return entry
         
+    def _create_foto_line(self, parent_frame, row):
+        """Cria a linha da foto do aluno (pré-visualização e botões)."""
+        ttk.Label(parent_frame, text="Foto (Opcional):", style='N.TLabel').grid(row=row, column=0, sticky=tk.W, padx=5, pady=8)
+
+        foto_frame = ttk.Frame(parent_frame)
+        foto_frame.grid(row=row, column=1, sticky="w", padx=5, pady=8)
+
+        self.foto_label = ttk.Label(foto_frame, text="Sem foto", width=12, anchor=tk.CENTER, style='N.TLabel')
+        self.foto_label.pack(side=tk.LEFT)
+        ttk.Button(foto_frame, text="Escolher Foto...", bootstyle="info-outline",
+                   command=self._escolher_foto).pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Button(foto_frame, text="Remover", bootstyle="secondary-outline",
+                   command=self._limpar_foto).pack(side=tk.LEFT)
+        return row + 1
+
+    def _escolher_foto(self):
+        """Lê a foto escolhida (reduzida para guardar no banco) e mostra uma miniatura."""
+        caminho = filedialog.askopenfilename(
+            title="Foto do Aluno",
+            filetypes=[("Imagens", "*.jpg *.jpeg *.png *.webp *.bmp"), ("Todos os arquivos", "*.*")]
+        )
+        if not caminho:
+            return
+        try:
+            self._foto = preparar_foto(caminho)
+            miniatura = gerar_derivado(self._foto[0], LADO_FORMULARIO)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Foto", f"Não foi possível usar esta foto: {e}")
+            return
+        self._foto_preview = ImageTk.PhotoImage(Image.open(BytesIO(miniatura)))
+        self.foto_label.config(image=self._foto_preview, text="")
+
+    def _limpar_foto(self):
+        self._foto = None
+        self._foto_preview = None
+        self.foto_label.config(image="", text="Sem foto")
+
     def _create_data_turma_line(self, parent_frame, row):
         """Cria a linha específica de Data de Nascimento, Idade e Turma."""
         
@@ -311,6 +536,43 @@ class FormsFrame(ttk.Frame):
         
         return row + 1 
 
+    # --- Autocompletar de Responsáveis e Endereços ---
+
+    # Campo de nome -> campo de telefone do mesmo responsável
+    TELEFONE_DO_RESPONSAVEL = {"mae": "tel_mae", "pai": "tel_pai", "resp_legal": "tel_resp_emerg"}
+    # Grupos de campos preenchidos a partir do irmão mais recente (chaves de aluno_para_dict); o telefone
+    # só acompanha o nome: se o nome já foi digitado, é outra pessoa
+    CAMPOS_FAMILIA = ({"endereco": "Endereco"}, {"mae": "NomeMae", "tel_mae": "TelMae"},
+                      {"pai": "NomePai", "tel_pai": "TelPai"}, {"resp_legal": "RespLegal", "tel_resp_emerg": "TelEmerg"})
+
+    def _sugerir_responsaveis(self, texto):
+        return [(f"{nome}  —  {telefone}" if telefone else nome, (responsavel_id, nome, telefone))
+                for responsavel_id, nome, telefone in self.db.sugerir_responsaveis(texto)]
+
+    def _sugerir_enderecos(self, texto):
+        return [(endereco, endereco) for endereco in self.db.sugerir_enderecos(texto)]
+
+    def _preencher_responsavel(self, campo, responsavel):
+        """
+        Preenche nome e telefone do responsável escolhido e, a partir do irmão cadastrado mais
+        recente, os campos da família ainda vazios (endereço, outros responsáveis e telefones).
+        """
+        responsavel_id, nome, telefone = responsavel
+        self.vars[campo].set(nome)
+        self.vars[self.TELEFONE_DO_RESPONSAVEL[campo]].set(telefone)
+        try:
+            familia = self.db.get_familia_responsavel(responsavel_id)
+        except Exception as e:
+            print(f"Erro ao buscar a família: {e}")
+            return
+        if not familia:
+            return
+        irmao = aluno_para_dict(familia)
+        for grupo in self.CAMPOS_FAMILIA:
+            if all(not self.vars[var].get().strip() for var in grupo):
+                for var, chave in grupo.items():
+                    self.vars[var].set(irmao[chave] or "")
+
     # --- Métodos de Lógica/Validação ---
 
     def _update_turma_and_idade(self):
@@ -329,7 +591,7 @@ class FormsFrame(ttk.Frame):
              return
         
         try:
-            turma = calcular_turma_cemac(data_str) 
+            turma = calcular_turma_cemac(data_str, self.db.ano_letivo) 
             
             dia, mes, ano = map(int, data_str.split('/'))
             data_nasc = date(ano, mes, dia)
@@ -353,6 +615,7 @@ class FormsFrame(ttk.Frame):
         self.vars["turma"].set("...")
         self.vars["idade"].set("")
         self.vars["metodo_pagamento"].set("Pix") 
+        self._limpar_foto()
 
     def _clear_and_go_home(self):
         """Limpa o formulário e navega para a Home."""
@@ -425,7 +688,10 @@ class FormsFrame(ttk.Frame):
                 data_matricula # Campo 16: Data da Matrícula
             )
 
-            if self.db.insert_aluno(dados): 
+            aluno_id = self.db.insert_aluno(dados)
+            if aluno_id: 
+                 if self._foto and not self.db.salvar_foto(aluno_id, *self._foto):
+                     messagebox.showwarning("Foto", "A matrícula foi salva, mas a foto não. Verifique o console para erros de banco.")
                  messagebox.showinfo("Sucesso", f"Matrícula de {dados[0]} efetivada com sucesso! Turma: {dados[2]}")
                  self._clear_forms()
                  self.controller.show_frame("HomeFrame")
@@ -443,7 +709,9 @@ class FormsFrame(ttk.Frame):
 class ListFrame(ttk.Frame):
     
     # Lista de turmas atualizada com a nomenclatura correta
-    TURMAS = ["Todas", "Berçário", "Infantil I", "Infantil II", "Infantil III", "Pré I", "Pré II", "2º Ano ou Acima"] 
+    TURMAS = ["Todas"] + TURMAS_CEMAC
+    INTERVALO_ATUALIZACAO_MS = 2000 # polling do feed de alterações (outras estações)
+    MODOS_PESQUISA = ["Nome", "CPF/Telefone"]
 
     def __init__(self, parent, controller):
         super().__init__(parent, padding="15")
@@ -453,8 +721,14 @@ class ListFrame(ttk.Frame):
         self.page_size = 15
         self.current_page = 1
         self.total_alunos = 0
-        self.all_alunos_data = [] 
-        self.filtered_alunos_data = [] 
+        self.alunos = AlunosColunar() # todos os alunos, em colunas compactas
+        self.filtrados = b"" # bitmap (um byte 0/1 por linha de self.alunos) das linhas que passam no filtro
+        self._carga = None # (versão do banco, ano) da última carga completa de self.alunos
+        self._ultima_seq = 0 # última sequência do feed de alterações já aplicada
+        self._versao_vista = None # versão do banco na última verificação do feed
+        self._fotos_pagina = {} # aluno_id -> hash da foto, das linhas exibidas
+        self._miniaturas = {} # hash -> PhotoImage das miniaturas exibidas (o Tk não guarda a referência)
+        self._recebendo_miniaturas = False
 
         self.grid_rowconfigure(2, weight=1) 
         self.grid_columnconfigure(0, weight=1)
@@ -468,6 +742,7 @@ class ListFrame(ttk.Frame):
         self.tree.bind("<Double-1>", self._confirmar_matricula_modal)
         
         self.load_alunos() 
+        self.after(self.INTERVALO_ATUALIZACAO_MS, self._verificar_alteracoes)
 
     def _setup_filter_frame(self):
         """Cria e configura a seção de filtros e pesquisa."""
@@ -478,6 +753,8 @@ class ListFrame(ttk.Frame):
         
         self.turma_filter_var = tk.StringVar(value="Todas")
         self.search_name_var = tk.StringVar()
+        self.search_mode_var = tk.StringVar(value="Nome")
+        self.ano_filter_var = tk.StringVar(value=str(self.db.ano_letivo))
 
         # Filtro de Turma
         ttk.Label(filter_frame, text="Filtrar por Turma:", style='N.TLabel').grid(row=0, column=0, padx=5, sticky=tk.W)
@@ -485,23 +762,38 @@ class ListFrame(ttk.Frame):
         turma_combo.grid(row=0, column=1, padx=5, sticky=tk.W)
         turma_combo.bind("<<ComboboxSelected>>", self._apply_filter)
         
-        # Pesquisa por Nome
-        ttk.Label(filter_frame, text="Pesquisar por Nome:", style='N.TLabel').grid(row=0, column=2, padx=(20, 5), sticky=tk.W)
+        # Pesquisa por Nome ou por CPF/Telefone (acha irmãos: mesmo telefone ou CPF da família)
+        search_frame = ttk.Frame(filter_frame)
+        search_frame.grid(row=0, column=2, padx=(20, 5), sticky=tk.W)
+        ttk.Label(search_frame, text="Pesquisar por", style='N.TLabel').pack(side=tk.LEFT)
+        mode_combo = ttk.Combobox(search_frame, textvariable=self.search_mode_var, values=self.MODOS_PESQUISA, state="readonly", width=13, style='N.TLabel')
+        mode_combo.pack(side=tk.LEFT, padx=(5, 0))
+        mode_combo.bind("<<ComboboxSelected>>", self._apply_filter)
         name_entry = ttk.Entry(filter_frame, textvariable=self.search_name_var)
         name_entry.grid(row=0, column=3, padx=5, sticky="ew")
         name_entry.bind('<KeyRelease>', self._apply_filter) 
+
+        # Ano Letivo (anos encerrados vêm dos arquivos; "Todos" pesquisa em todos os anos)
+        ttk.Label(filter_frame, text="Ano:", style='N.TLabel').grid(row=0, column=4, padx=(20, 5), sticky=tk.W)
+        self.ano_combo = ttk.Combobox(filter_frame, textvariable=self.ano_filter_var, state="readonly", width=7,
+                                      postcommand=self._atualizar_anos, style='N.TLabel')
+        self.ano_combo.grid(row=0, column=5, padx=5, sticky=tk.W)
+        self.ano_combo.bind("<<ComboboxSelected>>", self._mudar_ano)
         
         # Botão Limpar Filtros
-        ttk.Button(filter_frame, text="Limpar Filtros", bootstyle="light", command=self._clear_filter, style='C.TButton').grid(row=0, column=4, padx=10, sticky=tk.E)
+        ttk.Button(filter_frame, text="Limpar Filtros", bootstyle="light", command=self._clear_filter, style='C.TButton').grid(row=0, column=6, padx=10, sticky=tk.E)
 
     def _setup_treeview(self):
         """Cria e configura o widget Treeview (Tabela)."""
         # Adicionado 'MatriculaEm' para mostrar o campo DataMatricula (índice 19)
+        # A coluna da árvore (#0) mostra a miniatura da foto
         self.tree = ttk.Treeview(self, columns=("ID", "Nome", "Turma", "MatriculaEm", "Status", "Pagto"), 
-                                 show="headings", bootstyle="primary", selectmode="browse") 
+                                 show="tree headings", bootstyle="primary", selectmode="extended") 
         self.tree.grid(row=2, column=0, sticky="nsew")
+        self.controller.style.configure(self.tree.cget("style") or "Treeview", rowheight=LADO_LISTA + 6)
 
         # Configuração das Colunas 
+        self.tree.column("#0", width=LADO_LISTA + 20, stretch=tk.NO, anchor=tk.CENTER)
         self.tree.column("ID", width=50, stretch=tk.NO, anchor=tk.CENTER)
         self.tree.column("Nome", minwidth=280, stretch=tk.YES) 
         self.tree.column("Turma", width=120, stretch=tk.NO, anchor=tk.CENTER)
@@ -509,6 +801,7 @@ class ListFrame(ttk.Frame):
         self.tree.column("Status", width=150, stretch=tk.NO, anchor=tk.CENTER)
         self.tree.column("Pagto", width=70, stretch=tk.NO, anchor=tk.CENTER)
         
+        self.tree.heading("#0", text="Foto")
         self.tree.heading("ID", text="ID")
         self.tree.heading("Nome", text="Nome do Aluno")
         self.tree.heading("Turma", text="Turma")
@@ -535,9 +828,29 @@ class ListFrame(ttk.Frame):
                    command=self._confirmar_matricula_modal, 
                    style='C.TButton').pack(side=tk.LEFT, padx=10)
                    
+        ttk.Button(bottom_frame, text="Histórico", bootstyle="secondary-outline", 
+                   command=self._historico_modal, 
+                   style='C.TButton').pack(side=tk.LEFT, padx=10)
+
+        ttk.Button(bottom_frame, text="Corrigir Família", bootstyle="secondary-outline", 
+                   command=self._familia_modal, 
+                   style='C.TButton').pack(side=tk.LEFT, padx=10)
+
+        ttk.Button(bottom_frame, text="Conciliar Extrato", bootstyle="success-outline", 
+                   command=self._conciliacao_modal, 
+                   style='C.TButton').pack(side=tk.LEFT, padx=10)
+                   
         ttk.Button(bottom_frame, text="Imprimir Ficha", bootstyle="primary", 
                    command=self._imprimir_ficha, 
                    style='C.TButton').pack(side=tk.LEFT, padx=10)
+
+        ttk.Button(bottom_frame, text="Fichas (ZIP)", bootstyle="primary", 
+                   command=self._exportar_fichas_lista, 
+                   style='C.TButton').pack(side=tk.LEFT, padx=10)
+
+        ttk.Button(bottom_frame, text="Relatórios", bootstyle="info", 
+                   command=self._relatorios_modal, 
+                   style='C.TButton').pack(side=tk.LEFT, padx=10)
         
         # Controles de Paginação (à Direita)
         pag_frame = ttk.Frame(bottom_frame)
@@ -551,38 +864,60 @@ class ListFrame(ttk.Frame):
     # --- Métodos de Filtro e Paginação ---
 
     def load_alunos(self):
-        """Carrega todos os dados do banco e aplica o filtro inicial."""
+        """
+        Carrega todos os dados do banco e aplica o filtro inicial. As linhas vêm em lotes
+        (iter_alunos, fora do cache) direto para as colunas: nenhuma tupla completa fica guardada.
+        """
         try:
-            self.all_alunos_data = self.db.get_alunos() 
+            # Versão e sequência lidas ANTES dos dados: o que mudar entre as leituras chega pelo feed
+            versao = self.db.versao_dados()
+            ano = self._ano_selecionado()
+            # Mesmo banco e mesmo ano da última carga: nada a refazer
+            if (versao, ano) == self._carga:
+                return
+            ultima_seq = self.db.get_ultima_alteracao()
+            self.alunos.carregar(self.db.iter_alunos(ano))
+            self._carga = (versao, ano)
         except Exception as e:
             messagebox.showerror("Erro de Banco", f"Falha ao carregar alunos. Tente recriar o banco de dados (deletar o .db): {e}")
-            self.all_alunos_data = []
+            self.alunos.carregar(())
+            self._carga = None
+            versao, ultima_seq = None, 0
+        
+        self._ultima_seq = ultima_seq
+        self._versao_vista = versao
             
         self._apply_filter() 
 
-    def _apply_filter(self, event=None):
-        """Filtra os dados em memória com base na turma e no nome."""
+    def _apply_filter(self, event=None, manter_pagina=False):
+        """
+        Filtra os dados em memória com base na turma e no nome (gera só um bitmap, sem copiar linhas).
+        No modo CPF/Telefone, os alunos da família vêm de uma busca indexada no banco (find_by_contact).
+        """
         turma_selecionada = self.turma_filter_var.get()
         termo_pesquisa = self.search_name_var.get().strip().lower()
-
-        self.filtered_alunos_data = []
-
-        for aluno in self.all_alunos_data:
-            
-            # Turma está no índice 3
-            if turma_selecionada != "Todas" and aluno[3] != turma_selecionada:
-                continue
-
-            # Nome está no índice 1
-            if termo_pesquisa and termo_pesquisa not in aluno[1].lower():
-                continue
-            
-            self.filtered_alunos_data.append(aluno)
+        ids_contato = None
+
+        if self.search_mode_var.get() == "CPF/Telefone":
+            digitos = so_digitos(termo_pesquisa)
+            termo_pesquisa = ""
+            if digitos:
+                try:
+                    ids_contato = {aluno[0] for aluno in self.db.find_by_contact(digitos)}
+                except Exception as e:
+                    print(f"Erro na busca por contato: {e}")
+                    ids_contato = set()
+
+        self.filtrados = self.alunos.filtrar(
+            turma=None if turma_selecionada == "Todas" else turma_selecionada,
+            termo=termo_pesquisa or None,
+            ids=ids_contato
+        )
         
-        self.current_page = 1
-        self.total_alunos = len(self.filtered_alunos_data)
+        self.total_alunos = self.alunos.contar(self.filtrados)
         self.total_pages = (self.total_alunos + self.page_size - 1) // self.page_size
         if self.total_pages == 0: self.total_pages = 1
+        self.current_page = min(self.current_page, self.total_pages) if manter_pagina else 1
         
         self._display_current_page()
 
@@ -590,33 +925,169 @@ class ListFrame(ttk.Frame):
         """Reseta todos os filtros e recarrega a lista."""
         self.turma_filter_var.set("Todas")
         self.search_name_var.set("")
+        if self.ano_filter_var.get() != str(self.db.ano_letivo):
+            self.ano_filter_var.set(str(self.db.ano_letivo))
+            self.load_alunos()
+            return
         self._apply_filter()
 
+    def _ano_selecionado(self):
+        """Ano escolhido no filtro: um ano letivo (int) ou TODOS_OS_ANOS."""
+        ano = self.ano_filter_var.get()
+        return TODOS_OS_ANOS if ano == "Todos" else int(ano)
+
+    def _atualizar_anos(self):
+        """Preenche o combo de anos ao abri-lo (anos podem ter sido arquivados por outra estação)."""
+        try:
+            anos = self.db.anos_letivos()
+        except Exception as e:
+            print(f"Erro ao listar anos letivos: {e}")
+            anos = [self.db.ano_letivo]
+        self.ano_combo.configure(values=[str(ano) for ano in anos] + ["Todos"])
+
+    def _mudar_ano(self, event=None):
+        """Troca o ano exibido: recarrega a lista (do banco atual, de um arquivo ou de todos)."""
+        self.load_alunos()
+
     def _display_current_page(self):
         """Atualiza a Treeview com os dados da página atual."""
+        selecionados = self.tree.selection()
         self.tree.delete(*self.tree.get_children())
             
         start_index = (self.current_page - 1) * self.page_size
         end_index = start_index + self.page_size
         
-        alunos_page = self.filtered_alunos_data[start_index:end_index] 
-        
-        for aluno in alunos_page:
-            # Posições dos campos no SELECT *:
-            # ID(0), Nome(1), Turma(3), StatusMatricula(18), StatusPagto(16), DataMatricula(19)
-            
-            id, nome, turma, status_matricula, status_pagto, data_matricula = aluno[0], aluno[1], aluno[3], aluno[18], aluno[16], aluno[19] 
-            
-            pagto_status = "Pago" if status_pagto == 1 else "PENDENTE"
-            tag = "efetivada" if status_matricula == 'Matrícula Efetivada' else "pendente" 
-            
-            self.tree.insert("", tk.END, iid=id, values=(id, nome, turma, data_matricula, status_matricula, pagto_status), tags=(tag,))
+        for i in self.alunos.indices(self.filtrados, start_index, end_index - start_index):
+            values, tag = self._valores_linha(i)
+            self.tree.insert("", tk.END, iid=values[0], values=values, tags=(tag,))
+        self._fotos_pagina = {}
+        self._mostrar_fotos([int(iid) for iid in self.tree.get_children()])
+
+        # Mantém a seleção de quem continua na página (ex.: após atualização vinda de outra estação)
+        self.tree.selection_set([iid for iid in selecionados if self.tree.exists(iid)])
 
         self.tree.tag_configure('pendente', background='#FFEBE6') 
         self.tree.tag_configure('efetivada', background='#E6FFE6')
         
         self.page_label.config(text=f"Pág. {self.current_page}/{self.total_pages}")
 
+    def _valores_linha(self, i):
+        """Valores exibidos na Treeview e tag de cor da linha i do cache colunar."""
+        values = self.alunos.exibicao(i) # (ID, Nome, Turma, MatriculaEm, Status, Pagto)
+        tag = "efetivada" if values[4] == 'Matrícula Efetivada' else "pendente" 
+        return values, tag
+
+    def _atualizar_linhas(self, aluno_ids):
+        """Relê do banco apenas os alunos informados e atualiza essas linhas, sem recarregar a lista."""
+        self._aplicar_alteracoes(aluno_ids, [])
+
+    def _aplicar_alteracoes(self, alterados_ids, removidos_ids):
+        """
+        Aplica na lista em memória e na Treeview apenas as linhas alteradas, inseridas ou removidas.
+        Se só mudaram campos exibidos, as linhas da Treeview são corrigidas no lugar; se a
+        composição da lista filtrada pode ter mudado, o filtro é refeito em memória (sem ir ao banco)
+        mantendo a página atual.
+        """
+        ano = self._ano_selecionado()
+        # Alunos de outro ano letivo (ex.: arquivados ou mudados de ano) saem da lista exibida
+        atualizados = [aluno for aluno in self.db.get_alunos_by_ids(alterados_ids)
+                       if ano == TODOS_OS_ANOS or aluno[20] == ano]
+        encontrados = {aluno[0] for aluno in atualizados}
+        removidos = set(removidos_ids) | (set(alterados_ids) - encontrados) # sumiram do banco
+        
+        if self.alunos.aplicar(atualizados, removidos):
+            self._apply_filter(manter_pagina=True)
+            return
+        
+        # Só mudaram campos exibidos: os índices filtrados continuam válidos
+        visiveis = [aluno_id for aluno_id in encontrados if self.tree.exists(aluno_id)]
+        for aluno_id in visiveis:
+            values, tag = self._valores_linha(self.alunos.posicao(aluno_id))
+            self.tree.item(aluno_id, values=values, tags=(tag,))
+        self._mostrar_fotos(visiveis) # a alteração pode ter sido a foto
+
+    # --- Miniaturas das Fotos ---
+
+    def _mostrar_fotos(self, aluno_ids):
+        """
+        Põe nas linhas informadas (já na Treeview) a miniatura da foto, se estiver pronta no cache.
+        As que faltam são geradas em segundo plano e aparecem quando prontas (_receber_miniaturas).
+        Nunca decodifica uma foto em tamanho cheio na thread da UI.
+        """
+        if not aluno_ids:
+            return
+        try:
+            hashes = self.db.get_fotos_hashes(aluno_ids)
+        except Exception as e:
+            print(f"Erro ao buscar fotos: {e}")
+            return
+        for aluno_id in aluno_ids:
+            hash_foto = hashes.get(aluno_id)
+            if hash_foto:
+                self._fotos_pagina[aluno_id] = hash_foto
+            else:
+                self._fotos_pagina.pop(aluno_id, None)
+            self.tree.item(aluno_id, image=self._miniatura(hash_foto) if hash_foto else "")
+        # Mantém só as imagens da página exibida (os bytes continuam no cache de miniaturas)
+        em_uso = set(self._fotos_pagina.values())
+        self._miniaturas = {h: img for h, img in self._miniaturas.items() if h in em_uso}
+
+    def _miniatura(self, hash_foto):
+        """PhotoImage da miniatura, ou "" (e pede a geração) se ainda não estiver no cache."""
+        imagem = self._miniaturas.get(hash_foto)
+        if imagem is not None:
+            return imagem
+        dados = cache_miniaturas.obter(hash_foto, LADO_LISTA)
+        if dados is None:
+            cache_miniaturas.pedir(hash_foto, LADO_LISTA, self.db.get_foto, self.db.liberar_conexoes_da_thread)
+            if not self._recebendo_miniaturas:
+                self._recebendo_miniaturas = True
+                self.after(100, self._receber_miniaturas)
+            return ""
+        imagem = self._miniaturas[hash_foto] = ImageTk.PhotoImage(Image.open(BytesIO(dados)))
+        return imagem
+
+    def _receber_miniaturas(self):
+        """Polling (via after) das miniaturas geradas pelo worker: aplica nas linhas que as usam."""
+        for hash_foto, lado, dados in cache_miniaturas.concluidas():
+            if lado != LADO_LISTA or not dados:
+                continue
+            imagem = None
+            for aluno_id, hash_linha in self._fotos_pagina.items():
+                if hash_linha == hash_foto and self.tree.exists(aluno_id):
+                    if imagem is None:
+                        imagem = self._miniaturas[hash_foto] = ImageTk.PhotoImage(Image.open(BytesIO(dados)))
+                    self.tree.item(aluno_id, image=imagem)
+        if cache_miniaturas.ocupado():
+            self.after(100, self._receber_miniaturas)
+        else:
+            self._recebendo_miniaturas = False
+
+    def _verificar_alteracoes(self):
+        """
+        Polling (via after) do feed de alterações. O PRAGMA data_version só muda quando alguém
+        faz commit; nesse caso busca apenas os alunos alterados desde a última sequência vista.
+        """
+        try:
+            versao = self.db.versao_dados()
+            if versao != self._versao_vista:
+                self._versao_vista = versao
+                alteracoes = self.db.get_alteracoes_desde(self._ultima_seq)
+                if alteracoes is None:
+                    # Ficamos para trás além do que o feed guarda: recarrega tudo
+                    self.load_alunos()
+                else:
+                    self._ultima_seq, alterados, removidos = alteracoes
+                    if alterados or removidos:
+                        self._aplicar_alteracoes(alterados, removidos)
+                    if self._carga is not None:
+                        # A lista em memória já reflete esta versão: voltar à tela não recarrega tudo
+                        self._carga = (versao, self._carga[1])
+        except Exception as e:
+            print(f"Erro ao verificar alterações: {e}")
+        
+        self.after(self.INTERVALO_ATUALIZACAO_MS, self._verificar_alteracoes)
+
     def _navigate_page(self, direction):
         """Muda para a página anterior ou próxima."""
         new_page = self.current_page + direction
@@ -634,31 +1105,25 @@ class ListFrame(ttk.Frame):
             return None
         return self.tree.item(selected_item, 'values')[0]
 
+    def _get_selected_aluno_ids(self):
+        """Retorna os IDs (int) de todos os alunos selecionados na Treeview."""
+        return [int(self.tree.item(item, 'values')[0]) for item in self.tree.selection()]
+
     def _get_aluno_data_map(self, aluno_id):
         """Busca os dados do aluno no DB e mapeia para um dicionário legível."""
         aluno_data_list = self.db.get_aluno_by_id(aluno_id)
         if not aluno_data_list: return None
         
-        # Mapeamento do SELECT * (20 campos: índice 0 a 19)
-        data = aluno_data_list
-        return {
-            "ID": data[0], "Nome": data[1], "DataNasc": data[2], "Turma": data[3], 
-            "Idade": data[4], "Endereco": data[5],
-            "NomeMae": data[6], "NomePai": data[7], "TelMae": data[8], "TelPai": data[9], 
-            "CPFAluno": data[10],           # <--- CORRIGIDO PARA CPF DO ALUNO
-            "RespLegal": data[11],
-            "TelEmerg": data[12], 
-            "Alergia": data[13], "ProbMed": data[14], 
-            "PagtoMetodo": data[15],       
-            "PagtoStatus": data[16],       
-            "AssinaturaStatus": data[17],  
-            "MatriculaStatus": data[18],
-            "DataMatricula": data[19] 
-        }
+        return aluno_para_dict(aluno_data_list)
 
 
     def _confirmar_matricula_modal(self, event=None):
         """Cria o modal para confirmação de pagamento/assinatura e efetivação."""
+        # Vários alunos selecionados (Ctrl/Shift + clique): confirmação em lote
+        if event is None and len(self.tree.selection()) > 1:
+            self._confirmar_em_lote_modal(self._get_selected_aluno_ids())
+            return
+        
         aluno_id = self._get_selected_aluno_id()
         if not aluno_id: return
         
@@ -714,7 +1179,7 @@ class ListFrame(ttk.Frame):
                 messagebox.showinfo("Sucesso", f"Status de Matrícula (ID: {aluno_id}) atualizado para: {novo_status}.")
                 
                 modal.destroy()
-                self.load_alunos() # Recarrega a lista para mostrar o novo status
+                self._atualizar_linhas([int(aluno_id)]) # Atualiza só a linha alterada
             else:
                 messagebox.showerror("Erro de DB", "Falha ao atualizar o status da matrícula no banco de dados.")
                 
@@ -723,9 +1188,319 @@ class ListFrame(ttk.Frame):
             
         modal.grab_release()
 
+    def _confirmar_em_lote_modal(self, aluno_ids):
+        """Cria o modal para confirmar pagamento/assinatura de vários alunos de uma vez."""
+        pendentes = []
+        for aluno_id in aluno_ids:
+            status = self.alunos.status_de(aluno_id)
+            if status is not None and status != 'Matrícula Efetivada':
+                pendentes.append(aluno_id)
+        
+        if not pendentes:
+            messagebox.showinfo("Status", "Todas as matrículas selecionadas já estão Efetivadas.")
+            return
+
+        modal = tk.Toplevel(self)
+        modal.title("Efetivar Matrículas em Lote")
+        modal.geometry("420x340")
+        modal.transient(self.controller) 
+        modal.grab_set()
+        
+        frame = ttk.Frame(modal, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(frame, text=f"Confirmar {len(pendentes)} matrícula(s) pendente(s)\n({len(aluno_ids) - len(pendentes)} já efetivada(s) serão ignoradas)", 
+                  style='N.TLabel', font=('default', 12, 'bold')).pack(pady=10)
+        
+        ttk.Label(frame, text="Método de Pagamento:", style='N.TLabel').pack(pady=(10,0), anchor=tk.W)
+        metodo_var = tk.StringVar(value="Manter o registrado")
+        ttk.Combobox(frame, textvariable=metodo_var, state="readonly",
+                     values=["Manter o registrado", "Pix", "Cartão", "Dinheiro", "Boleto", "Transferência"]).pack(pady=5, anchor=tk.W)
+        
+        self.var_pagamento = tk.IntVar(value=1)
+        self.var_assinatura = tk.IntVar(value=1) 
+        ttk.Checkbutton(frame, text="Pagamento Confirmado", 
+                        variable=self.var_pagamento, bootstyle="success-square", style='N.TLabel').pack(pady=5, anchor=tk.W)
+        ttk.Checkbutton(frame, text="Contrato Assinado/Ficha Conferida", 
+                        variable=self.var_assinatura, bootstyle="success-square", style='N.TLabel').pack(pady=5, anchor=tk.W)
+        
+        ttk.Button(frame, text="Efetivar Selecionadas", bootstyle="success", style='C.TButton',
+                   command=lambda: self._finalizar_confirmacao_lote(modal, pendentes, metodo_var.get())).pack(pady=20)
+
+    def _finalizar_confirmacao_lote(self, modal, aluno_ids, metodo_pagamento):
+        """Salva o novo status de todos os alunos em uma única transação e atualiza só essas linhas."""
+        pagto_status = self.var_pagamento.get()
+        assinatura_status = self.var_assinatura.get()
+        novo_status = 'Matrícula Efetivada' if pagto_status == 1 and assinatura_status == 1 else 'Pendente'
+        metodo = None if metodo_pagamento == "Manter o registrado" else metodo_pagamento
+
+        try:
+            if self.db.update_status_many(aluno_ids, pagto_status, assinatura_status, novo_status, metodo):
+                modal.destroy()
+                self._atualizar_linhas(aluno_ids)
+                messagebox.showinfo("Sucesso", f"{len(aluno_ids)} matrícula(s) atualizada(s) para: {novo_status}.")
+            else:
+                messagebox.showerror("Erro de DB", "Falha ao atualizar o status das matrículas no banco de dados.")
+                
+        except Exception as e:
+            messagebox.showerror("Erro Crítico", f"Erro ao finalizar confirmação em lote: {e}")
+            
+        modal.grab_release()
+
+    def _historico_modal(self):
+        """Mostra a linha do tempo do status do aluno selecionado (quando, o quê e em qual estação)."""
+        aluno_id = self._get_selected_aluno_id()
+        if not aluno_id: return
+        nome = self.tree.item(self.tree.focus(), 'values')[1]
+
+        try:
+            eventos = self.db.get_historico(int(aluno_id))
+        except Exception as e:
+            messagebox.showerror("Erro de DB", f"Falha ao carregar o histórico: {e}")
+            return
+        if not eventos:
+            messagebox.showinfo("Histórico", f"Nenhuma alteração de status registrada para {nome}.")
+            return
+
+        modal = tk.Toplevel(self)
+        modal.title(f"Histórico - {nome}")
+        modal.geometry("640x360")
+        modal.transient(self.controller)
+
+        frame = ttk.Frame(modal, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+        colunas = ("Data/Hora", "Evento", "Detalhe", "Estação")
+        tree = ttk.Treeview(frame, columns=colunas, show="headings")
+        for coluna, largura in zip(colunas, (130, 170, 170, 130)):
+            tree.heading(coluna, text=coluna)
+            tree.column(coluna, width=largura, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True)
+
+        for momento, codigo, valor, estacao in eventos:
+            tree.insert("", tk.END, values=(datetime.fromtimestamp(momento).strftime('%d/%m/%Y %H:%M'),
+                                            DESCRICAO_EVENTOS.get(codigo, f"Evento {codigo}"), valor or "", estacao))
+        ttk.Button(frame, text="Fechar", bootstyle="secondary", style='C.TButton',
+                   command=modal.destroy).pack(pady=(10, 0))
+
+    # --- Correção dos Dados da Família (responsáveis e endereço são compartilhados entre irmãos) ---
+
+    def _familia_modal(self):
+        """Cria o modal para corrigir responsáveis e endereço do aluno; a correção vale para os irmãos."""
+        aluno_id = self._get_selected_aluno_id()
+        if not aluno_id: return
+
+        aluno_data = self._get_aluno_data_map(aluno_id)
+        try:
+            responsaveis = self.db.get_responsaveis(int(aluno_id))
+        except Exception as e:
+            messagebox.showerror("Erro de DB", f"Falha ao carregar os responsáveis: {e}")
+            return
+        if not aluno_data or responsaveis is None:
+            messagebox.showinfo("Família", "Só é possível corrigir alunos do ano letivo atual.")
+            return
+
+        modal = tk.Toplevel(self)
+        modal.title(f"Corrigir Família - {aluno_data['Nome']}")
+        modal.geometry("520x420")
+        modal.transient(self.controller) 
+        modal.grab_set()
+
+        frame = ttk.Frame(modal, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.columnconfigure(1, weight=1)
+
+        ttk.Label(frame, text="As correções valem para todos os irmãos cadastrados\ncom o mesmo responsável ou endereço.",
+                  style='N.TLabel').grid(row=0, column=0, columnspan=2, pady=(0, 10), sticky=tk.W)
+
+        campos = {}
+        row = 1
+        for papel, rotulo in (("mae", "Mãe"), ("pai", "Pai"), ("responsavel", "Responsável Legal")):
+            if papel not in responsaveis:
+                continue
+            _, nome, telefone = responsaveis[papel]
+            nome_var, telefone_var = tk.StringVar(value=nome), tk.StringVar(value=telefone)
+            ttk.Label(frame, text=f"{rotulo}:", style='N.TLabel').grid(row=row, column=0, sticky=tk.W, pady=3)
+            ttk.Entry(frame, textvariable=nome_var).grid(row=row, column=1, sticky="ew", pady=3); row += 1
+            ttk.Label(frame, text=f"Tel. {rotulo}:", style='N.TLabel').grid(row=row, column=0, sticky=tk.W, pady=3)
+            tel_entry = ttk.Entry(frame, textvariable=telefone_var)
+            tel_entry.grid(row=row, column=1, sticky="ew", pady=3); row += 1
+            tel_entry.bind('<FocusOut>', lambda e, var=telefone_var: format_phone(var))
+            campos[papel] = (nome_var, telefone_var)
+
+        endereco_var = tk.StringVar(value=aluno_data['Endereco'] or "")
+        ttk.Label(frame, text="Endereço:", style='N.TLabel').grid(row=row, column=0, sticky=tk.W, pady=3)
+        ttk.Entry(frame, textvariable=endereco_var).grid(row=row, column=1, sticky="ew", pady=3); row += 1
+
+        ttk.Button(frame, text="Salvar Correções", bootstyle="success", style='C.TButton',
+                   command=lambda: self._salvar_familia(modal, int(aluno_id), responsaveis, campos,
+                                                        aluno_data['Endereco'] or "", endereco_var.get().strip())
+                   ).grid(row=row, column=0, columnspan=2, pady=20)
+
+    def _salvar_familia(self, modal, aluno_id, responsaveis, campos, endereco_antigo, endereco):
+        """Grava só o que mudou: cada responsável uma vez (para todos os irmãos) e o endereço da família."""
+        alteracoes = []
+        for papel, (nome_var, telefone_var) in campos.items():
+            responsavel_id, nome, telefone = responsaveis[papel]
+            novo = (nome_var.get().strip(), telefone_var.get().strip())
+            if not novo[0]:
+                messagebox.showerror("Erro de Validação", "O nome do responsável não pode ficar vazio.")
+                return
+            if novo != (nome, telefone):
+                alteracoes.append((responsavel_id, *novo))
+
+        try:
+            for responsavel_id, nome, telefone in alteracoes:
+                if self.db.update_responsavel(responsavel_id, nome, telefone) is False:
+                    messagebox.showerror("Erro de DB", f"Falha ao corrigir o responsável {nome}.")
+                    return
+            if endereco != endereco_antigo and not self.db.update_endereco(aluno_id, endereco):
+                messagebox.showerror("Erro de DB", "Falha ao corrigir o endereço.")
+                return
+        except Exception as e:
+            messagebox.showerror("Erro Crítico", f"Erro ao corrigir a família: {e}")
+            return
+
+        modal.grab_release()
+        modal.destroy()
+        # As telas abertas (esta e as das outras mesas) recebem os irmãos alterados pelo feed de alterações
+        messagebox.showinfo("Sucesso", "Dados da família atualizados.")
+
+    # --- Conciliação com o Extrato do Banco (ver conciliacao.py) ---
+
+    def _conciliacao_modal(self):
+        """Cria o modal da conciliação: valor da matrícula (opcional), método e escolha do extrato."""
+        modal = tk.Toplevel(self)
+        modal.title("Conciliar Pagamentos com o Extrato")
+        modal.geometry("420x300")
+        modal.transient(self.controller) 
+        modal.grab_set()
+        
+        frame = ttk.Frame(modal, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        valor_var = tk.StringVar()
+        metodo_var = tk.StringVar(value="Pix")
+        ttk.Label(frame, text="Valor da Matrícula (R$, opcional):", style='N.TLabel').pack(anchor=tk.W)
+        ttk.Entry(frame, textvariable=valor_var, width=12).pack(pady=5, anchor=tk.W)
+        ttk.Label(frame, text="Registrar como:", style='N.TLabel').pack(pady=(10,0), anchor=tk.W)
+        ttk.Combobox(frame, textvariable=metodo_var, state="readonly",
+                     values=["Pix", "Transferência", "Boleto", "Cartão", "Dinheiro"]).pack(pady=5, anchor=tk.W)
+        
+        ttk.Button(frame, text="Escolher Extrato (CSV/OFX)...", bootstyle="success", style='C.TButton',
+                   command=lambda: self._iniciar_conciliacao(modal, valor_var.get(), metodo_var.get())).pack(pady=20)
+
+    def _iniciar_conciliacao(self, modal, valor_texto, metodo):
+        """Lê e concilia o extrato em uma thread, sem travar a janela."""
+        valor_matricula = None
+        if valor_texto.strip():
+            try:
+                valor_matricula = valor_em_centavos(valor_texto)
+            except ValueError:
+                valor_matricula = 0
+            if valor_matricula <= 0:
+                messagebox.showerror("Erro de Validação", "Informe o valor da matrícula (ex.: 350,00) ou deixe em branco.")
+                return
+
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Extratos", "*.csv *.ofx *.txt"), ("Todos os arquivos", "*.*")],
+            parent=modal
+        )
+        if not file_path:
+            return
+        modal.destroy()
+
+        resultado = {}
+        def trabalho():
+            try:
+                resultado["conciliacao"] = conciliar_extrato(self.db, file_path, valor_matricula)
+            except Exception as e:
+                resultado["erro"] = e
+            finally:
+                self.db.liberar_conexoes_da_thread()
+
+        worker = threading.Thread(target=trabalho, name="cemac-conciliacao", daemon=True)
+        worker.start()
+        self._aguardar_conciliacao(worker, resultado, metodo)
+
+    def _aguardar_conciliacao(self, worker, resultado, metodo):
+        if worker.is_alive():
+            self.after(100, self._aguardar_conciliacao, worker, resultado, metodo)
+        elif "erro" in resultado:
+            messagebox.showerror("Erro de Conciliação", f"Falha ao ler o extrato: {resultado['erro']}")
+        else:
+            self._revisar_conciliacao(resultado["conciliacao"], metodo)
+
+    def _revisar_conciliacao(self, conciliacao, metodo):
+        """Modal de conferência: as propostas aceitas vêm selecionadas; só as selecionadas são confirmadas."""
+        resumo = (f"{conciliacao.lidos} lançamento(s) lido(s): {len(conciliacao.propostas)} com aluno(s) pendente(s), "
+                  f"{len(conciliacao.sem_par)} crédito(s) sem correspondência, {conciliacao.debitos} débito(s) ignorado(s).")
+        if not conciliacao.propostas:
+            messagebox.showinfo("Conciliação", resumo)
+            return
+
+        modal = tk.Toplevel(self)
+        modal.title("Conferir Conciliação")
+        modal.geometry("1000x520")
+        modal.transient(self.controller) 
+        modal.grab_set()
+
+        frame = ttk.Frame(modal, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text=resumo, style='N.TLabel').pack(anchor=tk.W)
+        ttk.Label(frame, text="Ctrl/Shift + clique para alterar a seleção.", style='N.TLabel').pack(anchor=tk.W, pady=(0, 5))
+
+        colunas = ("Data", "Valor", "Pagador", "Alunos", "Critério", "Observação")
+        larguras = (80, 90, 220, 300, 110, 200)
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=colunas, show="headings", selectmode="extended")
+        for coluna, largura in zip(colunas, larguras):
+            tree.heading(coluna, text=coluna)
+            tree.column(coluna, width=largura, anchor=tk.W)
+        scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.tag_configure('conferir', foreground='#B35C00')
+
+        for i, proposta in enumerate(conciliacao.propostas):
+            lancamento = proposta.lancamento
+            tree.insert("", tk.END, iid=str(i), tags=() if proposta.aceitar else ('conferir',), values=(
+                lancamento.data, formatar_valor(lancamento.valor), lancamento.nome,
+                ", ".join(proposta.alunos), proposta.criterio, proposta.observacao))
+        tree.selection_set([str(i) for i, proposta in enumerate(conciliacao.propostas) if proposta.aceitar])
+
+        ttk.Button(frame, text="Confirmar Pagamentos Selecionados", bootstyle="success", style='C.TButton',
+                   command=lambda: self._aplicar_conciliacao(
+                       modal, [conciliacao.propostas[int(i)] for i in tree.selection()], metodo)).pack(pady=10)
+
+    def _aplicar_conciliacao(self, modal, propostas, metodo):
+        """Confirma todos os pagamentos selecionados em uma única gravação e atualiza só essas linhas."""
+        if not propostas:
+            messagebox.showwarning("Aviso", "Nenhuma proposta selecionada.")
+            return
+        try:
+            ids = aplicar_propostas(self.db, propostas, metodo)
+            if ids is None:
+                messagebox.showerror("Erro de DB", "Falha ao confirmar os pagamentos no banco de dados.")
+                return
+            modal.destroy()
+            self._atualizar_linhas(ids)
+            messagebox.showinfo("Sucesso", f"Pagamento confirmado para {len(ids)} aluno(s).")
+        except Exception as e:
+            messagebox.showerror("Erro Crítico", f"Erro ao aplicar a conciliação: {e}")
+
     
     def _imprimir_ficha(self):
-        """Gera um PDF com a ficha de matrícula do aluno selecionado, com layout organizado."""
+        """
+        Gera um PDF com a ficha de matrícula do aluno selecionado, com layout organizado.
+        Com vários alunos selecionados, gera um ZIP com uma ficha por aluno.
+        """
+        selecionados = self._get_selected_aluno_ids()
+        if len(selecionados) > 1:
+            self._exportar_fichas_zip(selecionados, "Selecionados")
+            return
+
         aluno_id = self._get_selected_aluno_id()
         if not aluno_id: return
         
@@ -735,130 +1510,156 @@ class ListFrame(ttk.Frame):
         file_path = filedialog.asksaveasfilename(
             defaultextension=".pdf", 
             filetypes=[("PDF files", "*.pdf")],
-            initialfile=f"Ficha_Matricula_{aluno_data['Nome'].replace(' ', '_')}.pdf"
+            initialfile=nome_arquivo_ficha(aluno_data)
         )
         if not file_path:
             return 
             
-        # --- Configuração dos caminhos de imagem ---
-        escudo_path = "escudo.png"
-        logo_path = "logo.jpg"
-        escudo_disponivel = os.path.exists(escudo_path)
-        logo_disponivel = os.path.exists(logo_path)
-        
         try:
-            c = canvas.Canvas(file_path, pagesize=A4)
-            width, height = A4
-            
-            # --- CABEÇALHO (Logos e Info da Escola) ---
-            if escudo_disponivel: 
-                c.drawImage(escudo_path, 50, height - 90, width=60, height=75) 
-            if logo_disponivel: 
-                c.drawImage(logo_path, width - 110, height - 90, width=80, height=80) 
-
-            # Título principal
-            c.setFont("Helvetica-Bold", 18)
-            c.drawCentredString(width/2, height - 50, "FICHA DE MATRÍCULA - CEMAC")
-            
-            # Subtítulo e CNPJ
-            c.setFont("Helvetica", 10)
-            c.drawCentredString(width/2, height - 70, "Centro Educacional Mariano Cavalcanti")
-            c.drawCentredString(width/2, height - 85, "CNPJ: 48.932.962/0001-05")
-            
-            # Informação de Matrícula/Emissão
-            c.setFont("Helvetica-Bold", 12)
-            c.drawCentredString(width/2, height - 110, f"Ficha de Matrícula - {date.today().year}")
-            c.setFont("Helvetica", 10)
-            c.drawCentredString(width/2, height - 125, f"Data de Emissão: {date.today().strftime('%d/%m/%Y')}")
-
-            y_pos = height - 180 
-            
-            # Formatação de campos vazios/padrão
-            alergia = aluno_data['Alergia'] if aluno_data['Alergia'] not in ('Não', '') else 'Nenhuma'
-            prob_med = aluno_data['ProbMed'] if aluno_data['ProbMed'] not in ('Não', '') else 'Nenhum'
-            cpf_aluno = aluno_data['CPFAluno'] if aluno_data['CPFAluno'] not in ('Não Informado', '') else 'Não Informado'
-
-            # 1. DADOS DO ALUNO
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y_pos, "1. DADOS DO ALUNO:")
-            y_pos -= 18 
-            
-            c.setFont("Helvetica", 11)
-            c.drawString(50, y_pos, f"Nome da Criança: {aluno_data['Nome']}")
-            c.drawString(350, y_pos, f"Data Nasc: {aluno_data['DataNasc']} (Idade: {aluno_data['Idade']} anos)")
-            y_pos -= 18
-            c.drawString(50, y_pos, f"Endereço: {aluno_data['Endereco']}")
-            c.drawString(350, y_pos, f"Turma / Ano: {aluno_data['Turma']}")
-            y_pos -= 18
-            # CPF DO ALUNO
-            c.drawString(50, y_pos, f"CPF do Aluno: {cpf_aluno}") 
-            y_pos -= 25
-            
-            # 2. DADOS DOS RESPONSÁVEIS
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y_pos, "2. DADOS DOS RESPONSÁVEIS:")
-            y_pos -= 18
-            
-            c.setFont("Helvetica", 11)
-            c.drawString(50, y_pos, f"Responsável Legal: {aluno_data['RespLegal']}")
-            c.drawString(350, y_pos, f"Tel. Emergência: {aluno_data['TelEmerg']}")
-            y_pos -= 18
-            c.drawString(50, y_pos, f"Nome da Mãe: {aluno_data['NomeMae']} - Tel: {aluno_data['TelMae']}")
-            y_pos -= 18
-            c.drawString(50, y_pos, f"Nome do Pai: {aluno_data['NomePai']} - Tel: {aluno_data['TelPai']}")
-            y_pos -= 25
-         
-            # 3. INFORMAÇÕES ADICIONAIS
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y_pos, "3. INFORMAÇÕES ADICIONAIS:")
-            y_pos -= 18
-            
-            c.setFont("Helvetica", 11)
-            c.drawString(50, y_pos, f"Alergias: {alergia}")
-            c.drawString(350, y_pos, f"Problemas c/ Med.: {prob_med}")
-            y_pos -= 18
-            
-            c.drawString(50, y_pos, f"Pagamento: {'PAGO' if aluno_data['PagtoStatus'] == 1 else 'PENDENTE'} - Método: {aluno_data['PagtoMetodo']}")
-            c.drawString(350, y_pos, f"Status Matrícula: {aluno_data['MatriculaStatus']}")
-            y_pos -= 50
-            
-            # --- 4. ASSINATURAS (Centralizadas) ---
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y_pos, "4. ASSINATURAS:")
-            y_pos -= 30
-            
-            PAGE_CENTER_X = width / 2 
-            LINE_WIDTH = 300 
-            TEXT_OFFSET = 10 
-            SPACE_BETWEEN_SIGNS = 120 
-
-            line_x_start = PAGE_CENTER_X - (LINE_WIDTH / 2)
-            line_x_end = PAGE_CENTER_X + (LINE_WIDTH / 2)
-            
-            # 1. Assinatura do Responsável Legal 
-            c.line(line_x_start, y_pos, line_x_end, y_pos) 
-            c.setFont("Helvetica", 10)
-            c.drawCentredString(PAGE_CENTER_X, y_pos - TEXT_OFFSET, f"Assinatura do Responsável Legal: {aluno_data['RespLegal']}")
-            
-            y_pos -= SPACE_BETWEEN_SIGNS 
-            
-            # 2. Espaço para Assinatura da Escola 
-            c.line(line_x_start, y_pos, line_x_end, y_pos)
-            c.setFont("Helvetica", 10)
-            c.drawCentredString(PAGE_CENTER_X, y_pos - TEXT_OFFSET, "Assinatura da Escola (Diretora/Coordenadora)")
-            
-            y_pos -= 40
-
-            # --- RODAPÉ DA ESCOLA (Fixo na parte inferior) ---
-            c.setFont("Helvetica", 8)
-            rodape_text = "Rua Governador Nilo Coelho, 198 - Bairro Centro - Macaparana, PE | Tel: (81) 99813-3609 | cemac.contato@gmail.com"
-            c.drawCentredString(width/2, 30, rodape_text)
-            
-            c.showPage()
-            c.save()
+            # PDF gerado em memória (reimprimir uma ficha que não mudou usa o PDF em cache)
+            pdf = gerar_ficha_pdf(aluno_data, self._foto_ficha(aluno_data))
+            with open(file_path, "wb") as f:
+                f.write(pdf)
             
             messagebox.showinfo("Sucesso", f"Ficha de Matrícula salva em: {file_path}")
 
         except Exception as e:
             # Captura erros gerais (como problemas de fonte ou outras falhas do reportlab)
-            messagebox.showerror("Erro de Impressão", f"Falha ao gerar o PDF. Verifique se as fontes 'Helvetica' estão disponíveis e se os arquivos de logo (escudo.png/logo.jpg) estão na pasta. Erro: {e}")
\ No newline at end of file
+            messagebox.showerror("Erro de Impressão", f"Falha ao gerar o PDF. Verifique se as fontes 'Helvetica' estão disponíveis e se os arquivos de logo (escudo.png/logo.jpg) estão na pasta. Erro: {e}")
+
+    def _foto_ficha(self, aluno_data):
+        """Versão de impressão da foto do aluno para a ficha (gerada uma vez e guardada no cache), ou None."""
+        try:
+            return foto_impressao(self.db.get_foto_hash(aluno_data['ID']), self.db.get_foto)
+        except Exception as e:
+            print(f"Erro ao carregar a foto da ficha: {e}")
+            return None
+
+    def _exportar_fichas_lista(self):
+        """Gera um ZIP com as fichas de todos os alunos da lista filtrada (ex.: a turma inteira)."""
+        if not self.total_alunos:
+            messagebox.showwarning("Fichas", "Nenhum aluno na lista atual.")
+            return
+        ids = [self.alunos.ids[i] for i in self.alunos.indices(self.filtrados, 0, self.total_alunos)]
+        turma = self.turma_filter_var.get()
+        self._exportar_fichas_zip(ids, "Escola" if turma == "Todas" else turma)
+
+    def _iter_fichas(self, ids, lote=200):
+        """
+        Dados das fichas na ordem de 'ids', lidos do banco em lotes (nunca a lista inteira de uma vez),
+        por uma conexão de relatório e em um único snapshot (roda na thread do pacote de fichas).
+        """
+        with self.db.snapshot_relatorio():
+            for i in range(0, len(ids), lote):
+                ids_lote = ids[i:i + lote]
+                linhas = {linha[0]: linha for linha in self.db.get_alunos_by_ids(ids_lote, relatorio=True)}
+                for aluno_id in ids_lote:
+                    if aluno_id in linhas:
+                        yield aluno_para_dict(linhas[aluno_id])
+
+    def _exportar_fichas_zip(self, ids, nome):
+        """Gera, em uma thread, o ZIP com as fichas dos alunos informados (cada PDF vai direto para o ZIP)."""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".zip", 
+            filetypes=[("Arquivo ZIP", "*.zip")],
+            initialfile=f"Fichas_{nome.replace(' ', '_')}.zip"
+        )
+        if not file_path:
+            return
+
+        resultado = {}
+        def trabalho():
+            try:
+                resultado["total"] = gravar_zip_fichas(file_path, self._iter_fichas(ids), foto=self._foto_ficha)
+            except Exception as e:
+                resultado["erro"] = e
+            finally:
+                self.db.liberar_conexoes_da_thread()
+
+        worker = threading.Thread(target=trabalho, name="cemac-fichas-zip", daemon=True)
+        worker.start()
+        self._aguardar_relatorio(worker, resultado, file_path, "Pacote de fichas")
+
+    # --- Relatórios de Turma (Lista e Chamada) ---
+
+    def _relatorios_modal(self):
+        """Cria o modal de escolha do relatório (lista da turma ou folha de chamada)."""
+        modal = tk.Toplevel(self)
+        modal.title("Relatórios de Turma")
+        modal.geometry("400x320")
+        modal.transient(self.controller) 
+        modal.grab_set()
+        
+        frame = ttk.Frame(modal, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        tipo_var = tk.StringVar(value="Lista de Alunos")
+        turma_var = tk.StringVar(value=self.turma_filter_var.get())
+        mes_var = tk.StringVar(value=date.today().strftime('%m/%Y'))
+
+        ttk.Label(frame, text="Relatório:", style='N.TLabel').pack(anchor=tk.W)
+        ttk.Combobox(frame, textvariable=tipo_var, values=["Lista de Alunos", "Folha de Chamada"], state="readonly").pack(pady=5, anchor=tk.W)
+        ttk.Label(frame, text="Turma ('Todas' = escola inteira):", style='N.TLabel').pack(anchor=tk.W)
+        ttk.Combobox(frame, textvariable=turma_var, values=self.TURMAS, state="readonly").pack(pady=5, anchor=tk.W)
+        ttk.Label(frame, text="Mês da Chamada (mm/aaaa):", style='N.TLabel').pack(anchor=tk.W)
+        ttk.Entry(frame, textvariable=mes_var, width=10).pack(pady=5, anchor=tk.W)
+        
+        ttk.Button(frame, text="Gerar PDF", bootstyle="success", style='C.TButton',
+                   command=lambda: self._gerar_relatorio(modal, tipo_var.get(), turma_var.get(), mes_var.get())).pack(pady=15)
+
+    def _gerar_relatorio(self, modal, tipo, turma, mes_ano):
+        """Gera o relatório escolhido em uma thread, sem travar a janela."""
+        if not re.fullmatch(r'\d{2}/\d{4}', mes_ano) or not 1 <= int(mes_ano[:2]) <= 12:
+            messagebox.showerror("Erro de Validação", "Informe o mês no formato mm/aaaa.")
+            return
+        mes, ano = int(mes_ano[:2]), int(mes_ano[3:])
+        turma = None if turma == "Todas" else turma
+        ano_letivo = self._ano_selecionado() # o mesmo ano exibido na lista
+
+        nome_base = "Chamada" if tipo == "Folha de Chamada" else "Lista"
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf", 
+            filetypes=[("PDF files", "*.pdf")],
+            initialfile=f"{nome_base}_{(turma or 'Escola').replace(' ', '_')}.pdf",
+            parent=modal
+        )
+        if not file_path:
+            return
+        modal.destroy()
+
+        resultado = {}
+        def trabalho():
+            try:
+                if tipo == "Folha de Chamada":
+                    resultado["total"] = reports.gerar_folha_chamada(self.db, file_path, turma, ano, mes, ano_letivo)
+                else:
+                    resultado["total"] = reports.gerar_lista_turma(self.db, file_path, turma, ano_letivo)
+            except Exception as e:
+                resultado["erro"] = e
+            finally:
+                self.db.liberar_conexoes_da_thread()
+
+        worker = threading.Thread(target=trabalho, name="cemac-relatorio", daemon=True)
+        worker.start()
+        self._aguardar_relatorio(worker, resultado, file_path)
+
+    def _aguardar_relatorio(self, worker, resultado, file_path, descricao="Relatório"):
+        if worker.is_alive():
+            self.after(100, self._aguardar_relatorio, worker, resultado, file_path, descricao)
+        elif "erro" in resultado:
+            messagebox.showerror("Erro de Relatório", f"Falha ao gerar o arquivo ({descricao}): {resultado['erro']}")
+        else:
+            messagebox.showinfo("Sucesso", f"{descricao} com {resultado['total']} aluno(s) salvo em: {file_path}")
+
+
+# ====================================================================
+# MODO DE ANÁLISE DE DESEMPENHO (ver profiling.py)
+# ====================================================================
+
+# Embrulhados na classe antes de as telas existirem: os botões já guardam a versão medida
+profiler.instrumentar(MatriculaApp, ("show_frame",))
+profiler.instrumentar(FormsFrame, ("_save_forms",))
+profiler.instrumentar(ListFrame, (
+    "load_alunos", "_apply_filter", "_display_current_page", "_verificar_alteracoes",
+    "_finalizar_confirmacao", "_finalizar_confirmacao_lote", "_aplicar_conciliacao", "_imprimir_ficha",
+))